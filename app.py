@@ -1,23 +1,144 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify
 from werkzeug.utils import secure_filename
 import os
+import hashlib
+import hmac
+import json
+import threading
+import time
 from datetime import datetime, timedelta
+import numpy as np
 from config import Config, allowed_file
 from database import Database
 from pcap_analyzer import PcapAnalyzer
 from stats_generator import StatsGenerator
 from report_generator import ReportGenerator
 from packet_filter import PacketFilter
+from graph_reducer import GraphReducer
+from graph_layout import GraphLayout
+from timeseries import TimeSeriesRollups
+from retention import RetentionManager
 
 app = Flask(__name__)
 app.config.from_object(Config)
 Config.init_app(app)
 
-db = Database(Config.DATABASE_PATH)
-analyzer = PcapAnalyzer()
-stats_gen = StatsGenerator()
+db = Database(Config.DATABASE_PATH, Config.STORAGE_FORMAT)
+analyzer = PcapAnalyzer(engine=Config.PARSER_ENGINE,
+                        workers=Config.PARSER_WORKERS,
+                        parallel_min_size=Config.PARALLEL_MIN_SIZE)
+stats_gen = StatsGenerator(sketch=Config.STATS_SKETCH if Config.STATS_SKETCH_MODE else None)
 report_gen = ReportGenerator()
 filter_handler = PacketFilter()
+graph_reducer = GraphReducer(**Config.GRAPH_LIMITS)
+graph_layout = GraphLayout()
+rollups = TimeSeriesRollups()
+retention = RetentionManager(db, Config.UPLOAD_FOLDER, **Config.RETENTION)
+
+# Grafy dostępne do rozwijania: klucz w statystykach i rodzaj węzłów
+GRAPHS = {'network': ('network_graph', 'ip'), 'mac': ('enhanced_mac_graph', 'mac')}
+# Sekcje statystyk potrzebne opcjom raportu PDF (leniwe są doliczane przy pierwszym żądaniu)
+REPORT_SECTIONS = {'protocol_payload': ('protocol_payload',)}
+# Pozycje węzłów zależą od zredukowanego grafu - zmiana limitów unieważnia zapisane układy
+LAYOUT_SIGNATURE = json.dumps(Config.GRAPH_LIMITS, sort_keys=True)
+
+# Układy grafów liczone w tej chwili - (analysis_id, nazwa grafu) -> blokada
+layout_locks = {}
+layout_locks_guard = threading.Lock()
+
+# Liczniki cache analiz (po skrócie zawartości pliku)
+cache_metrics = {'hits': 0, 'misses': 0, 'lookup_ms_total': 0.0}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def save_and_hash(file_storage, filepath):
+    """Zapisuje przesłany plik porcjami, licząc jednocześnie SHA-256 zawartości"""
+    digest = hashlib.sha256()
+    with open(filepath, 'wb') as f:
+        while True:
+            chunk = file_storage.stream.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+def hash_file(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def display_graph(analysis_id, name, stats):
+    """Zredukowany graf z pozycjami węzłów (z bazy albo liczony i zapisywany teraz)"""
+    display = db.get_display_graph(analysis_id, name, LAYOUT_SIGNATURE)
+    if display is not None:
+        return display
+    
+    # Jeden układ naraz dla grafu - żądanie w trakcie precompute_layouts czeka na jego wynik
+    key = (analysis_id, name)
+    with layout_locks_guard:
+        lock = layout_locks.setdefault(key, threading.Lock())
+    with lock:
+        display = db.get_display_graph(analysis_id, name, LAYOUT_SIGNATURE)
+        if display is None:
+            display = compute_display_graph(analysis_id, name, stats)
+        with layout_locks_guard:
+            layout_locks.pop(key, None)
+    return display
+
+def compute_display_graph(analysis_id, name, stats):
+    graph_key, kind = GRAPHS[name]
+    graph = graph_reducer.reduce(stats[graph_key], kind)
+    
+    positions = db.get_graph_layout(analysis_id, name, LAYOUT_SIGNATURE)
+    if positions is None:
+        layout_start = time.perf_counter()
+        positions = graph_layout.compute(graph)
+        print(f"Computed {name} graph layout for analysis {analysis_id}: {len(positions)} nodes, "
+              f"{(time.perf_counter() - layout_start) * 1000:.0f} ms")
+    
+    display = graph_layout.apply(graph, positions)
+    db.save_graph_layout(analysis_id, name, LAYOUT_SIGNATURE, positions, display)
+    return display
+
+def ensure_stats(analysis_id, stats, sections):
+    """Dolicza brakujące (leniwe) sekcje statystyk z zapisanych pakietów i zapisuje je w bazie"""
+    computed = stats_gen.ensure_sections(stats, lambda: db.get_packet_table(analysis_id), sections)
+    if computed:
+        # Tylko nowe klucze - sekcje doliczone w tym czasie przez inne żądanie zostają w bazie
+        db.update_stats(analysis_id, {key: stats[key] for name in computed
+                                      for key in stats_gen.sections[name].keys})
+        print(f"Computed stats sections for analysis {analysis_id}: {', '.join(computed)}")
+    return stats
+
+def packet_page(table, rows):
+    """Słowniki pakietów z wybranych wierszy tabeli (z rozmiarem payloadu dla okna szczegółów)"""
+    page = table.data[rows]
+    packets = list(table.records(page))
+    for packet, size in zip(packets, page['payload_size'].tolist()):
+        if size >= 0:
+            packet['payload_size'] = size
+    return packets
+
+def save_rollups(analysis_id, times, lengths):
+    start_time, duration, levels = rollups.build(times, lengths)
+    if levels:
+        db.save_rollups(analysis_id, start_time, duration,
+                        {resolution: rollups.encode(level) for resolution, level in levels.items()})
+
+def precompute_layouts(analysis_id, stats):
+    """Krok w tle po save_analysis - pierwsze otwarcie analizy nie czeka na układ grafów"""
+    try:
+        for name, (graph_key, _) in GRAPHS.items():
+            if stats.get(graph_key) and stats[graph_key].get('nodes'):
+                display_graph(analysis_id, name, stats)
+    except Exception as e:
+        print(f"Error computing graph layout: {str(e)}")
 
 @app.route('/')
 def index():
@@ -31,12 +152,12 @@ def upload_file():
         file = request.files['file']
         
         if not allowed_file(file.filename):
-            flash('Invalid file format. Allowed: .pcap, .pcapng, .cap')
+            flash('Invalid file format. Allowed: .pcap, .pcapng, .cap (optionally .gz, .xz, .bz2, .zst)')
             return redirect(url_for('index'))
         
         filename = secure_filename(file.filename)
         filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        file_hash = save_and_hash(file, filepath)
         
     # Obsługa ścieżki do pliku
     elif 'file_path' in request.form and request.form['file_path'].strip():
@@ -47,27 +168,56 @@ def upload_file():
             return redirect(url_for('index'))
         
         if not allowed_file(file_path):
-            flash('Invalid file format. Allowed: .pcap, .pcapng, .cap')
+            flash('Invalid file format. Allowed: .pcap, .pcapng, .cap (optionally .gz, .xz, .bz2, .zst)')
             return redirect(url_for('index'))
         
         # Użyj oryginalnej ścieżki
         filepath = file_path
         filename = os.path.basename(file_path)
+        file_hash = None
         
     else:
         flash('No file selected or path provided')
         return redirect(url_for('index'))
     
     try:
+        lookup_start = time.perf_counter()
+        file_hash = file_hash or hash_file(filepath)
+        cached_id = db.find_analysis_by_hash(file_hash)
+        lookup_ms = (time.perf_counter() - lookup_start) * 1000
+        cache_metrics['lookup_ms_total'] += lookup_ms
+        
+        if cached_id is not None:
+            cache_metrics['hits'] += 1
+            print(f"Cache hit for {filename} (sha256 {file_hash[:12]}): analysis {cached_id}, {lookup_ms:.1f} ms")
+            flash(f'File already analyzed: {filename}')
+            return redirect(url_for('view_analysis', analysis_id=cached_id))
+        
+        cache_metrics['misses'] += 1
+        print(f"Cache miss for {filename} (sha256 {file_hash[:12]})")
+        
         print(f"Analyzing file: {filepath}")
-        packets = analyzer.analyze_file(filepath)
-        print(f"Found {len(packets)} packets")
+        # Agregaty statystyk zbierane porcjami w trakcie parsowania (przy parsowaniu równoległym
+        # osobno w każdym fragmencie i łączone przez merge). Sekcje leniwe (graf MAC
+        # z protokołami, payload wg protokołów...) - przy pierwszym żądaniu.
+        # Porcje pakietów (razem z bajtami payloadu) trafiają od razu do magazynu kolumnowego.
+        accumulator = stats_gen.accumulator(stats_gen.core_sections())
+        writer = db.columns.writer()
+        try:
+            analyzer.write_table(filepath, writer, accumulator)
+        except Exception:
+            writer.abort()
+            raise
+        print(f"Found {writer.length} packets")
         
-        stats = stats_gen.generate_stats(packets)
+        stats = stats_gen.finalize(accumulator)
         print("Generated stats")
         
-        analysis_id = db.save_analysis(filename, packets, stats)
+        analysis_id = db.save_analysis(filename, writer, stats, file_hash)
         print(f"Saved analysis with ID: {analysis_id}")
+        table = db.get_packet_table(analysis_id)
+        save_rollups(analysis_id, table.data['time'], table.data['length'])
+        threading.Thread(target=precompute_layouts, args=(analysis_id, stats), daemon=True).start()
         
         flash(f'Successfully analyzed file: {filename}')
         return redirect(url_for('view_analysis', analysis_id=analysis_id))
@@ -89,13 +239,150 @@ def view_analysis(analysis_id):
     if not analysis:
         flash('Analysis not found')
         return redirect(url_for('index'))
+    db.touch_analysis(analysis_id)
+    
+    # Do przeglądarki trafiają grafy zredukowane, z gotowymi pozycjami węzłów (pełne zostają w bazie).
+    # Brakujące sekcje leniwe strona pobiera przez /stats_section przy otwarciu zakładki.
+    stats = dict(analysis['stats'])
+    for name, (graph_key, _) in GRAPHS.items():
+        if stats.get(graph_key):
+            stats[graph_key] = display_graph(analysis_id, name, stats)
     
+    # Tabela pakietów pobiera strony przez /packets (stronicowanie i filtry w SQL)
     return render_template('view.html', 
                          filename=analysis['filename'],
-                         data=analysis['packets'],
-                         stats=analysis['stats'],
+                         stats=stats,
                          analysis_id=analysis_id)
 
+@app.route('/delete/<int:analysis_id>', methods=['POST'])
+def delete_analysis(analysis_id):
+    analysis = db.get_analysis_metadata(analysis_id)
+    
+    if not analysis:
+        flash('Analysis not found')
+        return redirect(url_for('index'))
+    
+    db.delete_analysis(analysis_id)
+    flash(f"Deleted analysis: {analysis['filename']}")
+    return redirect(url_for('index'))
+
+@app.route('/packets/<int:analysis_id>')
+def packets_page(analysis_id):
+    # Strona tabeli pakietów w formacie DataTables (serverSide) - filtry z panelu jako parametry
+    analysis = db.get_analysis_metadata(analysis_id)
+    if not analysis:
+        return jsonify({'error': 'Analysis not found'}), 404
+    
+    table = db.get_packet_table(analysis_id)
+    sort_columns = {0: 'packet_number', 1: 'time', 9: 'length'}
+    order_by = sort_columns.get(request.args.get('order[0][column]', 0, type=int), 'packet_number')
+    descending = request.args.get('order[0][dir]') == 'desc'
+    offset = max(0, request.args.get('start', 0, type=int))
+    limit = min(max(1, request.args.get('length', 25, type=int)), 1000)
+    
+    # Bez filtrów i sortowania po numerze strona to wycinek kolumn - czytane są tylko jej wiersze
+    try:
+        compiled = filter_handler.compile(request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid filter: {str(e)}'}), 400
+    rows = np.flatnonzero(compiled.mask(table)) if compiled else None
+    if order_by != 'packet_number':
+        rows = rows if rows is not None else np.arange(len(table))
+        rows = rows[np.argsort(table.data[order_by][rows], kind='stable')]
+    
+    filtered = len(rows) if rows is not None else len(table)
+    if descending:
+        positions = np.arange(filtered - 1 - offset, max(filtered - 1 - offset - limit, -1), -1)
+    else:
+        positions = np.arange(offset, min(offset + limit, filtered))
+    
+    return jsonify({
+        'draw': request.args.get('draw', 0, type=int),
+        'recordsTotal': analysis['total_packets'],
+        'recordsFiltered': filtered,
+        'data': packet_page(table, positions if rows is None else rows[positions])
+    })
+
+@app.route('/stats_section/<int:analysis_id>/<section>')
+def stats_section(analysis_id, section):
+    # Jedna sekcja statystyk - liczona przy pierwszym żądaniu, potem z bazy
+    if section not in stats_gen.sections:
+        return jsonify({'error': 'Unknown stats section'}), 404
+    
+    stats = db.get_stats(analysis_id)
+    if stats is None:
+        return jsonify({'error': 'Analysis not found'}), 404
+    
+    stats = ensure_stats(analysis_id, stats, [section])
+    for name, (graph_key, _) in GRAPHS.items():
+        if graph_key == section:
+            return jsonify({graph_key: display_graph(analysis_id, name, stats)})
+    return jsonify({key: stats.get(key) for key in stats_gen.sections[section].keys})
+
+@app.route('/graph_expand/<int:analysis_id>/<graph>')
+def graph_expand(analysis_id, graph):
+    # Rozwinięcie jednego węzła zbiorczego grafu (podsieci / prefiksu OUI)
+    if graph not in GRAPHS:
+        return jsonify({'error': 'Unknown graph'}), 404
+    
+    node_id = request.args.get('node', '')
+    offset = request.args.get('offset', 0, type=int)
+    
+    stats = db.get_stats(analysis_id)
+    if stats is None:
+        return jsonify({'error': 'Analysis not found'}), 404
+    
+    graph_key, kind = GRAPHS[graph]
+    stats = ensure_stats(analysis_id, stats, stats_gen.section_names([graph_key]))
+    expanded = graph_reducer.expand(stats.get(graph_key, {}), node_id, kind, max(0, offset))
+    if expanded is None:
+        return jsonify({'error': 'Aggregate node not found'}), 404
+    
+    return jsonify(expanded)
+
+@app.route('/packet_payload/<int:analysis_id>/<int:packet_number>')
+def packet_payload(analysis_id, packet_number):
+    # Payload pobierany leniwie przez okno szczegółów pakietu
+    payload = db.get_payload(analysis_id, packet_number)
+
+    if payload is None:
+        return jsonify({'error': 'Payload not found'}), 404
+
+    return jsonify({
+        'packet_number': packet_number,
+        'size': len(payload),
+        'payload': payload.decode('utf-8', errors='replace'),
+        'payload_hex': payload.hex()
+    })
+
+@app.route('/throughput/<int:analysis_id>')
+def throughput_range(analysis_id):
+    """Przepustowość w zakresie [start, end] (sekundy od początku) z poziomu piramidy pasującego do zakresu"""
+    capture_range = db.get_rollup_range(analysis_id)
+    if capture_range is None:
+        # Analizy zapisane przed wprowadzeniem piramidy - budowana raz z zapisanych pakietów
+        if not db.get_analysis_metadata(analysis_id):
+            return jsonify({'error': 'Analysis not found'}), 404
+        table = db.get_packet_table(analysis_id)
+        save_rollups(analysis_id, table.data['time'], table.data['length'])
+        capture_range = db.get_rollup_range(analysis_id)
+        if capture_range is None:
+            return jsonify({'error': 'No timestamped packets'}), 404
+    
+    start_time, duration = capture_range
+    start = max(0.0, request.args.get('start', 0.0, type=float))
+    end = min(duration, request.args.get('end', duration, type=float))
+    if end < start:
+        start, end = end, start
+    points = min(max(request.args.get('points', rollups.max_points, type=int), 10), rollups.max_points)
+    
+    resolution = rollups.choose_resolution(end - start, points)
+    level = rollups.decode(db.get_rollup(analysis_id, resolution))
+    series = rollups.series(level, resolution, start, end)
+    series['capture_start'] = start_time
+    series['duration'] = duration
+    return jsonify(series)
+
 @app.route('/generate_report/<int:analysis_id>')
 def generate_report(analysis_id):
     analysis = db.get_analysis(analysis_id)
@@ -103,13 +390,17 @@ def generate_report(analysis_id):
     if not analysis:
         return jsonify({'error': 'Analysis not found'}), 404
     
+    db.touch_analysis(analysis_id)
     options = request.args.getlist('options[]')
     if not options:
         options = ['summary', 'protocols', 'ports', 'mac_addresses']
     
+    sections = [section for option in options for section in REPORT_SECTIONS.get(option, ())]
+    ensure_stats(analysis_id, analysis['stats'], sections)
+    # Raport korzysta tylko ze statystyk - pakiety nie są wczytywane
     report_path = report_gen.generate_pdf(
         analysis['filename'],
-        analysis['packets'],
+        None,
         analysis['stats'],
         options
     )
@@ -118,23 +409,45 @@ def generate_report(analysis_id):
 
 @app.route('/export_csv/<int:analysis_id>')
 def export_csv(analysis_id):
-    analysis = db.get_analysis(analysis_id)
+    analysis = db.get_analysis_metadata(analysis_id)
     
     if not analysis:
         return jsonify({'error': 'Analysis not found'}), 404
     
-    csv_path = report_gen.export_csv(analysis['packets'])
+    csv_path = report_gen.export_csv(db.get_packet_table(analysis_id))
     return send_file(csv_path, as_attachment=True)
 
+@app.route('/export_filtered_csv/<int:analysis_id>', methods=['POST'])
+def export_filtered_csv(analysis_id):
+    analysis = db.get_analysis_metadata(analysis_id)
+    
+    if not analysis:
+        return jsonify({'error': 'Analysis not found'}), 404
+    
+    try:
+        filtered_packets = filter_handler.filter_packets(db.get_packet_table(analysis_id), request.json)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid filter: {str(e)}'}), 400
+    csv_path = report_gen.export_csv(filtered_packets)
+    
+    return jsonify({
+        'success': True,
+        'total_packets': len(filtered_packets),
+        'csv_url': url_for('download_report', filename=os.path.basename(csv_path))
+    })
+
 @app.route('/generate_filtered_report/<int:analysis_id>', methods=['POST'])
 def generate_filtered_report(analysis_id):
-    analysis = db.get_analysis(analysis_id)
+    analysis = db.get_analysis_metadata(analysis_id)
     
     if not analysis:
         return jsonify({'error': 'Analysis not found'}), 404
     
     filters = request.json
-    filtered_packets = filter_handler.filter_packets(analysis['packets'], filters)
+    try:
+        filtered_packets = filter_handler.filter_packets(db.get_packet_table(analysis_id), filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid filter: {str(e)}'}), 400
     
     report_path = report_gen.generate_filtered_pdf(
         analysis['filename'],
@@ -147,9 +460,45 @@ def generate_filtered_report(analysis_id):
         'report_url': url_for('download_report', filename=os.path.basename(report_path))
     })
 
+@app.route('/metrics')
+def metrics():
+    lookups = cache_metrics['hits'] + cache_metrics['misses']
+    return jsonify({
+        'analysis_cache': {
+            'hits': cache_metrics['hits'],
+            'misses': cache_metrics['misses'],
+            'hit_ratio': cache_metrics['hits'] / lookups if lookups else 0,
+            'avg_lookup_ms': cache_metrics['lookup_ms_total'] / lookups if lookups else 0
+        }
+    })
+
+@app.route('/admin/storage')
+def admin_storage():
+    # Zajętość dysku i wynik ostatniego przebiegu retencji
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(retention.usage())
+
+@app.route('/admin/storage/cleanup', methods=['POST'])
+def admin_storage_cleanup():
+    # Przebieg retencji od razu, bez czekania na wątek w tle
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(retention.run_once())
+
+def admin_allowed():
+    # Bez skonfigurowanego tokenu endpointy administracyjne są wyłączone
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(Config.ADMIN_TOKEN) and hmac.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode())
+
 @app.route('/download_report/<filename>')
 def download_report(filename):
-    return send_file(os.path.join(Config.UPLOAD_FOLDER, filename), as_attachment=True)
+    report_path = os.path.join(Config.UPLOAD_FOLDER, filename)
+    if not os.path.exists(report_path):
+        return jsonify({'error': 'Report not found (expired)'}), 404
+    # Pobranie odświeża czas modyfikacji - retencja usuwa najpierw najdawniej używane pliki
+    os.utime(report_path)
+    return send_file(report_path, as_attachment=True)
 
 @app.errorhandler(404)
 def not_found(e):
@@ -160,4 +509,8 @@ def server_error(e):
     return render_template('500.html'), 500
 
 if __name__ == '__main__':
+    # Retencja tylko przy uruchomieniu serwera, nie przy imporcie app (testy, skrypty). Reloader
+    # trybu debug uruchamia ten plik dwa razy - wątek działa w procesie obsługującym żądania.
+    if Config.RETENTION_ENABLED and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        retention.start()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,1016 @@
+"""
+Benchmarki wydajności analizatora.
+
+Przykłady:
+    python benchmark.py generate capture.pcap --packets 1000000
+    python benchmark.py parse capture.pcap --workers 8
+    python benchmark.py compressed capture.pcap
+    python benchmark.py stats capture.pcap
+    python benchmark.py timeseries --packets 10000000
+    python benchmark.py storage capture.pcap
+    python benchmark.py concurrency capture.pcap --readers 4
+    python benchmark.py filters capture.pcap --packets 1000000
+"""
+import argparse
+import bz2
+import gzip
+import json
+import lzma
+import multiprocessing
+import os
+import random
+import shutil
+import struct
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from operator import itemgetter
+
+import numpy as np
+
+from config import Config
+from pcap_analyzer import PcapAnalyzer
+from raw_decoder import open_capture
+from mac_vendors import get_mac_vendor
+from sketches import HyperLogLog, KllSketch, key_hash, mix64
+from stats_generator import (StatsGenerator, DISTINCT_COUNTS, QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL,
+                             distinct_counts, flow_hashes)
+from packet_table import PacketTable, CHUNK_SIZE, ip_to_int, mac_to_int
+from timeseries import TimeBuckets
+from database import Database, STORAGE_FORMATS, CONNECTION_PRAGMAS
+from packet_filter import PacketFilter
+
+
+def generate_capture(path, packets, seed=1):
+    """Generuje syntetyczny plik pcap (Ethernet/IPv4/TCP+UDP) bez użycia scapy"""
+    rng = random.Random(seed)
+    macs = [bytes([0x00, 0x1a, 0x2b, 0x3c, 0x4d, i]) for i in range(32)]
+    ips = [bytes([10, 0, i // 256, i % 256]) for i in range(1, 2000)]
+    ports = [22, 8080, 5000, 9999, 3306, 25565]
+    timestamp = 1700000000.0
+
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for _ in range(packets):
+            payload = bytes(rng.randrange(0, 400))
+            src_ip, dst_ip = rng.choice(ips), rng.choice(ips)
+            if rng.random() < 0.7:
+                transport = struct.pack('!HHIIHHHH', rng.randrange(1024, 65535), rng.choice(ports),
+                                        rng.randrange(1 << 32), 0, (5 << 12) | 0x18, 8192, 0, 0)
+                proto = 6
+            else:
+                transport = struct.pack('!HHHH', rng.randrange(1024, 65535), rng.choice(ports),
+                                        8 + len(payload), 0)
+                proto = 17
+            ip_header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(transport) + len(payload),
+                                    0, 0, 64, proto, 0, src_ip, dst_ip)
+            frame = rng.choice(macs) + rng.choice(macs) + b'\x08\x00' + ip_header + transport + payload
+
+            timestamp += rng.random() * 0.001
+            sec = int(timestamp)
+            usec = int((timestamp - sec) * 1000000)
+            f.write(struct.pack('<IIII', sec, usec, len(frame), len(frame)))
+            f.write(frame)
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    count = len(result) if hasattr(result, '__len__') else 0
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"{label:<32} {elapsed:8.2f} s  {rate:12,.0f} pkt/s")
+    return result
+
+
+def bench_parse(args):
+    size_mb = os.path.getsize(args.file) / (1024 * 1024)
+    print(f"Plik: {args.file} ({size_mb:.1f} MB), procesy: {args.workers}")
+
+    if not args.skip_scapy:
+        timed("scapy (sekwencyjnie)", PcapAnalyzer('scapy').analyze_table, args.file)
+    reference = timed("raw (sekwencyjnie)", PcapAnalyzer('raw').analyze_table, args.file)
+
+    analyzer = PcapAnalyzer('raw', workers=args.workers)
+    sharded = timed(f"raw (procesy: {args.workers})", analyzer.analyze_table_sharded, args.file)
+
+    # Statystyki liczone we fragmentach i łączone przez merge (ścieżka wczytywania pliku w aplikacji)
+    generator = StatsGenerator()
+    accumulator = generator.accumulator()
+    timed(f"raw + statystyki (procesy: {args.workers})", analyzer.analyze_table_sharded, args.file,
+          None, accumulator)
+    merged = generator.finalize(accumulator)
+    single = generator.generate_table_stats(reference)
+
+    if not np.array_equal(sharded.data, reference.data) or sharded.payloads != reference.payloads:
+        print("UWAGA: wynik równoległy różni się od sekwencyjnego!")
+    # Szkice KLL łączą się w granicach błędu - porównywane są tylko sekcje łączone dokładnie
+    approximate = generator.sections['distributions'].keys
+    if any(merged[key] != single[key] for key in single if key not in approximate):
+        print("UWAGA: statystyki połączone z fragmentów różnią się od jednego przebiegu!")
+
+
+def compress_file(source, target, compression):
+    """Kompresuje plik pcap wybranym algorytmem (dane wejściowe dla benchmarku)"""
+    if compression == 'zst':
+        import zstandard
+        with open(source, 'rb') as src, open(target, 'wb') as dst:
+            zstandard.ZstdCompressor().copy_stream(src, dst)
+        return
+    
+    openers = {'gz': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+    with open(source, 'rb') as src, openers[compression](target, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+
+
+def decompress_then_parse(analyzer, path, temp_dir):
+    """Dotychczasowy sposób: rozpakowanie na dysk, potem parsowanie"""
+    temp_path = os.path.join(temp_dir, 'decompressed.pcap')
+    with open_capture(path) as src, open(temp_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    try:
+        return analyzer.analyze_file(temp_path)
+    finally:
+        os.remove(temp_path)
+
+
+def bench_compressed(args):
+    size_mb = os.path.getsize(args.file) / (1024 * 1024)
+    print(f"Plik: {args.file} ({size_mb:.1f} MB)")
+    analyzer = PcapAnalyzer('raw')
+    reference = timed("bez kompresji", analyzer.analyze_file, args.file)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for compression in args.formats:
+            path = os.path.join(temp_dir, f"capture.pcap.{compression}")
+            try:
+                compress_file(args.file, path, compression)
+            except ImportError as e:
+                print(f"{compression}: pominięto ({e})")
+                continue
+            
+            compressed_mb = os.path.getsize(path) / (1024 * 1024)
+            print(f"{compression}: {compressed_mb:.1f} MB")
+            streamed = timed(f"  {compression} strumieniowo", analyzer.analyze_file, path)
+            timed(f"  {compression} rozpakuj + parsuj", decompress_then_parse, analyzer, path, temp_dir)
+            
+            if streamed != reference:
+                print(f"UWAGA: wynik dla {compression} różni się od pliku bez kompresji!")
+
+
+def timed_stats(label, func, packets_count, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    rate = packets_count / elapsed if elapsed > 0 else 0
+    print(f"{label:<32} {elapsed:8.2f} s  {rate:12,.0f} pkt/s")
+    return result
+
+
+# Pierwotna, wieloprzebiegowa wersja statystyk na słownikach pakietów - punkt odniesienia
+# dla benchmarku i testów zgodności (aplikacja korzysta wyłącznie ze StatsAccumulator)
+
+def packet_timestamp(packet):
+    """Czas pakietu jako liczba sekund - obsługuje też zapis tekstowy, 0 gdy brak/niepoprawny"""
+    time_val = packet.get('time', 0)
+    if isinstance(time_val, (int, float)):
+        return float(time_val)
+    elif isinstance(time_val, str):
+        try:
+            dt = datetime.fromisoformat(time_val.replace('Z', '+00:00'))
+            return dt.timestamp()
+        except:
+            try:
+                dt = datetime.strptime(time_val, '%Y-%m-%d %H:%M:%S.%f')
+                return dt.timestamp()
+            except:
+                try:
+                    dt = datetime.strptime(time_val, '%Y-%m-%d %H:%M:%S')
+                    return dt.timestamp()
+                except:
+                    return 0
+    return 0
+
+
+def inter_arrival_times(times):
+    """Odstępy między kolejnymi pakietami (w kolejności przechwycenia, ujemne jako 0)"""
+    times = np.asarray(times, dtype=np.float64)
+    if len(times) < 2:
+        return np.empty(0, dtype=np.float64)
+    return np.maximum(np.diff(times), 0)
+
+
+def keys_to_ints(keys, to_int):
+    """Klucze tekstowe jako liczby (jak kolumny PacketTable); nietypowe wartości - skrót blake2b"""
+    values = []
+    for key in keys:
+        try:
+            values.append(to_int(key))
+        except (TypeError, ValueError, OSError, AttributeError):
+            values.append(key_hash(key))
+    return np.array(values, dtype=np.uint64)
+
+
+class DistinctCounter:
+    """
+    Przybliżona liczba różnych adresów IP (źródłowych i docelowych), adresów MAC,
+    portów i przepływów (5-krotek) - po jednym szkicu HyperLogLog (4 KB) na licznik,
+    niezależnie od liczby różnych wartości. Klucze trafiają najpierw do zbiorów
+    (duplikaty w porcji są pomijane), które flush() haszuje wektorowo. Klucze są
+    haszowane jako liczby, tak samo jak kolumny PacketTable, więc oba silniki
+    i dowolny podział na fragmenty dają identyczne rejestry.
+    """
+    
+    def __init__(self):
+        self.sketches = {name: HyperLogLog() for name in DISTINCT_COUNTS}
+        self.macs = set()
+        # (src, dst, proto, sport, dport) - porty None dla pakietów IP bez TCP/UDP;
+        # adresy i porty do pozostałych liczników są wyciągane z przepływów w flush()
+        self.flows = set()
+    
+    def add(self, packet):
+        if 'ethernet' in packet:
+            self.macs.add(packet['ethernet']['src'])
+            self.macs.add(packet['ethernet']['dst'])
+        if 'ip' in packet:
+            ip = packet['ip']
+            transport = packet['tcp'] if 'tcp' in packet else packet.get('udp')
+            if transport is not None:
+                self.flows.add((ip['src'], ip['dst'], ip['proto'], transport['sport'], transport['dport']))
+            else:
+                self.flows.add((ip['src'], ip['dst'], ip['proto'], None, None))
+    
+    def flush(self):
+        sketches = self.sketches
+        sketches['macs'].add_hashes(mix64(keys_to_ints(self.macs, mac_to_int)))
+        self.macs.clear()
+        if not self.flows:
+            return
+        
+        flows = list(self.flows)
+        self.flows.clear()
+        column = lambda index: list(map(itemgetter(index), flows))
+        src_ips, dst_ips, sports, dports = column(0), column(1), column(3), column(4)
+        # Każdy adres porcji konwertowany na liczbę tylko raz
+        ips = list(set(src_ips) | set(dst_ips))
+        ip_values = dict(zip(ips, keys_to_ints(ips, ip_to_int).tolist()))
+        src_values = np.array(list(map(ip_values.__getitem__, src_ips)), dtype=np.uint64)
+        dst_values = np.array(list(map(ip_values.__getitem__, dst_ips)), dtype=np.uint64)
+        sketches['src_ips'].add_hashes(mix64(src_values))
+        sketches['dst_ips'].add_hashes(mix64(dst_values))
+        
+        ports = set(sports) | set(dports)
+        ports.discard(None)
+        sketches['ports'].add_hashes(mix64(np.fromiter(ports, dtype=np.uint64, count=len(ports))))
+        
+        zero_none = lambda values: [value or 0 for value in values]
+        sketches['flows'].add_hashes(flow_hashes(src_values, dst_values, column(2),
+                                                 zero_none(sports), zero_none(dports)))
+    
+    def merge(self, other):
+        self.flush()
+        other.flush()
+        for name, sketch in self.sketches.items():
+            sketch.merge(other.sketches[name])
+        return self
+    
+    def counts(self):
+        self.flush()
+        return distinct_counts(self.sketches)
+
+
+class MultipassStatsGenerator(StatsGenerator):
+    """Osobny przebieg po liście pakietów dla każdej statystyki; formatowanie wyników wspólne ze StatsGenerator"""
+
+    def generate_stats(self, packets):
+        """
+        Pierwotna wersja generate_stats (osobny przebieg dla każdej statystyki) -
+        punkt odniesienia dla benchmarku i kontroli zgodności silnika jednoprzebiegowego
+        """
+        if not isinstance(packets, list):
+            packets = list(packets)
+        
+        stats = {
+            'total_packets': len(packets),
+            'protocols': {},
+            'top_ips': {},
+            'top_ports': {},
+            'top_mac_addresses': {},
+            'top_mac_vendors': {},
+            'time_distribution': {},
+            'network_graph': {'nodes': [], 'edges': []},
+            'mac_graph': {'nodes': [], 'edges': []},
+            'geo_data': []
+        }
+        
+        # Podstawowe statystyki
+        self.collect_basic_stats(packets, stats)
+        
+        # Zaawansowane statystyki sieciowe
+        stats['payload_stats'] = self.calculate_payload_stats(packets)
+        stats['throughput_stats'] = self.calculate_throughput_stats(packets)
+        stats['network_load'] = self.calculate_network_load(packets)
+        stats['protocol_payload'] = self.calculate_protocol_payload(packets)
+        stats['mac_protocol_stats'] = self.calculate_mac_protocol_stats(packets)
+        
+        # Rozkład czasowy i wielkości
+        stats['time_distribution'] = self.calculate_time_distribution(packets)
+        self.add_distribution_stats(stats, [packet['length'] for packet in packets],
+                                    [packet_timestamp(packet) for packet in packets])
+        
+        # Grafy sieciowe
+        self.build_network_graph(packets, stats)
+        self.build_mac_graph(packets, stats)
+        
+        # Ulepszony graf MAC z protokołami
+        stats['enhanced_mac_graph'] = self.build_enhanced_mac_graph(packets, stats['mac_protocol_stats'])
+        
+        # Sortowanie i limitowanie TOP wartości
+        stats['top_ips'] = dict(Counter(stats['top_ips']).most_common(10))
+        stats['top_ports'] = dict(Counter(stats['top_ports']).most_common(10))
+        stats['top_mac_addresses'] = dict(Counter(stats['top_mac_addresses']).most_common(10))
+        stats['top_mac_vendors'] = dict(Counter(stats['top_mac_vendors']).most_common(10))
+        
+        # Dane dla wykresów
+        stats['top_ports_data'] = [{'port': p, 'count': c} for p, c in list(stats['top_ports'].items())[:5]]
+        stats['top_mac_data'] = [{'mac': m, 'count': c} for m, c in list(stats['top_mac_addresses'].items())[:5]]
+        
+        # Liczby różnych wartości (HyperLogLog)
+        distinct = DistinctCounter()
+        for packet in packets:
+            distinct.add(packet)
+        stats['distinct_counts'] = distinct.counts()
+        
+        return stats
+    
+    def collect_basic_stats(self, packets, stats):
+        for packet in packets:
+            if 'ethernet' in packet:
+                src_mac = packet['ethernet']['src']
+                dst_mac = packet['ethernet']['dst']
+                stats['top_mac_addresses'][src_mac] = stats['top_mac_addresses'].get(src_mac, 0) + 1
+                stats['top_mac_addresses'][dst_mac] = stats['top_mac_addresses'].get(dst_mac, 0) + 1
+                
+                src_vendor = packet['ethernet']['src_vendor']
+                dst_vendor = packet['ethernet']['dst_vendor']
+                stats['top_mac_vendors'][src_vendor] = stats['top_mac_vendors'].get(src_vendor, 0) + 1
+                stats['top_mac_vendors'][dst_vendor] = stats['top_mac_vendors'].get(dst_vendor, 0) + 1
+            
+            if 'ip' in packet:
+                if 'tcp' in packet:
+                    stats['protocols']['TCP'] = stats['protocols'].get('TCP', 0) + 1
+                    stats['top_ports'][packet['tcp']['sport']] = stats['top_ports'].get(packet['tcp']['sport'], 0) + 1
+                    stats['top_ports'][packet['tcp']['dport']] = stats['top_ports'].get(packet['tcp']['dport'], 0) + 1
+                elif 'udp' in packet:
+                    stats['protocols']['UDP'] = stats['protocols'].get('UDP', 0) + 1
+                    stats['top_ports'][packet['udp']['sport']] = stats['top_ports'].get(packet['udp']['sport'], 0) + 1
+                    stats['top_ports'][packet['udp']['dport']] = stats['top_ports'].get(packet['udp']['dport'], 0) + 1
+                else:
+                    proto = f"Protocol {packet['ip']['proto']}"
+                    stats['protocols'][proto] = stats['protocols'].get(proto, 0) + 1
+                
+                src_ip = packet['ip']['src']
+                dst_ip = packet['ip']['dst']
+                stats['top_ips'][src_ip] = stats['top_ips'].get(src_ip, 0) + 1
+                stats['top_ips'][dst_ip] = stats['top_ips'].get(dst_ip, 0) + 1
+    
+    def calculate_time_distribution(self, packets):
+        """Oblicza rozkład czasowy pakietów"""
+        return self.time_distribution_from_times([packet_timestamp(p) for p in packets], len(packets))
+    
+    def time_distribution_from_times(self, times, total_packets):
+        """Rozkład czasowy na podstawie tablicy czasów pakietów (0 = brak czasu)"""
+        if not total_packets:
+            return {'labels': [], 'values': []}
+        
+        times = np.asarray(times, dtype=np.float64)
+        packets_with_time = times[times > 0]
+        
+        if len(packets_with_time) == 0:
+            return {'labels': ['0s'], 'values': [total_packets]}
+        
+        # Znajdź zakres czasowy
+        start_time = float(packets_with_time.min())
+        end_time = float(packets_with_time.max())
+        
+        if start_time == end_time:
+            # Wszystkie pakiety w tym samym czasie
+            time_str = datetime.fromtimestamp(start_time).strftime('%H:%M:%S')
+            return {
+                'labels': [time_str],
+                'values': [len(packets_with_time)]
+            }
+        
+        # Podziel na równomierne okna czasowe
+        duration = end_time - start_time
+        num_buckets = min(50, max(10, len(packets_with_time) // 10))  # 10-50 bucketów
+        bucket_size = duration / num_buckets
+        
+        # Wypełnij buckety (ostatni obejmuje też koniec zakresu)
+        bucket_index = ((packets_with_time - start_time) / bucket_size).astype(np.int64)
+        np.minimum(bucket_index, num_buckets - 1, out=bucket_index)
+        buckets = np.bincount(bucket_index, minlength=num_buckets).tolist()
+        
+        # Generuj etykiety czasowe
+        labels = []
+        for i in range(num_buckets):
+            bucket_time = start_time + (i * bucket_size)
+            if duration < 60:  # mniej niż minuta - pokazuj sekundy
+                label = datetime.fromtimestamp(bucket_time).strftime('%H:%M:%S.%f')[:-3]
+            elif duration < 3600:  # mniej niż godzina - pokazuj minuty i sekundy
+                label = datetime.fromtimestamp(bucket_time).strftime('%H:%M:%S')
+            else:  # więcej niż godzina - pokazuj godziny i minuty
+                label = datetime.fromtimestamp(bucket_time).strftime('%H:%M')
+            labels.append(label)
+        
+        return {
+            'labels': labels,
+            'values': buckets
+        }
+
+    def add_distribution_stats(self, stats, packet_sizes, times):
+        """Histogram i kwantyle wielkości pakietów oraz kwantyle odstępów z list wartości"""
+        stats.update(self.distribution_stats(self.build_quantile_sketch(packet_sizes),
+                                             self.build_quantile_sketch(inter_arrival_times(times))))
+    
+    def build_quantile_sketch(self, values):
+        """Szkic KLL wypełniany porcjami - ten sam podział dla każdego silnika"""
+        values = np.asarray(values, dtype=np.float64)
+        sketch = KllSketch(QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL)
+        for start in range(0, len(values), CHUNK_SIZE):
+            sketch.add_many(values[start:start + CHUNK_SIZE])
+        return sketch
+    
+    def build_network_graph(self, packets, stats):
+        edges = {}
+        nodes = {}
+        
+        for packet in packets:
+            if 'ip' in packet:
+                src = packet['ip']['src']
+                dst = packet['ip']['dst']
+                
+                nodes[src] = nodes.get(src, 0) + 1
+                nodes[dst] = nodes.get(dst, 0) + 1
+                
+                edge_key = f"{src}->{dst}"
+                edges[edge_key] = edges.get(edge_key, 0) + 1
+        
+        stats['network_graph']['nodes'] = [
+            {'id': ip, 'label': ip, 'value': count}
+            for ip, count in nodes.items()
+        ]
+        
+        stats['network_graph']['edges'] = [
+            {'from': key.split('->')[0], 'to': key.split('->')[1], 'value': count}
+            for key, count in edges.items()
+        ]
+    
+    def build_mac_graph(self, packets, stats):
+        edges = {}
+        nodes = {}
+        
+        for packet in packets:
+            if 'ethernet' in packet:
+                src = packet['ethernet']['src']
+                dst = packet['ethernet']['dst']
+                
+                nodes[src] = nodes.get(src, 0) + 1
+                nodes[dst] = nodes.get(dst, 0) + 1
+                
+                edge_key = f"{src}->{dst}"
+                edges[edge_key] = edges.get(edge_key, 0) + 1
+        
+        stats['mac_graph']['nodes'] = [
+            {'id': mac, 'label': mac, 'value': count, 'title': get_mac_vendor(mac)}
+            for mac, count in nodes.items()
+        ]
+        
+        stats['mac_graph']['edges'] = [
+            {'from': key.split('->')[0], 'to': key.split('->')[1], 'value': count}
+            for key, count in edges.items()
+        ]
+    
+    def calculate_payload_stats(self, packets):
+        total = 0
+        count = 0
+        max_size = 0
+        min_size = float('inf')
+        
+        for packet in packets:
+            size = packet.get('length', 0)
+            header_size = 14  # Ethernet
+            if 'ip' in packet:
+                header_size += 20
+            if 'tcp' in packet:
+                header_size += 20
+            elif 'udp' in packet:
+                header_size += 8
+            
+            payload = max(0, size - header_size)
+            if payload > 0:
+                total += payload
+                count += 1
+                max_size = max(max_size, payload)
+                min_size = min(min_size, payload)
+        
+        return {
+            'total_payload_bytes': total,
+            'avg_payload_per_packet': total / len(packets) if packets else 0,
+            'max_payload_size': max_size,
+            'min_payload_size': min_size if min_size != float('inf') else 0
+        }
+    
+    def calculate_throughput_stats(self, packets):
+        """Oblicza statystyki przepustowości w czasie - POPRAWIONA WERSJA"""
+        return self.throughput_from_times([packet_timestamp(p) for p in packets],
+                                          [p.get('length', 0) for p in packets])
+    
+    def throughput_from_times(self, times, lengths):
+        """Przepustowość w oknach czasowych na podstawie tablic czasów i długości pakietów"""
+        times = np.asarray(times, dtype=np.float64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        
+        if len(times) == 0:
+            return {
+                'avg_throughput': 0,
+                'peak_throughput': 0,
+                'time_labels': [],
+                'bytes_per_second': [],
+                'packets_per_second': []
+            }
+        
+        # Zakres czasowy (kolejność pakietów nie ma znaczenia dla sum w oknach)
+        start_time = float(times.min())
+        end_time = float(times.max())
+        total_bytes = int(lengths.sum())
+        
+        if end_time == start_time or start_time == 0:
+            # Jeśli wszystkie pakiety mają ten sam czas lub błędny czas
+            return {
+                'avg_throughput': total_bytes,
+                'peak_throughput': total_bytes,
+                'time_labels': ['0s'],
+                'bytes_per_second': [total_bytes],
+                'packets_per_second': [len(times)]
+            }
+        
+        # Podziel na okna czasowe
+        duration = end_time - start_time
+        if duration < 10:  # mniej niż 10 sekund
+            window_size = max(0.1, duration / 50)  # max 50 okien
+        else:
+            window_size = max(1.0, duration / 100)  # max 100 okien
+        
+        has_time = times != 0
+        window_index = ((times[has_time] - start_time) / window_size).astype(np.int64)
+        window_bytes = np.bincount(window_index, weights=lengths[has_time])
+        window_packets = np.bincount(window_index)
+        
+        # Przygotuj dane dla wykresu
+        bytes_per_second = (window_bytes / window_size).astype(np.int64).tolist()
+        packets_per_second = (window_packets / window_size).astype(np.int64).tolist()
+        
+        time_labels = []
+        for i in range(len(window_packets)):
+            # Format etykiety czasowej
+            if duration < 60:  # mniej niż minuta
+                time_label = f"{(i * window_size):.1f}s"
+            elif duration < 3600:  # mniej niż godzina
+                minutes = int((i * window_size) // 60)
+                seconds = int((i * window_size) % 60)
+                time_label = f"{minutes:02d}:{seconds:02d}"
+            else:  # więcej niż godzina
+                hours = int((i * window_size) // 3600)
+                minutes = int(((i * window_size) % 3600) // 60)
+                time_label = f"{hours}h {minutes:02d}m"
+            
+            time_labels.append(time_label)
+        
+        # Oblicz średnią i szczytową przepustowość
+        avg_throughput = total_bytes / duration if duration > 0 else 0
+        peak_throughput = max(bytes_per_second) if bytes_per_second else 0
+        
+        return {
+            'avg_throughput': int(avg_throughput),
+            'peak_throughput': int(peak_throughput),
+            'time_labels': time_labels,
+            'bytes_per_second': bytes_per_second,
+            'packets_per_second': packets_per_second
+        }
+    
+    def calculate_network_load(self, packets):
+        total_bytes = sum(p.get('length', 0) for p in packets)
+        header_overhead = 0
+        
+        for packet in packets:
+            overhead = 14  # Ethernet
+            if 'ip' in packet:
+                overhead += 20
+            if 'tcp' in packet:
+                overhead += 20
+            elif 'udp' in packet:
+                overhead += 8
+            header_overhead += overhead
+        
+        payload_bytes = total_bytes - header_overhead
+        
+        return {
+            'total_bytes': total_bytes,
+            'header_overhead': header_overhead,
+            'payload_efficiency': (payload_bytes / total_bytes * 100) if total_bytes > 0 else 0
+        }
+    
+    def calculate_protocol_payload(self, packets):
+        protocol_stats = {}
+        
+        for packet in packets:
+            if 'tcp' in packet:
+                proto = 'TCP'
+            elif 'udp' in packet:
+                proto = 'UDP'
+            elif 'ip' in packet:
+                proto = f"IP({packet['ip']['proto']})"
+            else:
+                proto = 'Other'
+            
+            if proto not in protocol_stats:
+                protocol_stats[proto] = {'total': 0, 'packets': 0}
+            
+            protocol_stats[proto]['packets'] += 1
+            protocol_stats[proto]['total'] += packet.get('length', 0)
+        
+        return protocol_stats
+    
+    def calculate_mac_protocol_stats(self, packets):
+        """Oblicza statystyki protokołów dla każdego adresu MAC"""
+        mac_stats = {}
+        
+        for packet in packets:
+            if 'ethernet' not in packet:
+                continue
+                
+            src_mac = packet['ethernet']['src']
+            dst_mac = packet['ethernet']['dst']
+            
+            # Określ protokół
+            if 'tcp' in packet:
+                protocol = 'TCP'
+            elif 'udp' in packet:
+                protocol = 'UDP'
+            elif 'ip' in packet:
+                protocol = 'Other'
+            else:
+                protocol = 'Other'
+            
+            # Zliczaj dla src_mac
+            if src_mac not in mac_stats:
+                mac_stats[src_mac] = {'TCP': 0, 'UDP': 0, 'Other': 0}
+            mac_stats[src_mac][protocol] += 1
+            
+            # Zliczaj dla dst_mac
+            if dst_mac not in mac_stats:
+                mac_stats[dst_mac] = {'TCP': 0, 'UDP': 0, 'Other': 0}
+            mac_stats[dst_mac][protocol] += 1
+        
+        return mac_stats
+
+    def build_enhanced_mac_graph(self, packets, mac_protocol_stats):
+        """Buduje ulepszony graf MAC z informacjami o protokołach"""
+        enhanced_mac_graph = {
+            'nodes': [],
+            'edges': []
+        }
+        
+        if not packets or not mac_protocol_stats:
+            return enhanced_mac_graph
+        
+        enhanced_mac_graph['nodes'] = self.build_enhanced_mac_nodes(mac_protocol_stats)
+        
+        # Przygotuj krawędzie z informacjami o komunikacji
+        edges_data = {}
+        
+        for packet in packets:
+            if 'ethernet' not in packet:
+                continue
+                
+            src_mac = packet['ethernet']['src']
+            dst_mac = packet['ethernet']['dst']
+            
+            # Sprawdź czy oba MAC są w naszych węzłach
+            if src_mac not in mac_protocol_stats or dst_mac not in mac_protocol_stats:
+                continue
+            
+            edge_key = f"{src_mac}->{dst_mac}"
+            
+            # Określ protokół krawędzi
+            if 'tcp' in packet:
+                edge_protocol = 'TCP'
+            elif 'udp' in packet:
+                edge_protocol = 'UDP'
+            elif 'ip' in packet:
+                edge_protocol = f"IP({packet['ip'].get('proto', '?')})"
+            else:
+                edge_protocol = 'Other'
+            
+            if edge_key not in edges_data:
+                edges_data[edge_key] = {
+                    'from': src_mac,
+                    'to': dst_mac,
+                    'value': 0,
+                    'protocols': {}
+                }
+            
+            edges_data[edge_key]['value'] += 1
+            edges_data[edge_key]['protocols'][edge_protocol] = True
+        
+        enhanced_mac_graph['edges'] = self.format_enhanced_mac_edges(edges_data)
+        
+        return enhanced_mac_graph
+
+
+# Sekcje liczone z kubełków czasu i szkiców KLL - porównywane z referencją z tolerancją
+APPROXIMATE_KEYS = ('time_distribution', 'throughput_stats', 'packet_size_distribution',
+                    'packet_size_quantiles', 'inter_arrival_quantiles', 'quantile_errors')
+
+
+def exact_differences(stats, reference):
+    """Klucze (poza sekcjami przybliżonymi), w których wynik różni się od referencji"""
+    return [key for key in reference
+            if key not in APPROXIMATE_KEYS and json.dumps(stats.get(key)) != json.dumps(reference[key])]
+
+
+def window_deviation(values, reference):
+    """Największe odchylenie okna czasowego względem referencji (ułamek wszystkich pakietów/bajtów)"""
+    values, reference = np.asarray(values, dtype=np.float64), np.asarray(reference, dtype=np.float64)
+    if values.shape != reference.shape or not reference.sum():
+        return float('nan')
+    return float(np.abs(values - reference).max() / reference.sum())
+
+
+def bench_stats(args):
+    analyzer = PcapAnalyzer('raw')
+    packets = list(islice(analyzer.iter_packets(args.file), args.packets))
+    count = len(packets)
+    print(f"Plik: {args.file}, pakietów: {count:,}")
+    
+    generator = StatsGenerator()
+    reference = timed_stats("wieloprzebiegowo (referencja)", MultipassStatsGenerator().generate_stats,
+                            count, packets)
+    fused = timed_stats("jeden przebieg", generator.generate_stats, count, packets)
+    sketched = timed_stats("jeden przebieg (szkice TOP)", StatsGenerator(sketch=Config.STATS_SKETCH).generate_stats,
+                           count, packets)
+    print(f"  maksymalny błąd TOP IP: ±{sketched['sketch_errors']['top_ips']['max_error']} pakietów")
+    
+    table = PacketTable.from_records(packets)
+    timed_stats("PacketTable (NumPy)", generator.generate_stats, count, table)
+    
+    chunk = max(1, count // args.chunks)
+    partials = timed_stats(f"agregaty częściowe ({args.chunks})", lambda: [
+        generator.accumulator().add_table(table.take(slice(i, i + chunk))) for i in range(0, count, chunk)
+    ], count)
+    merged = timed_stats("merge + finalize", generator.merge_stats, count, partials)
+    
+    differences = exact_differences(fused, reference)
+    if differences:
+        print(f"UWAGA: wynik jednoprzebiegowy różni się od wieloprzebiegowego: {', '.join(differences)}")
+    print(f"  odchylenie rozkładu czasowego: "
+          f"{window_deviation(fused['time_distribution']['values'], reference['time_distribution']['values']):.2%}")
+    print(f"  odchylenie przepustowości: "
+          f"{window_deviation(fused['throughput_stats']['bytes_per_second'], reference['throughput_stats']['bytes_per_second']):.2%}")
+    for key in ('packet_size_quantiles', 'inter_arrival_quantiles'):
+        print(f"  {key}: {fused[key]} (referencja {reference[key]})")
+    if json.dumps(merged) != json.dumps(fused):
+        print("UWAGA: połączone agregaty częściowe różnią się od jednego przebiegu!")
+
+
+def bench_timeseries(args):
+    """Kubełkowanie czasów (throughput + rozkład czasowy) i szkic wielkości na syntetycznych tablicach"""
+    rng = np.random.default_rng(1)
+    times = 1700000000.0 + np.sort(rng.random(args.packets)) * 3600
+    lengths = rng.integers(60, 1514, args.packets)
+    print(f"Pakietów: {args.packets:,}")
+    
+    def fill_buckets():
+        buckets = TimeBuckets()
+        for start in range(0, args.packets, CHUNK_SIZE):
+            buckets.add(times[start:start + CHUNK_SIZE], lengths[start:start + CHUNK_SIZE])
+        return buckets
+    
+    def fill_sketch():
+        sketch = KllSketch(QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL)
+        for start in range(0, args.packets, CHUNK_SIZE):
+            sketch.add_many(lengths[start:start + CHUNK_SIZE].astype(np.float64))
+        return sketch
+    
+    generator = StatsGenerator()
+    buckets = timed_stats("TimeBuckets.add", fill_buckets, args.packets)
+    timed_stats("throughput_from_buckets", generator.throughput_from_buckets, args.packets,
+                buckets, args.packets, int(lengths.sum()))
+    timed_stats("time_distribution_from_buckets", generator.time_distribution_from_buckets, args.packets,
+                buckets, args.packets)
+    sketch = timed_stats("KllSketch.add_many", fill_sketch, args.packets)
+    timed_stats("calculate_size_distribution", generator.calculate_size_distribution, args.packets, sketch)
+
+
+def bench_storage(args):
+    """Rozmiar zapisanych statystyk i czas get_analysis dla każdego formatu zapisu"""
+    table = PcapAnalyzer().analyze_table(args.file)
+    stats = StatsGenerator().generate_table_stats(table)
+    print(f"Pakietów: {len(table):,}")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name in STORAGE_FORMATS:
+            db = Database(os.path.join(temp_dir, f'{name}.db'), name)
+            analysis_id = db.save_analysis(name, table, stats)
+            with db.get_connection() as conn:
+                size = conn.execute('SELECT length(statistics) FROM analyses WHERE id = ?',
+                                    (analysis_id,)).fetchone()[0]
+            
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                db.get_analysis(analysis_id)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            print(f"{name:>5}: statystyki {size / 1024:10.1f} KiB, get_analysis {elapsed * 1000:8.1f} ms")
+
+
+# Porównywane ustawienia: dawne (rollback journal, domyślne pragmy) i obecne (WAL + pragmy)
+CONCURRENCY_SETUPS = (
+    ('rollback', {'journal_mode': 'delete', 'pragmas': ()}),
+    ('wal', {'journal_mode': 'wal', 'pragmas': CONNECTION_PRAGMAS}),
+)
+
+
+def concurrency_reader(db_path, setup, analysis_id, interval, writing, results):
+    """Proces czytający: get_analysis + strona pakietów co interval sekund, dopóki trwa zapis"""
+    db = Database(db_path, **setup)
+    latencies = []
+    errors = 0
+    writing.wait()
+    while writing.is_set():
+        start = time.perf_counter()
+        try:
+            db.get_analysis(analysis_id)
+            table = db.get_packet_table(analysis_id)
+            list(table.records(table.data[1000:1025]))
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+        time.sleep(interval)
+    results.put((latencies, errors))
+
+
+def bench_concurrency(args):
+    """
+    Opóźnienia odczytów w trakcie zapisu dużych analiz - czytelnicy w osobnych procesach
+    (jak kilka workerów serwera), więc mierzone są blokady SQLite, a nie GIL
+    """
+    table = PcapAnalyzer().analyze_table(args.file)
+    generator = StatsGenerator()
+    stats = generator.generate_table_stats(table, generator.core_sections())
+    print(f"Pakietów na zapis: {len(table):,}, zapisów: {args.writes}, procesów czytających: {args.readers}")
+    
+    for name, setup in CONCURRENCY_SETUPS:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, 'concurrency.db')
+            db = Database(db_path, **setup)
+            analysis_id = db.save_analysis('read', table, stats)
+            
+            writing = multiprocessing.Event()
+            results = multiprocessing.Queue()
+            readers = [multiprocessing.Process(target=concurrency_reader,
+                                               args=(db_path, setup, analysis_id, args.interval, writing, results))
+                       for _ in range(args.readers)]
+            for reader in readers:
+                reader.start()
+            
+            writing.set()
+            write_start = time.perf_counter()
+            for i in range(args.writes):
+                db.save_analysis(f'write {i}', table, stats)
+            write_time = time.perf_counter() - write_start
+            writing.clear()
+            
+            latencies = []
+            errors = 0
+            for _ in readers:
+                reader_latencies, reader_errors = results.get()
+                latencies.extend(reader_latencies)
+                errors += reader_errors
+            for reader in readers:
+                reader.join()
+            
+            latencies = np.array(latencies) * 1000
+            print(f"{name:>8}: zapis {write_time:6.2f} s, odczytów {len(latencies):6d}, "
+                  f"p50 {np.percentile(latencies, 50):7.1f} ms, p99 {np.percentile(latencies, 99):7.1f} ms, "
+                  f"max {latencies.max():7.1f} ms, błędów {errors}")
+
+
+def filter_sets(table):
+    """Typowe filtry panelu pakietów dopasowane do zawartości przechwycenia"""
+    times = table.data['time']
+    middle = datetime.fromtimestamp(float(np.median(times)) if len(times) else 0).isoformat()
+    return {
+        'protokół': {'protocol': 'TCP'},
+        'port + długość': {'port': '443', 'lengthMin': '100', 'lengthMax': '1400'},
+        'IP + MAC': {'srcIp': '192.168', 'dstMac': 'ff'},
+        'czas': {'timeStart': middle},
+        'wszystkie': {'protocol': 'UDP', 'port': '53', 'lengthMin': '60', 'srcIp': '1', 'dstMac': ':',
+                      'timeStart': middle},
+        'wyrażenie': {'expression': 'ip.src in 10.0.0.0/8 and (tcp.port == 443 or udp.port == 53) '
+                                    'and frame.len > 1000'}
+    }
+
+
+def bench_filters(args):
+    """
+    Filtrowanie listy słowników pakietów i PacketTable: filtr sprawdzany od nowa dla
+    każdego pakietu (packet_matches_filters), skompilowany raz (compile) i maska kolumn.
+    Wyrażenia są liczone tylko na kolumnach - dla listy mierzona jest zamiana na PacketTable
+    i maska (filter_packets)
+    """
+    table = PcapAnalyzer().analyze_table(args.file)
+    records = table.to_records()
+    # Lista i tabela powielone do zadanej liczby pakietów (słowniki współdzielone)
+    packets = [records[i % len(records)] for i in range(args.packets)]
+    big_table = PacketTable(np.resize(table.data, args.packets), table.vendors, table.payloads)
+    print(f"Plik: {args.file}, pakietów: {len(packets):,}")
+    
+    packet_filter = PacketFilter()
+    for name, filters in filter_sets(table).items():
+        print(f"{name}: {filters}")
+        compiled = packet_filter.compile(filters)
+        if compiled.needs_table:
+            listed = timed_stats("  lista -> PacketTable + maska", packet_filter.filter_packets, len(packets),
+                                 packets, filters)
+            mask = timed_stats("  maska kolumn (PacketTable)", compiled.mask, len(packets), big_table)
+            if len(listed) != int(mask.sum()):
+                print("UWAGA: wyniki filtrowania różnią się!")
+            continue
+        
+        slow = timed_stats("  per pakiet", lambda: [packet for packet in packets
+                                                    if packet_filter.packet_matches_filters(packet, filters)],
+                           len(packets))
+        fast = timed_stats("  skompilowany predykat", lambda: [packet for packet in packets if compiled(packet)],
+                           len(packets))
+        mask = timed_stats("  maska kolumn (PacketTable)", compiled.mask, len(packets), big_table)
+        if not (len(slow) == len(fast) == int(mask.sum())):
+            print("UWAGA: wyniki filtrowania różnią się!")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarki Wizualizera Ruchu Sieciowego')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help='generuje syntetyczny plik pcap')
+    generate.add_argument('file')
+    generate.add_argument('--packets', type=int, default=1000000)
+    generate.set_defaults(func=lambda args: generate_capture(args.file, args.packets))
+
+    parse = subparsers.add_parser('parse', help='porównuje silniki parsowania')
+    parse.add_argument('file')
+    parse.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parse.add_argument('--skip-scapy', action='store_true', help='pomija wolną ścieżkę scapy')
+    parse.set_defaults(func=bench_parse)
+
+    compressed = subparsers.add_parser('compressed', help='strumieniowe rozpakowywanie vs rozpakowanie na dysk')
+    compressed.add_argument('file')
+    compressed.add_argument('--formats', nargs='+', default=['gz', 'bz2', 'xz', 'zst'],
+                            choices=['gz', 'bz2', 'xz', 'zst'])
+    compressed.set_defaults(func=bench_compressed)
+    
+    stats = subparsers.add_parser('stats', help='porównuje silniki statystyk')
+    stats.add_argument('file')
+    stats.add_argument('--packets', type=int, default=None, help='limit liczby pakietów')
+    stats.add_argument('--chunks', type=int, default=8, help='liczba porcji dla agregatów częściowych')
+    stats.set_defaults(func=bench_stats)
+    
+    timeseries = subparsers.add_parser('timeseries', help='wektorowe statystyki czasowe')
+    timeseries.add_argument('--packets', type=int, default=10000000)
+    timeseries.set_defaults(func=bench_timeseries)
+    
+    storage = subparsers.add_parser('storage', help='formaty zapisu statystyk w bazie')
+    storage.add_argument('file')
+    storage.add_argument('--repeat', type=int, default=5)
+    storage.set_defaults(func=bench_storage)
+    
+    concurrency = subparsers.add_parser('concurrency', help='odczyty w trakcie zapisu (WAL vs rollback journal)')
+    concurrency.add_argument('file')
+    concurrency.add_argument('--readers', type=int, default=4)
+    concurrency.add_argument('--writes', type=int, default=3)
+    concurrency.add_argument('--interval', type=float, default=0.05, help='przerwa między odczytami (s)')
+    concurrency.set_defaults(func=bench_concurrency)
+    
+    filters = subparsers.add_parser('filters', help='filtry pakietów: per pakiet, skompilowane, maska kolumn')
+    filters.add_argument('file')
+    filters.add_argument('--packets', type=int, default=1000000)
+    filters.set_defaults(func=bench_filters)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
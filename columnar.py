@@ -0,0 +1,265 @@
+import json
+import os
+import shutil
+import tempfile
+import zlib
+import numpy as np
+from packet_table import PacketTable, PACKET_DTYPE, CHUNK_SIZE, LAYER_PAYLOAD
+
+# Kolumny zapisywane na dysku - payload_id dotyczy tylko tabel w pamięci (bajty są w payloads.bin)
+STORED_COLUMNS = tuple(name for name in PACKET_DTYPE.names if name != 'payload_id')
+
+
+class ColumnarData:
+    """Kolumny analizy (pliki .npy mapowane w pamięć) udające tablicę strukturalną PACKET_DTYPE"""
+
+    dtype = PACKET_DTYPE
+
+    def __init__(self, path, length, index=None, columns=None):
+        self.path = path
+        self.length = length
+        self.index = index
+        self.columns = columns if columns is not None else {}
+
+    def __len__(self):
+        if self.index is None:
+            return self.length
+        if isinstance(self.index, slice):
+            return len(range(*self.index.indices(self.length)))
+        return len(self.index)
+
+    def column(self, name):
+        """Cała kolumna (np.memmap) - pliki otwierane raz na tabelę"""
+        if name not in self.columns:
+            if name == 'payload_id':
+                self.columns[name] = np.full(self.length, -1, dtype=np.int32)
+            else:
+                self.columns[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return self.columns[name]
+
+    def rows(self):
+        """Numery wierszy widoku w pełnej tabeli"""
+        if self.index is None:
+            return np.arange(self.length)
+        if isinstance(self.index, slice):
+            return np.arange(self.length)[self.index]
+        return self.index
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            column = self.column(key)
+            return column if self.index is None else column[self.index]
+
+        if isinstance(key, slice) and (self.index is None or isinstance(self.index, slice)):
+            # Wycinek wycinka zostaje wycinkiem - bez materializacji numerów wierszy
+            rows = range(self.length)[self.index] if self.index is not None else range(self.length)
+            rows = rows[key]
+            if rows.step > 0:
+                return ColumnarData(self.path, self.length, slice(rows.start, rows.stop, rows.step), self.columns)
+            return ColumnarData(self.path, self.length, np.arange(rows.start, rows.stop, rows.step), self.columns)
+
+        return ColumnarData(self.path, self.length, self.rows()[key], self.columns)
+
+
+class ColumnStore:
+    """Pliki kolumnowe analiz: <root>/<id>/<kolumna>.npy, vendors.json i skompresowane payloady"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def full_path(self, name):
+        return os.path.join(self.root, name)
+
+    def writer(self):
+        """ColumnWriter zapisujący nową analizę porcjami (nazwa katalogu podawana w finish)"""
+        return ColumnWriter(self)
+
+    def write(self, name, table, payload_sizes=None, payloads=None, keep_existing=False):
+        """Zapisuje PacketTable pod nazwą name (migracje podają payloady osobno i keep_existing=True)"""
+        writer = self.writer()
+        try:
+            writer.append(table, payload_sizes, payloads)
+        except Exception:
+            writer.abort()
+            raise
+        return writer.finish(name, keep_existing)
+
+    def open(self, name):
+        """PacketTable na kolumnach mapowanych w pamięć (bez bajtów payloadu)"""
+        path = self.full_path(name)
+        with open(os.path.join(path, 'vendors.json')) as f:
+            vendors = json.load(f)
+        header = np.load(os.path.join(path, 'packet_number.npy'), mmap_mode='r')
+        length = len(header)
+        del header
+        return PacketTable(ColumnarData(path, length), vendors)
+
+    def payload(self, name, packet_number):
+        """Bajty payloadu pakietu o danym numerze albo None"""
+        path = self.full_path(name)
+        numbers = np.load(os.path.join(path, 'packet_number.npy'), mmap_mode='r')
+        if len(numbers) == 0:
+            return None
+        row = int(np.searchsorted(numbers, packet_number))
+        if row >= len(numbers) or numbers[row] != packet_number:
+            return None
+
+        offsets = np.load(os.path.join(path, 'payload_offsets.npy'), mmap_mode='r')
+        start, end = int(offsets[row]), int(offsets[row + 1])
+        if start == end:
+            return None
+        with open(os.path.join(path, 'payloads.bin'), 'rb') as f:
+            f.seek(start)
+            return zlib.decompress(f.read(end - start))
+
+    def size(self, name=None):
+        """Bajty plików jednej analizy (albo wszystkich, gdy name=None)"""
+        total = 0
+        for directory, _, files in os.walk(self.full_path(name) if name else self.root):
+            total += sum(os.path.getsize(os.path.join(directory, file)) for file in files)
+        return total
+
+    def delete(self, name):
+        shutil.rmtree(self.full_path(name), ignore_errors=True)
+
+
+class ColumnWriter:
+    """Zapis analizy do ColumnStore porcjami - w pamięci jest tylko bieżąca PacketTable"""
+
+    def __init__(self, store):
+        self.store = store
+        self.path = tempfile.mkdtemp(prefix='.writer-', dir=store.root)
+        self.length = 0
+        self.vendors = []
+        self.vendor_ids = {}
+        self.files = {}
+        self.dtypes = {}
+        self.payload_file = open(os.path.join(self.path, 'payloads.bin'), 'wb')
+        self.payload_position = 0
+        self.write_column('payload_offsets', np.zeros(1, dtype=np.int64))
+
+    def write_column(self, name, values):
+        f = self.files.get(name)
+        if f is None:
+            f = self.files[name] = open(os.path.join(self.path, f'{name}.npy'), 'wb')
+            self.dtypes[name] = values.dtype
+            write_npy_header(f, values.dtype, 0)
+        f.write(np.ascontiguousarray(values).tobytes())
+
+    def vendor_mapping(self, vendors):
+        """Identyfikatory producentów porcji we wspólnym słowniku (-1 zostaje -1)"""
+        mapping = []
+        for vendor in vendors:
+            if vendor not in self.vendor_ids:
+                self.vendor_ids[vendor] = len(self.vendors)
+                self.vendors.append(vendor)
+            mapping.append(self.vendor_ids[vendor])
+        return np.array(mapping + [-1], dtype=np.int32)
+
+    def append(self, table, payload_sizes=None, payloads=None):
+        """Dopisuje wiersze tabeli; payload_sizes/payloads jak w ColumnStore.write (wiersze porcji)"""
+        data = table.data
+        mapping = self.vendor_mapping(table.vendors)
+        for column in STORED_COLUMNS:
+            values = data[column]
+            if column == 'layers':
+                # Bajty payloadu są osobno - records() nie sięga do table.payloads
+                values = values & np.uint8(~LAYER_PAYLOAD & 0xFF)
+            elif column in ('src_vendor', 'dst_vendor'):
+                values = mapping[values]
+            self.write_column(column, values)
+
+        if payloads is None:
+            payload_ids = data['payload_id']
+            payloads = {row: table.payloads[payload_id]
+                        for row, payload_id in enumerate(payload_ids.tolist()) if payload_id >= 0}
+            payload_sizes = np.full(len(data), -1, dtype=np.int32)
+            for row, payload in payloads.items():
+                payload_sizes[row] = len(payload)
+
+        offsets = np.empty(len(data), dtype=np.int64)
+        position = self.payload_position
+        for row in range(len(data)):
+            payload = payloads.get(row)
+            if payload:
+                block = zlib.compress(payload)
+                self.payload_file.write(block)
+                position += len(block)
+            offsets[row] = position
+        self.payload_position = position
+        self.write_column('payload_offsets', offsets)
+        self.write_column('payload_size', np.asarray(payload_sizes, dtype=np.int32))
+        self.length += len(data)
+
+    def append_stored(self, name):
+        """Dopisuje analizę z tego samego magazynu (fragment parsowania) bez ponownej kompresji payloadu"""
+        table = self.store.open(name)
+        part = table.data
+        path = self.store.full_path(name)
+        mapping = self.vendor_mapping(table.vendors)
+        offsets = np.load(os.path.join(path, 'payload_offsets.npy'), mmap_mode='r')
+        sizes = np.load(os.path.join(path, 'payload_size.npy'), mmap_mode='r')
+        for start in range(0, len(part), CHUNK_SIZE):
+            end = min(start + CHUNK_SIZE, len(part))
+            for column in STORED_COLUMNS:
+                values = part.column(column)[start:end]
+                if column in ('src_vendor', 'dst_vendor'):
+                    values = mapping[values]
+                self.write_column(column, values)
+            self.write_column('payload_offsets', offsets[start + 1:end + 1] + self.payload_position)
+            self.write_column('payload_size', sizes[start:end])
+
+        with open(os.path.join(path, 'payloads.bin'), 'rb') as f:
+            shutil.copyfileobj(f, self.payload_file)
+        self.payload_position += int(offsets[-1])
+        self.length += len(part)
+
+    def close_files(self):
+        self.payload_file.close()
+        for f in self.files.values():
+            f.close()
+
+    def finish(self, name, keep_existing=False):
+        """Domyka pliki i przenosi katalog pod nazwę name (istniejący jest zastępowany); zwraca name"""
+        try:
+            if self.length == 0:
+                # Pusta analiza - kolumny z samym nagłówkiem
+                self.append(PacketTable())
+            for column, f in self.files.items():
+                # payload_offsets ma dodatkowe przesunięcie końca ostatniego bloku
+                f.seek(0)
+                write_npy_header(f, self.dtypes[column],
+                                 self.length + 1 if column == 'payload_offsets' else self.length)
+            self.close_files()
+            with open(os.path.join(self.path, 'vendors.json'), 'w') as f:
+                json.dump(self.vendors, f)
+
+            target = self.store.full_path(name)
+            if os.path.exists(target) and keep_existing:
+                # Tylko migracja: równoległa migracja tej samej analizy zdążyła pierwsza
+                shutil.rmtree(self.path, ignore_errors=True)
+            elif os.path.exists(target):
+                # Pozostałość po usuniętej analizie o tym samym id - odsuwana i kasowana po podmianie
+                stale = tempfile.mkdtemp(prefix=f'.stale-{name}-', dir=self.store.root)
+                os.replace(target, os.path.join(stale, name))
+                os.replace(self.path, target)
+                shutil.rmtree(stale, ignore_errors=True)
+            else:
+                os.replace(self.path, target)
+        except Exception:
+            self.abort()
+            raise
+        return name
+
+    def abort(self):
+        """Porzuca niedokończony zapis (usuwa katalog tymczasowy)"""
+        self.close_files()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def write_npy_header(f, dtype, length):
+    """Nagłówek .npy jednowymiarowej kolumny - długość nagłówka nie zależy od length"""
+    header = np.lib.format.header_data_from_array_1_0(np.empty(0, dtype=dtype))
+    header['shape'] = (length,)
+    np.lib.format.write_array_header_1_0(f, header)
@@ -6,8 +6,44 @@ class Config:
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024
     DATABASE_PATH = 'analyses.db'
     
-    # Dozwolone rozszerzenia
+    # Format zapisu statystyk analiz: 'zstd' lub 'zlib' (JSON skompresowany, kilka razy mniejszy)
+    # albo 'json' (tekst). Stare wiersze JSON są czytane bez zmian.
+    STORAGE_FORMAT = 'zstd'
+    
+    # Silnik parsowania: 'raw' (szybki dekoder struct z fallbackiem do scapy) lub 'scapy'
+    PARSER_ENGINE = 'raw'
+    
+    # Równoległe parsowanie dużych plików (liczba procesów i minimalny rozmiar pliku)
+    PARSER_WORKERS = os.cpu_count() or 1
+    PARALLEL_MIN_SIZE = 32 * 1024 * 1024
+    
+    # Przybliżone liczniki TOP (Space-Saving + Count-Min) o stałej pamięci zamiast
+    # dokładnych słowników - dla przechwyceń z milionami różnych adresów/portów
+    STATS_SKETCH_MODE = False
+    STATS_SKETCH = {'capacity': 1024, 'width': 4096, 'depth': 4}
+    
+    # Limity grafów wysyłanych do przeglądarki: węzły o największym ruchu, węzły zbiorcze
+    # (podsieci /24, /64 albo prefiksy OUI adresów MAC) i najcięższe krawędzie
+    GRAPH_LIMITS = {'max_nodes': 150, 'max_aggregates': 50, 'max_edges': 500,
+                    'ipv4_prefix': 24, 'ipv6_prefix': 64}
+    
+    # Retencja (wątek w tle co interval sekund): analizy nieotwierane dłużej niż analysis_ttl
+    # i najdawniej otwierane ponad max_analyses_size, raporty/CSV w UPLOAD_FOLDER według
+    # artifact_ttl i max_artifacts_size, potem przyrostowy VACUUM bazy. None wyłącza limit.
+    # Domyślnie wyłączona i bez limitów analiz - usuwanie analiz trzeba włączyć świadomie.
+    # Wątek startuje przy uruchomieniu python app.py; pod serwerem WSGI wywołaj retention.start()
+    # albo uruchamiaj POST /admin/storage/cleanup z crona.
+    RETENTION_ENABLED = False
+    RETENTION = {'interval': 15 * 60,
+                 'analysis_ttl': None, 'max_analyses_size': None,
+                 'artifact_ttl': 24 * 3600, 'max_artifacts_size': 1024 ** 3,
+                 'vacuum_pages': 4096}
+    # Token wymagany w nagłówku X-Admin-Token przez /admin/* - bez tokenu endpointy są niedostępne
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+    
+    # Dozwolone rozszerzenia (także skompresowane, np. capture.pcap.gz, capture.pcapng.zst)
     ALLOWED_EXTENSIONS = {'pcap', 'pcapng', 'cap'}
+    COMPRESSED_EXTENSIONS = {'gz', 'xz', 'bz2', 'zst'}
     
     @staticmethod
     def init_app(app):
@@ -15,5 +51,8 @@ class Config:
         os.makedirs('static/img', exist_ok=True)
 
 def allowed_file(filename):
+    parts = filename.lower().rsplit('.', 2)
+    if len(parts) == 3 and parts[2] in Config.COMPRESSED_EXTENSIONS:
+        return parts[1] in Config.ALLOWED_EXTENSIONS
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
\ No newline at end of file
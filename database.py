@@ -1,15 +1,101 @@
+import os
 import sqlite3
 import json
-from datetime import datetime, timedelta
+import threading
+import zlib
 from contextlib import contextmanager
+import numpy as np
+from columnar import ColumnStore, ColumnWriter
+from packet_table import PacketTable, PACKET_DTYPE, CHUNK_SIZE
+
+# Kolumny dawnej tabeli packets (nazwa w bazie, nazwa w PACKET_DTYPE) - czytane tylko przy
+# przenoszeniu starszych analiz do plików kolumnowych
+PACKET_COLUMNS = (
+    ('number', 'packet_number'), ('ts', 'time'), ('length', 'length'), ('layers', 'layers'),
+    ('src_mac', 'src_mac'), ('dst_mac', 'dst_mac'), ('eth_type', 'eth_type'),
+    ('src_ip', 'src_ip'), ('dst_ip', 'dst_ip'), ('proto', 'ip_proto'), ('ttl', 'ttl'),
+    ('ip_version', 'ip_version'), ('ip_len', 'ip_len'), ('sport', 'sport'), ('dport', 'dport'),
+    ('flags', 'tcp_flags'), ('seq', 'seq'), ('ack', 'ack'), ('window', 'window'), ('udp_len', 'udp_len')
+)
+PACKET_SELECT = ', '.join(column for column, _ in PACKET_COLUMNS) + ', src_vendor, dst_vendor, payload_size'
+
+# Ustawienia każdego połączenia: WAL pozwala czytać w trakcie długiego zapisu analizy,
+# synchronous=NORMAL wystarcza przy WAL (fsync przy checkpoincie, nie przy każdym commit)
+CONNECTION_PRAGMAS = (
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -64 * 1024),            # KiB - 64 MiB pamięci podręcznej stron
+    ('mmap_size', 256 * 1024 * 1024),      # odczyt przez mapowanie pliku zamiast read()
+    ('temp_store', 'MEMORY'),
+)
+
+# Formaty zapisu statystyk (kolumna analyses.storage_format). Wartości 1 i 2 zajmował
+# wcześniej marshal (format zależny od wersji Pythona) - nie są używane ponownie.
+FORMAT_JSON = 0            # tekst JSON - analizy zapisane przed wprowadzeniem kolumny
+FORMAT_JSON_ZLIB = 3       # JSON (UTF-8) skompresowany zlib
+FORMAT_JSON_ZSTD = 4       # JSON (UTF-8) skompresowany zstd
+STORAGE_FORMATS = {'json': FORMAT_JSON, 'zlib': FORMAT_JSON_ZLIB, 'zstd': FORMAT_JSON_ZSTD}
+
+# Wartość PRAGMA auto_vacuum dla trybu INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def encode_blob(value, storage_format):
+    """Koduje słownik (statystyki) jako JSON - tekst albo bajty UTF-8 skompresowane zlib/zstd"""
+    text = json.dumps(value, separators=(',', ':'))
+    if storage_format == FORMAT_JSON:
+        return text
+    
+    raw = text.encode('utf-8')
+    if storage_format == FORMAT_JSON_ZSTD:
+        return zstd_module().ZstdCompressor(level=3).compress(raw)
+    return zlib.compress(raw, 6)
+
+
+def decode_blob(blob, storage_format):
+    if storage_format == FORMAT_JSON_ZSTD:
+        return json.loads(zstd_module().ZstdDecompressor().decompress(blob))
+    if storage_format == FORMAT_JSON_ZLIB:
+        return json.loads(zlib.decompress(blob))
+    if storage_format == FORMAT_JSON:
+        return json.loads(blob)
+    raise ValueError(f"Unsupported statistics storage format: {storage_format}")
+
+
+def zstd_module():
+    try:
+        import zstandard
+    except ImportError:
+        raise Exception("zstandard package is required for the 'zstd' storage format")
+    return zstandard
 
 class Database:
-    def __init__(self, db_path='analyses.db'):
+    def __init__(self, db_path='analyses.db', storage_format='zstd', journal_mode='wal', busy_timeout=30.0,
+                 pragmas=CONNECTION_PRAGMAS, columns_path=None):
         self.db_path = db_path
+        self.journal_mode = journal_mode
+        self.pragmas = pragmas
+        # Sekundy oczekiwania na blokadę zapisu innego połączenia, zanim zgłoszony zostanie błąd
+        self.busy_timeout = busy_timeout
+        # Jedno połączenie na wątek, używane ponownie przez kolejne wywołania
+        self.local = threading.local()
+        if storage_format not in STORAGE_FORMATS:
+            raise ValueError(f"Unknown storage format: {storage_format}")
+        self.storage_format = STORAGE_FORMATS[storage_format]
+        # Pakiety analiz w plikach kolumnowych obok bazy (analyses.db -> analyses_columns/<id>/)
+        self.columns = ColumnStore(columns_path or os.path.splitext(db_path)[0] + '_columns')
         self.init_db()
     
     def init_db(self):
         with self.get_connection() as conn:
+            # Zwolnione strony oddawane przyrostowo (incremental_vacuum) - istniejąca baza
+            # wymaga jednorazowego pełnego VACUUM, nowa przyjmuje ustawienie od razu
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                    if conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()[0]:
+                        print(f"Converting {self.db_path} to incremental auto-vacuum (one-time VACUUM)")
+                    conn.execute('VACUUM')
+            
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS analyses (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -20,43 +106,428 @@ class Database:
                     statistics TEXT
                 )
             ''')
+            # Skrót zawartości pliku - ponowne przesłanie tego samego pliku zwraca gotową analizę
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(analyses)')]
+            if 'file_hash' not in columns:
+                conn.execute('ALTER TABLE analyses ADD COLUMN file_hash TEXT')
+            # Format kolumny statistics - istniejące wiersze (DEFAULT 0) to tekst JSON
+            if 'storage_format' not in columns:
+                conn.execute('ALTER TABLE analyses ADD COLUMN storage_format INTEGER NOT NULL DEFAULT 0')
+            # Katalog plików kolumnowych z pakietami (względem ColumnStore.root); NULL - jeszcze nie przeniesione
+            if 'columns_path' not in columns:
+                conn.execute('ALTER TABLE analyses ADD COLUMN columns_path TEXT')
+            # Ostatnie otwarcie analizy - kolejność usuwania przy przekroczeniu limitu (retention.py)
+            if 'last_accessed' not in columns:
+                conn.execute('ALTER TABLE analyses ADD COLUMN last_accessed TIMESTAMP')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_analyses_file_hash ON analyses (file_hash)')
+            
+            # Dawny zapis pakietów i payloadów w SQLite - źródło jednorazowej migracji do plików kolumnowych
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS packets (
+                    analysis_id INTEGER NOT NULL,
+                    number INTEGER NOT NULL,
+                    ts REAL NOT NULL,
+                    length INTEGER NOT NULL,
+                    layers INTEGER NOT NULL,
+                    src_mac INTEGER NOT NULL,
+                    dst_mac INTEGER NOT NULL,
+                    eth_type INTEGER NOT NULL,
+                    src_vendor TEXT,
+                    dst_vendor TEXT,
+                    src_ip INTEGER NOT NULL,
+                    dst_ip INTEGER NOT NULL,
+                    proto INTEGER NOT NULL,
+                    ttl INTEGER NOT NULL,
+                    ip_version INTEGER NOT NULL,
+                    ip_len INTEGER NOT NULL,
+                    sport INTEGER NOT NULL,
+                    dport INTEGER NOT NULL,
+                    flags INTEGER NOT NULL,
+                    seq INTEGER NOT NULL,
+                    ack INTEGER NOT NULL,
+                    window INTEGER NOT NULL,
+                    udp_len INTEGER NOT NULL,
+                    payload_size INTEGER,
+                    PRIMARY KEY (analysis_id, number)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS payloads (
+                    analysis_id INTEGER NOT NULL,
+                    packet_number INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (analysis_id, packet_number)
+                ) WITHOUT ROWID
+            ''')
+            
+            # Pozycje węzłów grafów (liczone raz, signature = limity redukcji grafu)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS graph_layouts (
+                    analysis_id INTEGER NOT NULL,
+                    graph TEXT NOT NULL,
+                    signature TEXT NOT NULL,
+                    positions TEXT NOT NULL,
+                    PRIMARY KEY (analysis_id, graph)
+                ) WITHOUT ROWID
+            ''')
+            # Gotowy graf dla przeglądarki (zredukowany, z pozycjami) - widok nie redukuje pełnego grafu
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(graph_layouts)')]
+            if 'display' not in columns:
+                conn.execute('ALTER TABLE graph_layouts ADD COLUMN display TEXT')
+            
+            # Piramida agregatów ruchu w czasie - jeden wiersz na rozdzielczość
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rollups (
+                    analysis_id INTEGER NOT NULL,
+                    resolution REAL NOT NULL,
+                    start_time REAL NOT NULL,
+                    duration REAL NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (analysis_id, resolution)
+                ) WITHOUT ROWID
+            ''')
             conn.commit()
     
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
+        for name, value in self.pragmas:
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+    
     @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """Połączenie bieżącego wątku (otwierane raz); błąd w bloku wycofuje niezatwierdzone zmiany"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.connect()
         try:
             yield conn
-        finally:
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def close_connection(self):
+        """Zamyka połączenie bieżącego wątku (kolejne wywołanie otworzy nowe)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
             conn.close()
+            self.local.conn = None
     
-    def save_analysis(self, filename, packets, stats):
+    def save_analysis(self, filename, packets, stats, file_hash=None):
+        """
+        Zapisuje analizę; packets - PacketTable, pakiety w kształcie słowników albo
+        ColumnWriter z pakietami zapisanymi już porcjami (np. PcapAnalyzer.write_table)
+        """
+        if isinstance(packets, ColumnWriter):
+            writer = packets
+        else:
+            table = packets if isinstance(packets, PacketTable) else PacketTable.from_records(packets)
+            writer = self.columns.writer()
+            try:
+                writer.append(table)
+            except Exception:
+                writer.abort()
+                raise
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO analyses (filename, total_packets, statistics, file_hash, storage_format)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (filename, writer.length, encode_blob(stats, self.storage_format), file_hash,
+                      self.storage_format))
+                analysis_id = cursor.lastrowid
+                
+                # Pliki powstają przed zatwierdzeniem wiersza - baza nie wskazuje na niepełny katalog
+                columns_path = writer.finish(str(analysis_id))
+                try:
+                    cursor.execute('UPDATE analyses SET columns_path = ? WHERE id = ?', (columns_path, analysis_id))
+                    conn.commit()
+                except Exception:
+                    self.columns.delete(columns_path)
+                    raise
+                return analysis_id
+        except Exception:
+            writer.abort()
+            raise
+    
+    def packet_columns(self, conn, analysis_id):
+        """Katalog plików kolumnowych analizy (starsze analizy przenoszone przy pierwszym użyciu) albo None"""
+        row = conn.execute(
+            'SELECT columns_path, packet_data IS NOT NULL AS legacy FROM analyses WHERE id = ?',
+            (analysis_id,)
+        ).fetchone()
+        
+        if not row:
+            return None
+        if row['columns_path']:
+            return row['columns_path']
+        if row['legacy']:
+            return self.migrate_packet_data(conn, analysis_id)
+        return self.migrate_packet_rows(conn, analysis_id)
+    
+    def migrate_packet_data(self, conn, analysis_id):
+        """Analizy zapisane jako jeden blob JSON - przenosi pakiety i payloady do plików kolumnowych (raz)"""
+        packet_data = conn.execute('SELECT packet_data FROM analyses WHERE id = ?', (analysis_id,)).fetchone()[0]
+        packets = json.loads(packet_data)
+        table = PacketTable.from_records(packets)
+        
+        # Blob z osobną tabelą payloads ma w pakiecie tylko payload_size; najstarszy zapis trzyma
+        # bajty w pakiecie: payload_hex albo tekst payload (zdekodowany z errors='replace', więc
+        # bajty spoza UTF-8 zostały zastąpione już przy analizie - odtwarzany jest zapisany tekst)
+        payloads = self.stored_payloads(conn, analysis_id, [packet['packet_number'] for packet in packets])
+        sizes = []
+        for row, packet in enumerate(packets):
+            if packet.get('payload_hex'):
+                payloads[row] = bytes.fromhex(packet['payload_hex'])
+            elif packet.get('payload'):
+                payloads[row] = packet['payload'].encode('utf-8')
+            sizes.append(len(payloads[row]) if row in payloads else packet.get('payload_size', -1))
+        
+        columns_path = self.columns.write(str(analysis_id), table, sizes, payloads, keep_existing=True)
+        conn.execute('UPDATE analyses SET packet_data = NULL, columns_path = ? WHERE id = ?',
+                     (columns_path, analysis_id))
+        conn.execute('DELETE FROM payloads WHERE analysis_id = ?', (analysis_id,))
+        conn.commit()
+        print(f"Migrated {len(table)} packets of analysis {analysis_id} to columnar files")
+        return columns_path
+    
+    def migrate_packet_rows(self, conn, analysis_id):
+        """Analizy zapisane w tabelach packets/payloads - przenosi je do plików kolumnowych (raz)"""
+        vendors = []
+        vendor_ids = {None: -1}
+        chunks = []
+        sizes = []
+        
+        # Krotki zamiast sqlite3.Row (tylko dla tego kursora - połączenie jest współdzielone)
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(f'SELECT {PACKET_SELECT} FROM packets WHERE analysis_id = ? ORDER BY number', (analysis_id,))
+        while True:
+            rows = cursor.fetchmany(CHUNK_SIZE)
+            if not rows:
+                break
+            
+            columns = list(zip(*rows))
+            chunk = np.zeros(len(rows), dtype=PACKET_DTYPE)
+            for index, (_, name) in enumerate(PACKET_COLUMNS):
+                chunk[name] = columns[index]
+            for index, name in enumerate(('src_vendor', 'dst_vendor'), len(PACKET_COLUMNS)):
+                ids = []
+                for vendor in columns[index]:
+                    if vendor not in vendor_ids:
+                        vendor_ids[vendor] = len(vendors)
+                        vendors.append(vendor)
+                    ids.append(vendor_ids[vendor])
+                chunk[name] = ids
+            chunk['payload_id'] = -1
+            chunks.append(chunk)
+            sizes.extend(-1 if size is None else size for size in columns[-1])
+        
+        data = np.concatenate(chunks) if chunks else np.zeros(0, dtype=PACKET_DTYPE)
+        payloads = self.stored_payloads(conn, analysis_id, data['packet_number'].tolist())
+        
+        columns_path = self.columns.write(str(analysis_id), PacketTable(data, vendors), sizes, payloads,
+                                          keep_existing=True)
+        conn.execute('UPDATE analyses SET columns_path = ? WHERE id = ?', (columns_path, analysis_id))
+        conn.execute('DELETE FROM packets WHERE analysis_id = ?', (analysis_id,))
+        conn.execute('DELETE FROM payloads WHERE analysis_id = ?', (analysis_id,))
+        conn.commit()
+        print(f"Migrated {len(data)} packets of analysis {analysis_id} to columnar files")
+        return columns_path
+    
+    def stored_payloads(self, conn, analysis_id, packet_numbers):
+        """Bajty z dawnej tabeli payloads (bloki zlib) jako {wiersz: bajty} dla podanej kolejności pakietów"""
+        rows = {number: row for row, number in enumerate(packet_numbers)}
+        return {
+            rows[number]: zlib.decompress(blob) for number, blob in conn.execute(
+                'SELECT packet_number, data FROM payloads WHERE analysis_id = ?', (analysis_id,)
+            ) if number in rows
+        }
+    
+    def find_analysis_by_hash(self, file_hash):
+        """Zwraca id najnowszej analizy pliku o danym skrócie SHA-256 albo None"""
+        with self.get_connection() as conn:
+            row = conn.execute(
+                'SELECT id FROM analyses WHERE file_hash = ? ORDER BY id DESC LIMIT 1',
+                (file_hash,)
+            ).fetchone()
+            return row['id'] if row else None
+    
+    def get_payload(self, analysis_id, packet_number):
+        """Zwraca surowe bajty payloadu pakietu albo None"""
+        with self.get_connection() as conn:
+            columns_path = self.packet_columns(conn, analysis_id)
+        return self.columns.payload(columns_path, packet_number) if columns_path else None
+    
+    def get_graph_layout(self, analysis_id, graph, signature):
+        """Zapisane pozycje węzłów grafu albo None (brak lub policzone dla innych limitów)"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO analyses (filename, total_packets, packet_data, statistics)
-                VALUES (?, ?, ?, ?)
-            ''', (filename, len(packets), json.dumps(packets), json.dumps(stats)))
+            row = conn.execute(
+                'SELECT positions FROM graph_layouts WHERE analysis_id = ? AND graph = ? AND signature = ?',
+                (analysis_id, graph, signature)
+            ).fetchone()
+            return json.loads(row['positions']) if row else None
+    
+    def get_display_graph(self, analysis_id, graph, signature):
+        """Zapisany graf dla przeglądarki albo None"""
+        with self.get_connection() as conn:
+            row = conn.execute(
+                'SELECT display FROM graph_layouts WHERE analysis_id = ? AND graph = ? AND signature = ?',
+                (analysis_id, graph, signature)
+            ).fetchone()
+            return json.loads(row['display']) if row and row['display'] else None
+    
+    def save_graph_layout(self, analysis_id, graph, signature, positions, display=None):
+        with self.get_connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO graph_layouts (analysis_id, graph, signature, positions, display) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (analysis_id, graph, signature, json.dumps(positions),
+                 json.dumps(display) if display is not None else None)
+            )
             conn.commit()
-            return cursor.lastrowid
     
-    def get_analysis(self, analysis_id):
+    def save_rollups(self, analysis_id, start_time, duration, levels):
+        """Zapisuje poziomy piramidy: levels = {rozdzielczość: zakodowany blob}"""
+        with self.get_connection() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO rollups (analysis_id, resolution, start_time, duration, data) '
+                'VALUES (?, ?, ?, ?, ?)',
+                ((analysis_id, resolution, start_time, duration, blob) for resolution, blob in levels.items())
+            )
+            conn.commit()
+    
+    def get_rollup_range(self, analysis_id):
+        """(czas pierwszego pakietu, czas trwania) albo None, gdy piramida nie istnieje"""
+        with self.get_connection() as conn:
+            row = conn.execute(
+                'SELECT start_time, duration FROM rollups WHERE analysis_id = ? LIMIT 1',
+                (analysis_id,)
+            ).fetchone()
+            return (row['start_time'], row['duration']) if row else None
+    
+    def get_rollup(self, analysis_id, resolution):
+        with self.get_connection() as conn:
+            row = conn.execute(
+                'SELECT data FROM rollups WHERE analysis_id = ? AND resolution = ?',
+                (analysis_id, resolution)
+            ).fetchone()
+            return row['data'] if row else None
+    
+    def update_stats(self, analysis_id, sections):
+        """
+        Dopisuje sekcje (klucz -> wartość) do zapisanych statystyk analizy. Blob jest czytany
+        ponownie w transakcji BEGIN IMMEDIATE, więc równoległe doliczenie innej sekcji
+        (inny wątek lub proces) nie jest nadpisywane starszą kopią statystyk.
+        """
+        with self.get_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT statistics, storage_format FROM analyses WHERE id = ?',
+                               (analysis_id,)).fetchone()
+            if row is None:
+                conn.rollback()
+                return
+            stats = decode_blob(row['statistics'], row['storage_format'])
+            stats.update(sections)
+            conn.execute('UPDATE analyses SET statistics = ?, storage_format = ? WHERE id = ?',
+                         (encode_blob(stats, self.storage_format), self.storage_format, analysis_id))
+            conn.commit()
+    
+    def get_analysis_metadata(self, analysis_id):
+        """Nazwa pliku, data i liczba pakietów - bez dekodowania statystyk i pakietów"""
         with self.get_connection() as conn:
             row = conn.execute(
-                'SELECT * FROM analyses WHERE id = ?', 
+                'SELECT id, filename, upload_date, total_packets FROM analyses WHERE id = ?',
                 (analysis_id,)
             ).fetchone()
             
-            if row:
-                return {
-                    'id': row['id'],
-                    'filename': row['filename'],
-                    'upload_date': row['upload_date'],
-                    'packets': json.loads(row['packet_data']),
-                    'stats': json.loads(row['statistics'])
-                }
-            return None
+            if not row:
+                return None
+            return {
+                'id': row['id'],
+                'filename': row['filename'],
+                'upload_date': row['upload_date'],
+                'total_packets': row['total_packets']
+            }
+    
+    def get_stats(self, analysis_id):
+        """Same statystyki analizy albo None"""
+        with self.get_connection() as conn:
+            row = conn.execute(
+                'SELECT statistics, storage_format FROM analyses WHERE id = ?',
+                (analysis_id,)
+            ).fetchone()
+            return decode_blob(row['statistics'], row['storage_format']) if row else None
+    
+    def get_analysis(self, analysis_id):
+        """Metadane i statystyki analizy - pakiety są pobierane osobno (get_packet_table)"""
+        analysis = self.get_analysis_metadata(analysis_id)
+        if analysis:
+            analysis['stats'] = self.get_stats(analysis_id)
+        return analysis
+    
+    def get_packet_table(self, analysis_id):
+        """
+        Pakiety analizy jako PacketTable na kolumnach mapowanych w pamięć - odczytywane
+        są tylko kolumny (i strony), których dotyka wywołujący. Kolumna 'payload_size'
+        (-1 bez payloadu) jest dostępna dodatkowo przez table.data. None - brak analizy.
+        """
+        with self.get_connection() as conn:
+            columns_path = self.packet_columns(conn, analysis_id)
+        return self.columns.open(columns_path) if columns_path else None
+    
+    def touch_analysis(self, analysis_id):
+        """Zapamiętuje użycie analizy (LRU dla limitu rozmiaru)"""
+        with self.get_connection() as conn:
+            conn.execute("UPDATE analyses SET last_accessed = datetime('now', 'localtime') WHERE id = ?",
+                         (analysis_id,))
+            conn.commit()
+    
+    def analysis_usage(self):
+        """Dla każdej analizy: ostatnie użycie i zajmowane bajty (statystyki, piramida, pliki kolumnowe)"""
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT a.id, a.filename, COALESCE(a.last_accessed, a.upload_date) AS last_used, a.columns_path,
+                       LENGTH(a.statistics) + COALESCE(SUM(LENGTH(r.data)), 0) AS db_size
+                FROM analyses a LEFT JOIN rollups r ON r.analysis_id = a.id
+                GROUP BY a.id
+            ''').fetchall()
+        
+        return [{
+            'id': row['id'],
+            'filename': row['filename'],
+            'last_used': row['last_used'],
+            'size': row['db_size'] + (self.columns.size(row['columns_path']) if row['columns_path'] else 0)
+        } for row in rows]
+    
+    def storage_usage(self):
+        """Rozmiar pliku bazy, wolne strony i rozmiar pliku WAL (bajty)"""
+        with self.get_connection() as conn:
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+            freelist_count = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        wal_path = self.db_path + '-wal'
+        return {
+            'size': page_size * page_count,
+            'free': page_size * freelist_count,
+            'wal_size': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+            'columns_size': self.columns.size()
+        }
+    
+    def incremental_vacuum(self, max_pages):
+        """Oddaje do max_pages wolnych stron i skraca plik WAL - zwraca liczbę zwolnionych stron"""
+        with self.get_connection() as conn:
+            free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if free_before:
+                # executescript wykonuje pragmę do końca - execute() zwalnia tylko jedną stronę
+                conn.executescript(f'PRAGMA incremental_vacuum({int(max_pages)});')
+            freed = free_before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+            return freed
     
     def get_all_analyses(self):
         with self.get_connection() as conn:
@@ -67,5 +538,12 @@ class Database:
     
     def delete_analysis(self, analysis_id):
         with self.get_connection() as conn:
+            row = conn.execute('SELECT columns_path FROM analyses WHERE id = ?', (analysis_id,)).fetchone()
             conn.execute('DELETE FROM analyses WHERE id = ?', (analysis_id,))
-            conn.commit()
\ No newline at end of file
+            conn.execute('DELETE FROM packets WHERE analysis_id = ?', (analysis_id,))
+            conn.execute('DELETE FROM payloads WHERE analysis_id = ?', (analysis_id,))
+            conn.execute('DELETE FROM graph_layouts WHERE analysis_id = ?', (analysis_id,))
+            conn.execute('DELETE FROM rollups WHERE analysis_id = ?', (analysis_id,))
+            conn.commit()
+        if row and row['columns_path']:
+            self.columns.delete(row['columns_path'])
\ No newline at end of file
@@ -0,0 +1,449 @@
+import re
+from datetime import datetime
+import numpy as np
+from columnar import ColumnarData
+from packet_table import (LAYER_ETHERNET, LAYER_IP, LAYER_TCP, LAYER_UDP, ip_to_int, mac_to_int,
+                          int_to_ip, int_to_mac)
+
+# Pola wyrażeń (nazwy jak w Wiresharku): kolumny PacketTable (kilka = "którakolwiek"),
+# warstwa wymagana do porównania i rodzaj wartości
+FIELDS = {
+    'frame.number': (('packet_number',), 0, 'int'),
+    'frame.len': (('length',), 0, 'int'),
+    'frame.time': (('time',), 0, 'time'),
+    'eth.src': (('src_mac',), LAYER_ETHERNET, 'mac'),
+    'eth.dst': (('dst_mac',), LAYER_ETHERNET, 'mac'),
+    'eth.addr': (('src_mac', 'dst_mac'), LAYER_ETHERNET, 'mac'),
+    'eth.type': (('eth_type',), LAYER_ETHERNET, 'int'),
+    'ip.src': (('src_ip',), LAYER_IP, 'ip'),
+    'ip.dst': (('dst_ip',), LAYER_IP, 'ip'),
+    'ip.addr': (('src_ip', 'dst_ip'), LAYER_IP, 'ip'),
+    'ip.proto': (('ip_proto',), LAYER_IP, 'int'),
+    'ip.ttl': (('ttl',), LAYER_IP, 'int'),
+    'ip.len': (('ip_len',), LAYER_IP, 'int'),
+    'ip.version': (('ip_version',), LAYER_IP, 'int'),
+    'tcp.srcport': (('sport',), LAYER_TCP, 'int'),
+    'tcp.dstport': (('dport',), LAYER_TCP, 'int'),
+    'tcp.port': (('sport', 'dport'), LAYER_TCP, 'int'),
+    'tcp.flags': (('tcp_flags',), LAYER_TCP, 'int'),
+    'tcp.seq': (('seq',), LAYER_TCP, 'int'),
+    'tcp.ack': (('ack',), LAYER_TCP, 'int'),
+    'tcp.window_size': (('window',), LAYER_TCP, 'int'),
+    'udp.srcport': (('sport',), LAYER_UDP, 'int'),
+    'udp.dstport': (('dport',), LAYER_UDP, 'int'),
+    'udp.port': (('sport', 'dport'), LAYER_UDP, 'int'),
+    'udp.length': (('udp_len',), LAYER_UDP, 'int'),
+}
+# Bity flag TCP dostępne jako pola logiczne (tcp.flags.syn, tcp.flags.syn == 1)
+TCP_FLAG_BITS = {'fin': 0x01, 'syn': 0x02, 'reset': 0x04, 'push': 0x08, 'ack': 0x10, 'urg': 0x20}
+FIELDS.update({f'tcp.flags.{name}': (('tcp_flags',), LAYER_TCP, 'flag') for name in TCP_FLAG_BITS})
+
+# Same nazwy protokołów (bez porównania) - obecność warstwy
+PROTOCOLS = {'eth': LAYER_ETHERNET, 'ip': LAYER_IP, 'tcp': LAYER_TCP, 'udp': LAYER_UDP, 'icmp': LAYER_IP}
+# Nazwy protokołów jako wartości ip.proto
+PROTOCOL_NUMBERS = {'icmp': 1, 'tcp': 6, 'udp': 17, 'gre': 47, 'esp': 50, 'icmpv6': 58, 'sctp': 132}
+
+KEYWORDS = {'and': 'and', '&&': 'and', 'or': 'or', '||': 'or', 'not': 'not', '!': 'not'}
+OPERATORS = {'==': '==', 'eq': '==', '!=': '!=', 'ne': '!=', '>': '>', 'gt': '>', '<': '<', 'lt': '<',
+             '>=': '>=', 'ge': '>=', '<=': '<=', 'le': '<=', 'in': 'in', 'contains': 'contains'}
+
+TOKEN_PATTERN = re.compile(r'''\s*(?:
+    (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<symbol>==|!=|>=|<=|&&|\|\||[<>!(){},])
+  | (?P<word>[A-Za-z0-9_.:/\-]+)
+)''', re.VERBOSE)
+
+IPV4_PATTERN = re.compile(r'\d{1,3}(\.\d{1,3}){3}')
+MAC_PATTERN = re.compile(r'[0-9A-Fa-f]{2}([:-][0-9A-Fa-f]{2}){5}')
+
+# Szacunki planera: udział pasujących pakietów dla rodzaju porównania
+SELECTIVITY = {'==': 0.05, '!=': 0.9, 'in': 0.1, 'contains': 0.2, '<': 0.4, '<=': 0.4, '>': 0.4, '>=': 0.4}
+# Poniżej tego udziału wierszy kolejne warunki AND/OR liczone są tylko na nich (a nie na całej tabeli)
+SUBSET_RATIO = 0.25
+
+
+def substring_mask(column, needle, to_text):
+    """Dopasowanie podciągu liczone raz dla każdej unikalnej wartości kolumny"""
+    unique_values = np.unique(column)
+    matching = [value for value in unique_values.tolist() if needle in to_text(value)]
+    return np.isin(column, np.array(matching, dtype=column.dtype))
+
+
+def layer_mask(layers, layer):
+    """Obecność warstwy jak w PacketTable.protocol_class (TCP ma pierwszeństwo przed UDP)"""
+    if layer == LAYER_UDP:
+        return (layers & (LAYER_TCP | LAYER_UDP)) == LAYER_UDP
+    return (layers & layer) != 0
+
+
+def column_values(table, column, rows):
+    """Kolumna tabeli (wybrane wiersze) - najpierw kolumna, potem wiersze, bez kopiowania całych rekordów"""
+    values = table.data[column]
+    return values if rows is None else values[rows]
+
+
+class Presence:
+    """Sama nazwa protokołu lub pola: pakiet ma daną warstwę"""
+
+    def __init__(self, name, layer):
+        self.name = name
+        self.layer = layer
+        self.cost = 1
+        self.selectivity = 0.5
+
+    def evaluate(self, table, rows):
+        mask = layer_mask(column_values(table, 'layers', rows), self.layer)
+        if self.name == 'icmp':
+            mask &= column_values(table, 'ip_proto', rows) == 1
+            mask &= (column_values(table, 'layers', rows) & (LAYER_TCP | LAYER_UDP)) == 0
+        return mask
+
+    def describe(self):
+        return self.name
+
+
+class Comparison:
+    """Porównanie pola z wartością; pole kilku kolumn (ip.addr, tcp.port) pasuje, gdy pasuje którakolwiek"""
+
+    def __init__(self, field, operator, value, text=None):
+        self.field = field
+        self.operator = operator
+        self.value = value
+        self.text = text if text is not None else repr(value)
+        self.columns, self.layer, self.kind = FIELDS[field]
+        reads = len(self.columns) + (1 if self.layer else 0)
+        self.cost = reads * (4 if operator == 'contains' else 1)
+        self.selectivity = SELECTIVITY[operator]
+        if operator == 'in':
+            self.selectivity = min(0.9, 0.05 * len(value)) if isinstance(value, list) else 0.3
+
+    def evaluate(self, table, rows):
+        indexed = self.index_range(table, rows)
+        if indexed is not None:
+            return indexed
+
+        if self.operator == '!=':
+            # Jak w Wiresharku: żadna z kolumn pola nie jest równa wartości
+            mask = ~self.match_any(table, rows, '==')
+        else:
+            mask = self.match_any(table, rows, self.operator)
+        if self.layer:
+            mask &= layer_mask(column_values(table, 'layers', rows), self.layer)
+        return mask
+
+    def match_any(self, table, rows, operator):
+        mask = None
+        for column in self.columns:
+            values = column_values(table, column, rows)
+            if self.kind == 'flag':
+                values = (values & TCP_FLAG_BITS[self.field.rsplit('.', 1)[1]]) != 0
+            matched = self.compare(values, operator)
+            mask = matched if mask is None else mask | matched
+        return mask
+
+    def compare(self, values, operator):
+        value = self.value
+        if operator == 'contains':
+            return substring_mask(values, value, int_to_ip if self.kind == 'ip' else int_to_mac)
+        if isinstance(value, tuple):
+            # Podsieć CIDR (adres sieci, maska)
+            network, netmask = value
+            return (values & netmask) == network
+        if operator == 'in':
+            plain = [item for item in value if not isinstance(item, tuple)]
+            mask = np.isin(values, np.array(plain)) if plain else np.zeros(len(values), dtype=bool)
+            for network, netmask in (item for item in value if isinstance(item, tuple)):
+                mask |= (values & netmask) == network
+            return mask
+        if operator == '==':
+            return values == value
+        if operator == '<':
+            return values < value
+        if operator == '<=':
+            return values <= value
+        if operator == '>':
+            return values > value
+        return values >= value
+
+    def index_range(self, table, rows):
+        """Zakres frame.number w zapisanej analizie - wycinek wierszy z wyszukiwania binarnego"""
+        if self.field != 'frame.number' or rows is not None or self.operator not in ('==', '<', '<=', '>', '>='):
+            return None
+        if not isinstance(table.data, ColumnarData) or table.data.index is not None:
+            return None
+        numbers = table.data['packet_number']
+        value = self.value
+        low, high = 0, len(numbers)
+        if self.operator in ('==', '>='):
+            low = np.searchsorted(numbers, value, 'left')
+        elif self.operator == '>':
+            low = np.searchsorted(numbers, value, 'right')
+        if self.operator in ('==', '<='):
+            high = np.searchsorted(numbers, value, 'right')
+        elif self.operator == '<':
+            high = np.searchsorted(numbers, value, 'left')
+        mask = np.zeros(len(numbers), dtype=bool)
+        mask[low:high] = True
+        return mask
+
+    def describe(self):
+        return f"{self.field} {self.operator} {self.text}"
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+        self.cost = child.cost
+        self.selectivity = 1 - child.selectivity
+
+    def evaluate(self, table, rows):
+        return ~self.child.evaluate(table, rows)
+
+    def describe(self):
+        return f"not ({self.child.describe()})"
+
+
+class And:
+    """Koniunkcja: kolejne warunki liczone tylko dla wierszy jeszcze nieodrzuconych"""
+
+    def __init__(self, children):
+        self.children = children
+        self.cost = sum(child.cost for child in children)
+        self.selectivity = float(np.prod([child.selectivity for child in children]))
+
+    def evaluate(self, table, rows):
+        return self.evaluate_children(table, rows, True)
+
+    def evaluate_children(self, table, rows, conjunction):
+        size = len(table) if rows is None else len(rows)
+        result = np.full(size, conjunction, dtype=bool)
+        # Wiersze, których wynik jeszcze nie jest przesądzony (None - wszystkie)
+        undecided = None
+
+        for child in self.children:
+            if undecided is not None and len(undecided) < size * SUBSET_RATIO:
+                hits = child.evaluate(table, undecided if rows is None else rows[undecided])
+                decided = ~hits if conjunction else hits
+                result[undecided[decided]] = not conjunction
+                undecided = undecided[~decided]
+            else:
+                hits = child.evaluate(table, rows)
+                result = result & hits if conjunction else result | hits
+                undecided = np.flatnonzero(result if conjunction else ~result)
+            if len(undecided) == 0:
+                break
+        return result
+
+    def describe(self):
+        return '(' + ' and '.join(child.describe() for child in self.children) + ')'
+
+
+class Or(And):
+    """Alternatywa: jak And, ale przesądzone są wiersze już pasujące"""
+
+    def __init__(self, children):
+        super().__init__(children)
+        self.selectivity = 1 - float(np.prod([1 - child.selectivity for child in children]))
+
+    def evaluate(self, table, rows):
+        return self.evaluate_children(table, rows, False)
+
+    def describe(self):
+        return '(' + ' or '.join(child.describe() for child in self.children) + ')'
+
+
+def plan(node):
+    """Porządkuje warunki - najpierw tanie i najbardziej przesądzające wynik"""
+    if isinstance(node, Not):
+        return Not(plan(node.child))
+    if isinstance(node, Or):
+        return Or(sorted((plan(child) for child in node.children),
+                         key=lambda child: child.cost / max(child.selectivity, 1e-6)))
+    if isinstance(node, And):
+        return And(sorted((plan(child) for child in node.children),
+                          key=lambda child: child.cost / max(1 - child.selectivity, 1e-6)))
+    return node
+
+
+class FilterParser:
+    """Parser wyrażeń filtrów w stylu Wiresharka, np. ip.src in 10.0.0.0/8 and frame.len > 1000"""
+
+    # expr := or;  or := and ('or' and)*;  and := not ('and' not)*;  not := 'not' not | atom
+    # atom := '(' expr ')' | pole [operator wartość] | protokół
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = self.tokenize(text)
+        self.position = 0
+
+    def tokenize(self, text):
+        tokens = []
+        offset = 0
+        while text[offset:].strip():
+            match = TOKEN_PATTERN.match(text, offset)
+            if not match:
+                raise self.error("unexpected character", len(text) - len(text[offset:].lstrip()))
+            kind = match.lastgroup
+            tokens.append((kind, match.group(kind), match.start(kind)))
+            offset = match.end()
+        return tokens
+
+    def error(self, message, position=None):
+        if position is None:
+            position = self.tokens[self.position][2] if self.position < len(self.tokens) else len(self.text)
+        return ValueError(f"Invalid filter expression at position {position}: {message}")
+
+    def peek(self):
+        return self.tokens[self.position][1] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise self.error("empty expression")
+        node = self.parse_or()
+        if self.position < len(self.tokens):
+            raise self.error(f"unexpected '{self.peek()}'")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while KEYWORDS.get(self.peek()) == 'or':
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while KEYWORDS.get(self.peek()) == 'and':
+            self.take()
+            children.append(self.parse_not())
+        # (a and b) and c - jedna płaska lista dla planera
+        flat = [grandchild for child in children
+                for grandchild in (child.children if type(child) is And else [child])]
+        return flat[0] if len(flat) == 1 else And(flat)
+
+    def parse_not(self):
+        if KEYWORDS.get(self.peek()) == 'not':
+            self.take()
+            return Not(self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        if self.position >= len(self.tokens):
+            raise self.error("unexpected end of expression")
+        kind, token, position = self.take()
+        if token == '(':
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise self.error("missing ')'")
+            self.take()
+            return node
+
+        name = token.lower()
+        if kind != 'word' or (name not in FIELDS and name not in PROTOCOLS):
+            raise self.error(f"unknown field '{token}'", position)
+
+        operator = OPERATORS.get((self.peek() or '').lower())
+        if operator is None:
+            if name in PROTOCOLS:
+                return Presence(name, PROTOCOLS[name])
+            columns, layer, kind = FIELDS[name]
+            if kind == 'flag':
+                return Comparison(name, '==', 1, '1')
+            return Presence(name, layer)
+
+        if name not in FIELDS:
+            raise self.error(f"'{token}' cannot be compared", position)
+        self.take()
+        start = self.position
+        value = self.parse_value(name, operator)
+        text = ' '.join(token[1] for token in self.tokens[start:self.position])
+        return Comparison(name, operator, value, text)
+
+    def parse_value(self, field, operator):
+        kind = FIELDS[field][2]
+        if operator == 'contains':
+            if kind not in ('ip', 'mac'):
+                raise self.error(f"'contains' needs an address field, not {field}")
+            return self.literal_text(self.take()).lower()
+
+        # Błędy wykryte po wczytaniu wartości wskazują jej początek, a nie koniec wyrażenia
+        start = self.tokens[self.position][2] if self.position < len(self.tokens) else len(self.text)
+        if operator == 'in' and self.peek() == '{':
+            self.take()
+            values = []
+            while self.peek() not in ('}', None):
+                if self.peek() == ',':
+                    self.take()
+                    continue
+                values.append(self.parse_literal(field, allow_network=True))
+            if self.peek() != '}':
+                raise self.error("missing '}'")
+            self.take()
+            if not values:
+                raise self.error("empty set", start)
+            return values
+
+        value = self.parse_literal(field, allow_network=operator in ('==', '!=', 'in'))
+        if operator == 'in' and not isinstance(value, tuple):
+            raise self.error("'in' needs a set {...} or a network a.b.c.d/n", start)
+        if isinstance(value, tuple) and operator == '!=':
+            raise self.error("use 'not ip.addr in a.b.c.d/n' to exclude a network", start)
+        return value
+
+    def check_ip(self, text):
+        # inet_aton przyjmuje też skróty typu 1.2.3 - w filtrze to niemal zawsze pomyłka
+        if not IPV4_PATTERN.fullmatch(text):
+            raise ValueError("expected a.b.c.d")
+        return text
+
+    def literal_text(self, token):
+        kind, text, _ = token
+        if kind == 'string':
+            return re.sub(r'\\(.)', r'\1', text[1:-1])
+        if kind != 'word':
+            raise self.error(f"expected a value, got '{text}'", token[2])
+        return text
+
+    def parse_literal(self, field, allow_network=False):
+        if self.position >= len(self.tokens):
+            raise self.error("missing value")
+        token = self.take()
+        text = self.literal_text(token)
+        kind = FIELDS[field][2]
+        try:
+            if kind == 'ip':
+                if '/' in text:
+                    if not allow_network:
+                        raise ValueError("network not allowed here")
+                    address, prefix = text.split('/', 1)
+                    self.check_ip(address)
+                    prefix = int(prefix)
+                    if not 0 <= prefix <= 32:
+                        raise ValueError("prefix out of range")
+                    netmask = (0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF
+                    return ip_to_int(address) & netmask, netmask
+                return ip_to_int(self.check_ip(text))
+            if kind == 'mac':
+                if not MAC_PATTERN.fullmatch(text):
+                    raise ValueError("expected aa:bb:cc:dd:ee:ff")
+                return mac_to_int(text.replace('-', ':'))
+            if kind == 'time':
+                try:
+                    return float(text)
+                except ValueError:
+                    return datetime.fromisoformat(text).timestamp()
+            if field == 'ip.proto' and text.lower() in PROTOCOL_NUMBERS:
+                return PROTOCOL_NUMBERS[text.lower()]
+            return int(text, 0)
+        except (ValueError, OSError) as e:
+            raise self.error(f"invalid value '{text}' for {field} ({str(e)})", token[2])
+
+
+def parse_filter(text):
+    """Drzewo wyrażenia uporządkowane przez planer; ValueError z pozycją błędu"""
+    return plan(FilterParser(text).parse())
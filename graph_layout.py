@@ -0,0 +1,56 @@
+import math
+import networkx as nx
+
+
+class GraphLayout:
+    """
+    Rozmieszczenie węzłów grafu liczone raz po stronie serwera (networkx,
+    algorytm Fruchtermana-Reingolda) - przeglądarka rysuje graf z gotowymi
+    współrzędnymi x/y i wyłączoną fizyką vis.js. Pozycje są zapisywane w bazie,
+    więc kolejne otwarcia analizy nie liczą ich ponownie.
+    """
+
+    def __init__(self, iterations=50, seed=42, spacing=120):
+        self.iterations = iterations
+        self.seed = seed
+        # Przybliżona odległość między sąsiednimi węzłami (piksele vis.js)
+        self.spacing = spacing
+
+    def compute(self, graph):
+        """Słownik id węzła -> [x, y]"""
+        nodes = graph.get('nodes', [])
+        if not nodes:
+            return {}
+
+        G = nx.Graph()
+        G.add_nodes_from(node['id'] for node in nodes)
+        for edge in graph.get('edges', []):
+            if edge['from'] == edge['to'] or edge['from'] not in G or edge['to'] not in G:
+                continue
+            # Waga logarytmiczna - kilka bardzo ciężkich krawędzi nie ściąga całego grafu w punkt
+            weight = math.log1p(edge.get('value', 1))
+            if G.has_edge(edge['from'], edge['to']):
+                G[edge['from']][edge['to']]['weight'] += weight
+            else:
+                G.add_edge(edge['from'], edge['to'], weight=weight)
+
+        scale = self.spacing * math.sqrt(len(G))
+        try:
+            positions = nx.spring_layout(G, iterations=self.iterations, seed=self.seed,
+                                         weight='weight', scale=scale)
+        except ImportError:
+            # Od 500 węzłów networkx używa scipy - bez niego układ na okręgu
+            positions = nx.circular_layout(G, scale=scale)
+
+        return {node_id: [round(float(x), 1), round(float(y), 1)] for node_id, (x, y) in positions.items()}
+
+    def apply(self, graph, positions):
+        """Kopia grafu z x/y w węzłach; positioned=True, gdy znane są pozycje wszystkich węzłów"""
+        nodes = []
+        for node in graph.get('nodes', []):
+            position = positions.get(node['id'])
+            nodes.append(dict(node, x=position[0], y=position[1]) if position else node)
+
+        positioned = dict(graph, nodes=nodes)
+        positioned['positioned'] = bool(nodes) and all(node['id'] in positions for node in nodes)
+        return positioned
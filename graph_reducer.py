@@ -0,0 +1,171 @@
+import ipaddress
+
+
+class GraphReducer:
+    """
+    Redukcja grafów (network_graph, enhanced_mac_graph) przed wysłaniem do vis.js:
+    zostaje max_nodes węzłów o największym ruchu, pozostałe są zwijane w węzły
+    zbiorcze - podsieci /24 (IPv6 /64) albo prefiksy OUI adresów MAC (pierwsze
+    24 bity). Gdy podsieci jest więcej niż max_aggregates, najmniejsze trafiają do
+    jednego węzła '*'. Krawędzie między widocznymi węzłami są sumowane, a zostaje
+    max_edges najcięższych. expand() rozwija jeden węzeł zbiorczy na żądanie.
+
+    Pełny graf pozostaje w zapisanych statystykach - limity można zmieniać bez
+    ponownej analizy pliku.
+    """
+
+    OTHER_ID = '*'
+
+    def __init__(self, max_nodes=150, max_aggregates=50, max_edges=500, ipv4_prefix=24, ipv6_prefix=64):
+        self.max_nodes = max_nodes
+        self.max_aggregates = max_aggregates
+        self.max_edges = max_edges
+        self.ipv4_prefix = ipv4_prefix
+        self.ipv6_prefix = ipv6_prefix
+
+    def group_of(self, node_id, kind):
+        """Identyfikator węzła zbiorczego: podsieć adresu IP albo prefiks OUI adresu MAC"""
+        if kind == 'mac':
+            parts = str(node_id).split(':')
+            if len(parts) != 6:
+                return self.OTHER_ID
+            return ':'.join(parts[:3]) + ':00:00:00/24'
+        try:
+            address = ipaddress.ip_address(node_id)
+        except ValueError:
+            return self.OTHER_ID
+        prefix = self.ipv4_prefix if address.version == 4 else self.ipv6_prefix
+        return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+    def ranked(self, nodes):
+        # Sortowanie stabilne - przy równym ruchu kolejność pierwszego wystąpienia
+        return sorted(nodes, key=lambda node: -node.get('value', 0))
+
+    def node_groups(self, graph, kind):
+        """Mapa id węzła -> id widocznego węzła (on sam albo węzeł zbiorczy)"""
+        ranked = self.ranked(graph.get('nodes', []))
+        visible = {node['id']: node['id'] for node in ranked[:self.max_nodes]}
+
+        tail = ranked[self.max_nodes:]
+        group_values = {}
+        for node in tail:
+            group = self.group_of(node['id'], kind)
+            group_values[group] = group_values.get(group, 0) + node.get('value', 0)
+        kept = set(sorted(group_values, key=lambda group: -group_values[group])[:self.max_aggregates])
+
+        for node in tail:
+            group = self.group_of(node['id'], kind)
+            visible[node['id']] = group if group in kept else self.OTHER_ID
+        return visible
+
+    def reduce(self, graph, kind='ip'):
+        """Graf do wyświetlenia - bez zmian, jeśli mieści się w limitach"""
+        nodes = graph.get('nodes', [])
+        edges = graph.get('edges', [])
+        if len(nodes) <= self.max_nodes and len(edges) <= self.max_edges:
+            return graph
+
+        groups = self.node_groups(graph, kind)
+        reduced_nodes = [node for node in nodes if groups[node['id']] == node['id']]
+        reduced_nodes.extend(self.aggregate_nodes(nodes, groups, kind))
+        reduced_edges = self.aggregate_edges(edges, groups)
+
+        return {
+            'nodes': reduced_nodes,
+            'edges': reduced_edges,
+            'reduction': {
+                'total_nodes': len(nodes),
+                'total_edges': len(edges),
+                'shown_nodes': len(reduced_nodes),
+                'shown_edges': len(reduced_edges)
+            }
+        }
+
+    def expand(self, graph, aggregate_id, kind='ip', offset=0):
+        """
+        Rozwija węzeł zbiorczy: zwraca do max_nodes jego członków (od offset, malejąco
+        wg ruchu) i krawędzie dotykające członków. Końce krawędzi są podane jako
+        id węzła ('from', 'to') oraz id widocznego węzła zbiorczego ('from_group',
+        'to_group') - klient łączy krawędź z tym, który już wyświetla. Jeśli zostają
+        dalsi członkowie, wynik zawiera pomniejszony węzeł zbiorczy z next_offset.
+        """
+        groups = self.node_groups(graph, kind)
+        members = self.ranked([node for node in graph.get('nodes', [])
+                               if groups[node['id']] == aggregate_id and node['id'] != aggregate_id])
+        if not members:
+            return None
+
+        page = members[offset:offset + self.max_nodes]
+        rest = members[offset + self.max_nodes:]
+        shown = {node['id'] for node in members[:offset + self.max_nodes]}
+        # Krawędzie członków z wcześniejszych stron są już u klienta (jeśli nie prowadzą do tej grupy)
+        pending = {node['id'] for node in members[offset:]}
+
+        nodes = list(page)
+        if rest:
+            aggregate = self.aggregate_node(aggregate_id, rest, kind)
+            aggregate['next_offset'] = offset + self.max_nodes
+            nodes.append(aggregate)
+
+        visible = lambda node_id: node_id if node_id in shown else groups.get(node_id, node_id)
+        edges = [dict(edge, from_group=visible(edge['from']), to_group=visible(edge['to']))
+                 for edge in graph.get('edges', []) if edge['from'] in pending or edge['to'] in pending]
+        edges = sorted(edges, key=lambda edge: -edge.get('value', 0))[:self.max_edges]
+
+        return {'nodes': nodes, 'edges': edges, 'aggregate': aggregate_id, 'total_members': len(members)}
+
+    def aggregate_nodes(self, nodes, groups, kind):
+        members = {}
+        for node in nodes:
+            group = groups[node['id']]
+            if group != node['id']:
+                members.setdefault(group, []).append(node)
+        return [self.aggregate_node(group, group_members, kind) for group, group_members in members.items()]
+
+    def aggregate_node(self, group, members, kind):
+        value = sum(node.get('value', 0) for node in members)
+        label = 'Inne' if group == self.OTHER_ID else group
+        node = {
+            'id': group,
+            'label': f"{label} ({len(members)})",
+            'value': value,
+            'title': f"{label}\\nWęzły: {len(members)}\\nPakiety: {value}",
+            'aggregate': True,
+            'members': len(members)
+        }
+
+        # Graf MAC z protokołami - dominujący protokół całej grupy
+        protocol_totals = {}
+        for member in members:
+            for protocol, count in member.get('protocol_stats', {}).items():
+                protocol_totals[protocol] = protocol_totals.get(protocol, 0) + count
+        if protocol_totals:
+            node['protocol_stats'] = protocol_totals
+            node['protocol'] = max(protocol_totals, key=protocol_totals.get)
+            if kind == 'mac' and group != self.OTHER_ID:
+                node['vendor'] = members[0].get('vendor')
+        return node
+
+    def aggregate_edges(self, edges, groups):
+        """Sumuje krawędzie między widocznymi węzłami; ruch wewnątrz grupy jest pomijany"""
+        merged = {}
+        for edge in edges:
+            source = groups.get(edge['from'], edge['from'])
+            target = groups.get(edge['to'], edge['to'])
+            if source == target and source != edge['from']:
+                continue
+            key = (source, target)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = dict(edge, **{'from': source, 'to': target})
+                continue
+            current['value'] = current.get('value', 0) + edge.get('value', 0)
+            if 'protocols' in edge:
+                current['protocols'] = list(dict.fromkeys(current.get('protocols', []) + edge['protocols']))
+
+        for edge in merged.values():
+            if 'protocols' in edge:
+                edge['title'] = f"Packets: {edge['value']}\\nProtocols: {', '.join(edge['protocols'])}"
+                edge['width'] = min(10, max(1, edge['value'] / 10))
+
+        return sorted(merged.values(), key=lambda edge: -edge.get('value', 0))[:self.max_edges]
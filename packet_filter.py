@@ -1,71 +1,128 @@
 from datetime import datetime, timedelta
+import re
+import numpy as np
+from filter_expression import parse_filter, substring_mask
+from packet_table import (PacketTable, LAYER_ETHERNET, LAYER_IP, LAYER_TCP, LAYER_UDP,
+                          PROTO_TCP, PROTO_UDP, PROTO_IP, PROTO_OTHER, int_to_ip, int_to_mac)
+
+class CompiledFilter:
+    """Warunki na słownik pakietu, maski kolumn PacketTable i wyrażenie filtra (liczone na kolumnach)"""
+    
+    def __init__(self, predicates, masks, expression=None):
+        self.predicates = predicates
+        self.masks = masks
+        self.expression = expression
+    
+    @property
+    def needs_table(self):
+        return self.expression is not None
+    
+    def __bool__(self):
+        return bool(self.predicates) or self.expression is not None
+    
+    def __call__(self, packet):
+        return self.matches([packet])[0]
+    
+    def matches(self, packets):
+        """Wynik filtra dla każdego słownika z listy"""
+        if self.expression is not None:
+            hits = self.expression.evaluate(PacketTable.from_records(packets), None).tolist()
+        else:
+            hits = [True] * len(packets)
+        return [hit and all(predicate(packet) for predicate in self.predicates)
+                for packet, hit in zip(packets, hits)]
+    
+    def mask(self, table):
+        mask = np.ones(len(table), dtype=bool) if self.expression is None else self.expression.evaluate(table, None)
+        for clause in self.masks:
+            mask &= clause(table)
+        return mask
 
 class PacketFilter:
     def filter_packets(self, packets, filters):
-        filtered = []
+        compiled = self.compile(filters)
+        if isinstance(packets, PacketTable):
+            return packets.take(compiled.mask(packets))
+        if compiled.needs_table:
+            packets = list(packets)
+            return [packet for packet, keep in zip(packets, compiled.matches(packets)) if keep]
         
-        for packet in packets:
-            if self.packet_matches_filters(packet, filters):
-                filtered.append(packet)
-        
-        return filtered
+        return [packet for packet in packets if compiled(packet)]
     
     def packet_matches_filters(self, packet, filters):
-        # IP filters
-        if filters.get('srcIp'):
-            if 'ip' not in packet or filters['srcIp'] not in packet['ip'].get('src', ''):
-                return False
+        return self.compile(filters)(packet)
+    
+    def compile(self, filters):
+        """Sprawdza filtry raz (błędna wartość - ValueError) i zwraca CompiledFilter z aktywnymi warunkami"""
+        predicates = []
+        masks = []
         
-        if filters.get('dstIp'):
-            if 'ip' not in packet or filters['dstIp'] not in packet['ip'].get('dst', ''):
-                return False
+        # Wyrażenie filtra (np. "ip.src in 10.0.0.0/8 and tcp.port == 443") - drzewo po planerze
+        expression = None
+        if (filters.get('expression') or '').strip():
+            expression = parse_filter(filters['expression'])
         
-        # MAC filters
-        if filters.get('srcMac'):
-            if 'ethernet' not in packet or \
-               filters['srcMac'].lower() not in packet['ethernet'].get('src', '').lower():
-                return False
+        # IP filters
+        for key, field, column in (('srcIp', 'src', 'src_ip'), ('dstIp', 'dst', 'dst_ip')):
+            if filters.get(key):
+                needle = filters[key]
+                predicates.append(lambda packet, needle=needle, field=field:
+                                  'ip' in packet and needle in packet['ip'].get(field, ''))
+                masks.append(lambda table, needle=needle, column=column: table.has_layer(LAYER_IP) &
+                             substring_mask(table.data[column], needle, int_to_ip))
         
-        if filters.get('dstMac'):
-            if 'ethernet' not in packet or \
-               filters['dstMac'].lower() not in packet['ethernet'].get('dst', '').lower():
-                return False
+        # MAC filters
+        for key, field, column in (('srcMac', 'src', 'src_mac'), ('dstMac', 'dst', 'dst_mac')):
+            if filters.get(key):
+                needle = filters[key].lower()
+                predicates.append(lambda packet, needle=needle, field=field:
+                                  'ethernet' in packet and needle in packet['ethernet'].get(field, '').lower())
+                masks.append(lambda table, needle=needle, column=column: table.has_layer(LAYER_ETHERNET) &
+                             substring_mask(table.data[column], needle, int_to_mac))
         
         # Protocol filter
         if filters.get('protocol'):
-            packet_proto = self.get_protocol(packet)
-            if filters['protocol'] != packet_proto:
-                return False
+            protocol = filters['protocol']
+            predicates.append(lambda packet: self.get_protocol(packet) == protocol)
+            masks.append(lambda table: self.protocol_mask(table, protocol))
         
         # Port filter
         if filters.get('port'):
-            if not self.has_port(packet, int(filters['port'])):
-                return False
+            port = int(filters['port'])
+            predicates.append(lambda packet: self.has_port(packet, port))
+            masks.append(lambda table: table.has_layer(LAYER_TCP | LAYER_UDP) &
+                         ((table.data['sport'] == port) | (table.data['dport'] == port)))
         
         # Length filters
         if filters.get('lengthMin'):
-            if packet['length'] < int(filters['lengthMin']):
-                return False
+            length_min = int(filters['lengthMin'])
+            predicates.append(lambda packet: packet['length'] >= length_min)
+            masks.append(lambda table: table.data['length'] >= length_min)
         
         if filters.get('lengthMax'):
-            if packet['length'] > int(filters['lengthMax']):
-                return False
+            length_max = int(filters['lengthMax'])
+            predicates.append(lambda packet: packet['length'] <= length_max)
+            masks.append(lambda table: table.data['length'] <= length_max)
         
-        # Time filters
-        if filters.get('timeStart') or filters.get('timeEnd'):
-            packet_time = datetime.fromisoformat(packet['time'])
-            
-            if filters.get('timeStart'):
-                start_time = datetime.fromisoformat(filters['timeStart'])
-                if packet_time < start_time:
-                    return False
-            
-            if filters.get('timeEnd'):
-                end_time = datetime.fromisoformat(filters['timeEnd'])
-                if packet_time > end_time:
-                    return False
+        # Time filters - packet['time'] i kolumna 'time' to znaczniki czasu (float)
+        if filters.get('timeStart'):
+            start_time = self.parse_time(filters['timeStart'])
+            predicates.append(lambda packet: packet['time'] >= start_time)
+            masks.append(lambda table: table.data['time'] >= start_time)
         
-        return True
+        if filters.get('timeEnd'):
+            end_time = self.parse_time(filters['timeEnd'])
+            predicates.append(lambda packet: packet['time'] <= end_time)
+            masks.append(lambda table: table.data['time'] <= end_time)
+        
+        return CompiledFilter(predicates, masks, expression)
+    
+    def parse_time(self, value):
+        """Znacznik czasu z daty ISO (pole datetime-local panelu) albo liczby sekund"""
+        try:
+            return float(value)
+        except ValueError:
+            return datetime.fromisoformat(value).timestamp()
     
     def get_protocol(self, packet):
         if 'tcp' in packet:
@@ -81,4 +138,15 @@ class PacketFilter:
             return packet['tcp']['sport'] == port or packet['tcp']['dport'] == port
         elif 'udp' in packet:
             return packet['udp']['sport'] == port or packet['udp']['dport'] == port
-        return False
\ No newline at end of file
+        return False
+    
+    def protocol_mask(self, table, protocol):
+        classes = table.protocol_class()
+        named = {'TCP': PROTO_TCP, 'UDP': PROTO_UDP, 'Other': PROTO_OTHER}
+        if protocol in named:
+            return classes == named[protocol]
+        
+        match = re.fullmatch(r'IP\((\d+)\)', protocol)
+        if match:
+            return (classes == PROTO_IP) & (table.data['ip_proto'] == int(match.group(1)))
+        return np.zeros(len(table), dtype=bool)
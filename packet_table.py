@@ -0,0 +1,323 @@
+import struct
+from datetime import datetime
+from socket import inet_aton, inet_ntoa
+import numpy as np
+
+# Bity kolumny 'layers' - które sekcje słownika pakietu istnieją
+LAYER_ETHERNET = 0x01
+LAYER_IP = 0x02
+LAYER_TCP = 0x04
+LAYER_UDP = 0x08
+LAYER_PAYLOAD = 0x10
+
+# Klasy protokołów (te same nazwy co PacketFilter.get_protocol)
+PROTO_OTHER = 0
+PROTO_TCP = 1
+PROTO_UDP = 2
+PROTO_IP = 3
+
+TCP_FLAG_NAMES = "FSRPAUECN"
+TCP_FLAG_STRINGS = [
+    ''.join(name for bit, name in enumerate(TCP_FLAG_NAMES) if value & (1 << bit))
+    for value in range(512)
+]
+TCP_FLAG_VALUES = {flags: value for value, flags in enumerate(TCP_FLAG_STRINGS)}
+
+PACKET_DTYPE = np.dtype([
+    ('packet_number', np.int64),
+    ('time', np.float64),
+    ('length', np.int32),
+    ('layers', np.uint8),
+    ('src_mac', np.uint64),
+    ('dst_mac', np.uint64),
+    ('eth_type', np.uint16),
+    ('src_vendor', np.int32),
+    ('dst_vendor', np.int32),
+    ('src_ip', np.uint32),
+    ('dst_ip', np.uint32),
+    ('ip_proto', np.uint8),
+    ('ttl', np.uint8),
+    ('ip_version', np.uint8),
+    ('ip_len', np.uint16),
+    ('sport', np.uint16),
+    ('dport', np.uint16),
+    ('tcp_flags', np.uint16),
+    ('seq', np.uint32),
+    ('ack', np.uint32),
+    ('window', np.uint16),
+    ('udp_len', np.uint16),
+    ('payload_id', np.int32),
+])
+
+CHUNK_SIZE = 65536
+
+
+def ip_to_int(ip):
+    return struct.unpack('!I', inet_aton(ip))[0]
+
+
+def int_to_ip(value):
+    return inet_ntoa(struct.pack('!I', value))
+
+
+def mac_to_int(mac):
+    return int(mac.replace(':', ''), 16)
+
+
+def int_to_mac(value):
+    return value.to_bytes(6, 'big').hex(':')
+
+
+class PacketTable:
+    """
+    Kolumnowy magazyn pakietów: jedna tablica strukturalna NumPy (czasy, długości,
+    adresy jako liczby, porty, flagi TCP jako bity) oraz słownikowo kodowane kolumny
+    tekstowe (producenci MAC) oraz surowe bajty payloadu. records() odtwarza dawny
+    kształt słowników.
+    """
+
+    def __init__(self, data=None, vendors=None, payloads=None):
+        self.data = data if data is not None else np.zeros(0, dtype=PACKET_DTYPE)
+        self.vendors = vendors if vendors is not None else []
+        self.payloads = payloads if payloads is not None else []
+
+    @classmethod
+    def from_records(cls, packets):
+        builder = PacketTableBuilder()
+        for packet in packets:
+            builder.append(packet)
+        return builder.finish()
+
+    @classmethod
+    def chunked(cls, packets):
+        """Strumień słowników pakietów jako kolejne PacketTable po CHUNK_SIZE wierszy"""
+        builder = PacketTableBuilder()
+        for packet in packets:
+            builder.append(packet)
+            if builder.chunks:
+                yield builder.take()
+        if builder.rows:
+            yield builder.take()
+
+    @classmethod
+    def concatenate(cls, tables):
+        """
+        Skleja tabele w jedną (np. fragmenty z równoległego parsowania) - identyfikatory
+        producentów i payloadów są przenumerowywane na wspólne słowniki
+        """
+        vendors = []
+        vendor_ids = {}
+        payloads = []
+        parts = []
+        for table in tables:
+            mapping = []
+            for vendor in table.vendors:
+                if vendor not in vendor_ids:
+                    vendor_ids[vendor] = len(vendors)
+                    vendors.append(vendor)
+                mapping.append(vendor_ids[vendor])
+            # -1 (brak warstwy Ethernet) wskazuje ostatni element mapowania i zostaje -1
+            mapping = np.array(mapping + [-1], dtype=np.int32)
+            data = table.data.copy()
+            data['src_vendor'] = mapping[data['src_vendor']]
+            data['dst_vendor'] = mapping[data['dst_vendor']]
+            data['payload_id'] = np.where(data['payload_id'] >= 0, data['payload_id'] + len(payloads), -1)
+            payloads.extend(table.payloads)
+            parts.append(data)
+        data = np.concatenate(parts) if parts else np.zeros(0, dtype=PACKET_DTYPE)
+        return cls(data, vendors, payloads)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return next(self.records(self.data[[key]]))
+        return self.take(key)
+
+    def __iter__(self):
+        return self.records()
+
+    def column(self, name):
+        return self.data[name]
+
+    def take(self, selector):
+        """Podzbiór wierszy (maska logiczna, indeksy lub wycinek) - słowniki są współdzielone"""
+        return PacketTable(self.data[selector], self.vendors, self.payloads)
+
+    def has_layer(self, layer):
+        return (self.data['layers'] & layer) != 0
+
+    def protocol_class(self):
+        """Klasa protokołu każdego pakietu: TCP, UDP, inny IP albo Other"""
+        layers = self.data['layers']
+        classes = np.full(len(layers), PROTO_OTHER, dtype=np.uint8)
+        classes[(layers & LAYER_IP) != 0] = PROTO_IP
+        classes[(layers & LAYER_UDP) != 0] = PROTO_UDP
+        classes[(layers & LAYER_TCP) != 0] = PROTO_TCP
+        return classes
+
+    def to_records(self):
+        return list(self.records())
+
+    def records(self, data=None):
+        """Zgodność wstecz: zwraca pakiety w dawnym kształcie słowników (porcjami)"""
+        data = self.data if data is None else data
+        vendors = self.vendors
+        payloads = self.payloads
+
+        for start in range(0, len(data), CHUNK_SIZE):
+            chunk = data[start:start + CHUNK_SIZE]
+            columns = {name: chunk[name].tolist() for name in PACKET_DTYPE.names}
+
+            for i in range(len(chunk)):
+                layers = columns['layers'][i]
+                packet_time = columns['time'][i]
+                packet = {
+                    'packet_number': columns['packet_number'][i],
+                    'time': packet_time,
+                    'time_str': str(datetime.fromtimestamp(packet_time)),
+                    'length': columns['length'][i],
+                }
+
+                if layers & LAYER_ETHERNET:
+                    packet['ethernet'] = {
+                        'src': int_to_mac(columns['src_mac'][i]),
+                        'dst': int_to_mac(columns['dst_mac'][i]),
+                        'type': hex(columns['eth_type'][i]),
+                        'src_vendor': vendors[columns['src_vendor'][i]],
+                        'dst_vendor': vendors[columns['dst_vendor'][i]]
+                    }
+
+                if layers & LAYER_IP:
+                    packet['ip'] = {
+                        'src': int_to_ip(columns['src_ip'][i]),
+                        'dst': int_to_ip(columns['dst_ip'][i]),
+                        'proto': columns['ip_proto'][i],
+                        'ttl': columns['ttl'][i],
+                        'version': columns['ip_version'][i],
+                        'len': columns['ip_len'][i]
+                    }
+
+                    if layers & LAYER_TCP:
+                        flags = columns['tcp_flags'][i]
+                        packet['tcp'] = {
+                            'sport': columns['sport'][i],
+                            'dport': columns['dport'][i],
+                            'flags': TCP_FLAG_STRINGS[flags],
+                            'seq': columns['seq'][i],
+                            'ack': columns['ack'][i],
+                            'window': columns['window'][i],
+                            'flags_syn': bool(flags & 0x02),
+                            'flags_ack': bool(flags & 0x10),
+                            'flags_fin': bool(flags & 0x01),
+                            'flags_rst': bool(flags & 0x04),
+                            'flags_psh': bool(flags & 0x08),
+                            'flags_urg': bool(flags & 0x20)
+                        }
+                    elif layers & LAYER_UDP:
+                        packet['udp'] = {
+                            'sport': columns['sport'][i],
+                            'dport': columns['dport'][i],
+                            'len': columns['udp_len'][i]
+                        }
+
+                if layers & LAYER_PAYLOAD:
+                    payload = payloads[columns['payload_id'][i]]
+                    packet['payload_size'] = len(payload)
+                    packet['payload_data'] = payload
+
+                yield packet
+
+
+class PacketTableBuilder:
+    """Wypełnia PacketTable pakiet po pakiecie, trzymając wiersze w porcjach NumPy"""
+
+    def __init__(self):
+        self.chunks = []
+        self.rows = []
+        self.vendors = []
+        self.vendor_ids = {}
+        self.payloads = []
+
+    def vendor_id(self, vendor):
+        vendor_id = self.vendor_ids.get(vendor)
+        if vendor_id is None:
+            vendor_id = self.vendor_ids[vendor] = len(self.vendors)
+            self.vendors.append(vendor)
+        return vendor_id
+
+    def append(self, packet):
+        layers = 0
+        src_mac = dst_mac = eth_type = 0
+        src_vendor = dst_vendor = -1
+        src_ip = dst_ip = ip_proto = ttl = ip_version = ip_len = 0
+        sport = dport = tcp_flags = seq = ack = window = udp_len = 0
+        payload_id = -1
+
+        ethernet = packet.get('ethernet')
+        if ethernet:
+            layers |= LAYER_ETHERNET
+            src_mac = mac_to_int(ethernet['src'])
+            dst_mac = mac_to_int(ethernet['dst'])
+            eth_type = int(ethernet['type'], 16)
+            src_vendor = self.vendor_id(ethernet['src_vendor'])
+            dst_vendor = self.vendor_id(ethernet['dst_vendor'])
+
+        ip = packet.get('ip')
+        if ip:
+            layers |= LAYER_IP
+            src_ip = ip_to_int(ip['src'])
+            dst_ip = ip_to_int(ip['dst'])
+            ip_proto = ip['proto']
+            ttl = ip['ttl']
+            ip_version = ip['version']
+            ip_len = ip['len']
+
+            tcp = packet.get('tcp')
+            udp = packet.get('udp')
+            if tcp:
+                layers |= LAYER_TCP
+                sport = tcp['sport']
+                dport = tcp['dport']
+                tcp_flags = TCP_FLAG_VALUES[tcp['flags']]
+                seq = tcp['seq']
+                ack = tcp['ack']
+                window = tcp['window']
+            elif udp:
+                layers |= LAYER_UDP
+                sport = udp['sport']
+                dport = udp['dport']
+                udp_len = udp['len']
+
+        if 'payload_data' in packet:
+            layers |= LAYER_PAYLOAD
+            payload_id = len(self.payloads)
+            self.payloads.append(packet['payload_data'])
+
+        self.rows.append((
+            packet['packet_number'], packet['time'], packet['length'], layers,
+            src_mac, dst_mac, eth_type, src_vendor, dst_vendor,
+            src_ip, dst_ip, ip_proto, ttl, ip_version, ip_len,
+            sport, dport, tcp_flags, seq, ack, window, udp_len, payload_id
+        ))
+
+        if len(self.rows) >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.chunks.append(np.array(self.rows, dtype=PACKET_DTYPE))
+            self.rows = []
+
+    def finish(self):
+        self.flush()
+        data = np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=PACKET_DTYPE)
+        return PacketTable(data, self.vendors, self.payloads)
+
+    def take(self):
+        """Zebrane dotąd wiersze jako PacketTable; kolejne wiersze trafiają do nowej tabeli"""
+        table = self.finish()
+        self.chunks = []
+        self.payloads = []
+        return table
@@ -1,25 +1,201 @@
-from scapy.all import rdpcap, IP, TCP, UDP, Ether
+from scapy.all import PcapReader, IP, TCP, UDP, Ether
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import ipaddress
+import multiprocessing
+import os
+import uuid
 from mac_vendors import get_mac_vendor
+from raw_decoder import RawRecordReader, RawPacketDecoder, LINKTYPE_ETHERNET, detect_compression, open_capture
+from packet_table import PacketTable
+from columnar import ColumnStore
+
+# Procesy fragmentów nie powstają przez fork - fork procesu z wątkami (obsługa żądań Flask,
+# retencja, układy grafów) kopiuje zajęte przez nie blokady i może zakleszczyć potomka
+SHARD_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+def collect_table(packets, accumulator=None):
+    """PacketTable budowana porcjami ze strumienia pakietów; accumulator zbiera agregaty każdej porcji"""
+    tables = []
+    for table in PacketTable.chunked(packets):
+        if accumulator is not None:
+            accumulator.add_table(table)
+        tables.append(table)
+    return PacketTable.concatenate(tables)
+
+def write_chunks(packets, writer, accumulator=None):
+    """Strumień pakietów zapisywany porcjami przez ColumnWriter; accumulator zbiera agregaty każdej porcji"""
+    for table in PacketTable.chunked(packets):
+        if accumulator is not None:
+            accumulator.add_table(table)
+        writer.append(table)
+    return writer
+
+def shard_packets(analyzer, file_path, state, end, first_number):
+    with open(file_path, 'rb') as f:
+        reader = RawRecordReader.resume(f, state)
+        yield from analyzer.parse_records(reader.iter_records(end), first_number)
+
+def parse_shard(file_path, engine, state, end, first_number, accumulator=None):
+    """
+    Parsuje jeden zakres bajtów pliku do PacketTable - uruchamiane w osobnym procesie.
+    accumulator to pusty StatsAccumulator (kopia dla tego fragmentu), zwracany z agregatami.
+    """
+    packets = shard_packets(PcapAnalyzer(engine=engine), file_path, state, end, first_number)
+    return collect_table(packets, accumulator), accumulator
+
+def write_shard(file_path, engine, state, end, first_number, root, prefix, accumulator=None):
+    """
+    Jak parse_shard, ale porcje trafiają od razu do katalogu prefix-<pierwszy numer> w magazynie
+    kolumnowym root - zwraca (nazwa katalogu, accumulator), wiersze nie wracają przez pamięć
+    procesu głównego
+    """
+    writer = ColumnStore(root).writer()
+    try:
+        write_chunks(shard_packets(PcapAnalyzer(engine=engine), file_path, state, end, first_number),
+                     writer, accumulator)
+    except Exception:
+        writer.abort()
+        raise
+    return writer.finish(f'{prefix}-{first_number}'), accumulator
 
 class PcapAnalyzer:
-    def __init__(self):
+    ENGINES = ('scapy', 'raw')
+    
+    def __init__(self, engine='scapy', workers=1, parallel_min_size=32 * 1024 * 1024):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown parser engine: {engine}")
         self.packets = []
+        self.engine = engine
+        self.workers = max(1, workers or 1)
+        self.parallel_min_size = parallel_min_size
+        self.raw_decoder = RawPacketDecoder()
         
     def analyze_file(self, file_path):
+        """Wszystkie pakiety jako lista słowników (dawny interfejs; upload zapisuje porcjami przez write_table)"""
+        if self.use_sharding(file_path):
+            return self.analyze_table_sharded(file_path).to_records()
+        return list(self.iter_packets(file_path))
+    
+    def analyze_table(self, file_path, accumulator=None):
+        """
+        Parsuje plik prosto do kolumnowej PacketTable (porcjami, bez listy słowników).
+        accumulator (StatsAccumulator) zbiera przy tym agregaty statystyk.
+        """
+        if self.use_sharding(file_path):
+            return self.analyze_table_sharded(file_path, accumulator=accumulator)
+        return collect_table(self.iter_packets(file_path), accumulator)
+    
+    def write_table(self, file_path, writer, accumulator=None):
+        """
+        Parsuje plik porcjami prosto do magazynu kolumnowego (ColumnWriter) - porcja razem
+        z bajtami payloadu jest zwalniana zaraz po zapisie. Przy parsowaniu równoległym każdy
+        fragment zapisuje się do własnego katalogu, doklejanego potem porcjami przez
+        ColumnWriter.append_stored, więc pamięć nie zależy od wielkości pliku w żadnym trybie.
+        accumulator zbiera agregaty statystyk.
+        """
+        shards = self.index_shards(file_path, self.workers) if self.use_sharding(file_path) else []
+        if len(shards) <= 1:
+            return write_chunks(self.iter_packets(file_path), writer, accumulator)
+        
+        store = writer.store
+        prefix = f'.part-{uuid.uuid4().hex}'
+        results = self.map_shards(file_path, shards, write_shard, store.root, prefix, accumulator)
         try:
-            packets = rdpcap(file_path)
-            result = []
-            
-            for i, packet in enumerate(packets):
-                packet_data = self.parse_packet(packet, i + 1)
-                result.append(packet_data)
+            for name, partial in results:
+                writer.append_stored(name)
+                store.delete(name)
+                if accumulator is not None:
+                    accumulator.merge(partial)
+        except Exception as e:
+            # Zamknięcie generatora czeka na pozostałe fragmenty - potem można usunąć ich katalogi
+            results.close()
+            for _, _, first_number in shards:
+                store.delete(f'{prefix}-{first_number}')
+            raise Exception(f"Error analyzing PCAP: {str(e)}")
+        return writer
+    
+    def use_sharding(self, file_path):
+        # Skompresowanego strumienia nie da się podzielić na zakresy bajtów
+        return (self.workers > 1 and os.path.getsize(file_path) >= self.parallel_min_size
+                and detect_compression(file_path) is None)
+    
+    def analyze_table_sharded(self, file_path, num_shards=None, accumulator=None):
+        """
+        Równoległe parsowanie dużych plików: szybki przebieg po nagłówkach rekordów wyznacza
+        granice zakresów bajtów, zakresy są parsowane w ProcessPoolExecutor do osobnych
+        PacketTable, a wyniki sklejane w kolejności numerów pakietów. Każdy fragment liczy
+        własne agregaty statystyk (kopia pustego accumulator), łączone tu przez merge().
+        """
+        num_shards = num_shards or self.workers
+        if detect_compression(file_path) is not None:
+            return collect_table(self.iter_packets(file_path), accumulator)
+        try:
+            shards = self.index_shards(file_path, num_shards)
+            if len(shards) == 1:
+                return collect_table(self.iter_packets(file_path), accumulator)
             
-            return result
+            tables = []
+            for table, partial in self.map_shards(file_path, shards, parse_shard, accumulator):
+                tables.append(table)
+                if accumulator is not None:
+                    accumulator.merge(partial)
+            return PacketTable.concatenate(tables)
+        except Exception as e:
+            raise Exception(f"Error analyzing PCAP: {str(e)}")
+    
+    def index_shards(self, file_path, num_shards):
+        """(stan czytnika, koniec zakresu bajtów, numer pierwszego pakietu) dla każdego fragmentu"""
+        with open(file_path, 'rb') as f:
+            reader = RawRecordReader(f)
+            shards = reader.index_shards(num_shards, os.fstat(f.fileno()).st_size)
+        return [(state, shards[i + 1][0]['offset'] if i + 1 < len(shards) else None, first_index + 1)
+                for i, (state, first_index) in enumerate(shards)]
+    
+    def map_shards(self, file_path, shards, worker, *args):
+        """Wyniki worker(plik, silnik, stan, koniec, pierwszy numer, *args) dla fragmentów - w kolejności"""
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(shards)),
+                                 mp_context=multiprocessing.get_context(SHARD_START_METHOD)) as executor:
+            futures = [executor.submit(worker, file_path, self.engine, state, end, first_number, *args)
+                       for state, end, first_number in shards]
+            for future in futures:
+                yield future.result()
+    
+    def iter_packets(self, file_path):
+        """Strumieniowo zwraca sparsowane pakiety - w pamięci jest tylko bieżący pakiet"""
+        if self.engine == 'raw':
+            return self.iter_packets_raw(file_path)
+        return self.iter_packets_scapy(file_path)
+    
+    def iter_packets_scapy(self, file_path):
+        try:
+            with PcapReader(open_capture(file_path)) as reader:
+                for i, packet in enumerate(reader):
+                    yield self.parse_packet(packet, i + 1)
         except Exception as e:
             raise Exception(f"Error analyzing PCAP: {str(e)}")
     
+    def iter_packets_raw(self, file_path):
+        """Szybka ścieżka: nagłówki dekodowane przez struct, scapy tylko dla nieobsługiwanych ramek"""
+        try:
+            with open_capture(file_path) as f:
+                yield from self.parse_records(RawRecordReader(f), 1)
+        except Exception as e:
+            raise Exception(f"Error analyzing PCAP: {str(e)}")
+    
+    def parse_records(self, records, first_number):
+        """Zamienia surowe rekordy (dane, linktype, czas) na słowniki pakietów"""
+        decoder = self.raw_decoder
+        use_fast_path = self.engine == 'raw'
+        
+        for i, (data, linktype, packet_time) in enumerate(records, first_number):
+            packet_data = None
+            if use_fast_path and linktype == LINKTYPE_ETHERNET and packet_time is not None:
+                packet_data = decoder.decode(data, i, packet_time)
+            if packet_data is None:
+                packet_data = self.parse_packet(decoder.dissect(data, linktype, packet_time), i)
+            yield packet_data
+    
     def parse_packet(self, packet, packet_number):
         packet_time = float(packet.time)
         
@@ -72,11 +248,10 @@ class PcapAnalyzer:
                     'len': packet[UDP].len
                 }
         
-        # Obsługa payload
+        # Obsługa payload - surowe bajty trafiają do payloads.bin magazynu kolumnowego
+        # (ColumnWriter.append), w kolumnach zostaje tylko rozmiar; tekst jest dekodowany dopiero na żądanie
         if hasattr(packet, 'load') and packet.load:
-            try:
-                packet_data['payload'] = packet.load.decode('utf-8', errors='replace')
-            except:
-                packet_data['payload_hex'] = packet.load.hex()
+            packet_data['payload_size'] = len(packet.load)
+            packet_data['payload_data'] = bytes(packet.load)
         
         return packet_data
\ No newline at end of file
@@ -0,0 +1,492 @@
+import struct
+import bz2
+import gzip
+import io
+import lzma
+from decimal import Decimal
+from datetime import datetime
+from socket import inet_ntoa
+from scapy.all import conf, TCP, UDP
+from mac_vendors import get_mac_vendor
+from packet_table import TCP_FLAG_STRINGS
+
+LINKTYPE_ETHERNET = 1
+
+# Maksymalny rozmiar ramki - scapy obcina dane rekordu do MTU
+MAX_FRAME_SIZE = 0xffff
+
+PCAP_MAGICS = {
+    b"\xa1\xb2\xc3\xd4": ('>', False),
+    b"\xd4\xc3\xb2\xa1": ('<', False),
+    b"\xa1\xb2\x3c\x4d": ('>', True),
+    b"\x4d\x3c\xb2\xa1": ('<', True),
+}
+
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 1
+PCAPNG_PKT = 2
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+
+ETH_TYPE_IPV4 = 0x0800
+ETH_TYPE_IPV6 = 0x86DD
+
+# Sygnatury skompresowanych plików (rozpoznawane po zawartości, nie rozszerzeniu)
+COMPRESSION_MAGICS = (
+    (b"\x1f\x8b", 'gzip'),
+    (b"BZh", 'bzip2'),
+    (b"\xfd7zXZ\x00", 'xz'),
+    (b"\x28\xb5\x2f\xfd", 'zstd'),
+)
+
+STREAM_BUFFER_SIZE = 1024 * 1024
+
+
+def detect_compression(file_path):
+    """Zwraca rodzaj kompresji pliku ('gzip', 'bzip2', 'xz', 'zstd') albo None"""
+    with open(file_path, 'rb') as f:
+        head = f.read(6)
+    for magic, compression in COMPRESSION_MAGICS:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_capture(file_path):
+    """
+    Otwiera plik przechwytywania do odczytu, rozpakowując go strumieniowo w locie
+    (bez pliku tymczasowego), jeśli jest skompresowany.
+    """
+    compression = detect_compression(file_path)
+
+    if compression == 'gzip':
+        stream = gzip.open(file_path, 'rb')
+    elif compression == 'bzip2':
+        stream = bz2.open(file_path, 'rb')
+    elif compression == 'xz':
+        stream = lzma.open(file_path, 'rb')
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception("zstandard package is required to read .zst captures")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+    else:
+        return open(file_path, 'rb')
+
+    # Parser czyta małymi porcjami (nagłówki rekordów) - duży bufor omija narzut
+    # wywołań read() strumieni dekompresujących
+    return io.BufferedReader(stream, STREAM_BUFFER_SIZE)
+
+
+class RawRecordReader:
+    """
+    Czyta rekordy pcap/pcapng bezpośrednio z pliku, bez tworzenia obiektów scapy.
+    Śledzi pozycję w pliku, dzięki czemu plik można podzielić na zakresy bajtów
+    i wznowić czytanie od dowolnej granicy rekordu (get_state/resume).
+    """
+
+    def __init__(self, fileobj, state=None):
+        self.f = fileobj
+        self.interfaces = []
+
+        if state is not None:
+            self.restore_state(state)
+            return
+
+        magic = self.f.read(4)
+        if magic in PCAP_MAGICS:
+            self.format = 'pcap'
+            self.endian, self.nano = PCAP_MAGICS[magic]
+            header = self.f.read(20)
+            if len(header) < 20:
+                raise ValueError("Invalid pcap file (too short)")
+            self.linktype = struct.unpack(self.endian + "HHIIII", header)[5]
+            self.offset = 24
+        elif magic == struct.pack('<I', PCAPNG_SHB):
+            self.format = 'pcapng'
+            self.nano = False
+            self.linktype = None
+            self.offset = 4
+            self.read_section_header()
+        else:
+            raise ValueError(f"Not a supported capture file (bad magic: {magic!r})")
+
+    @classmethod
+    def resume(cls, fileobj, state):
+        """Tworzy czytnik ustawiony na granicy rekordu zapisanej przez get_state()"""
+        fileobj.seek(state['offset'])
+        return cls(fileobj, state=state)
+
+    def get_state(self):
+        return {
+            'format': self.format,
+            'endian': self.endian,
+            'nano': self.nano,
+            'linktype': self.linktype,
+            'interfaces': list(self.interfaces),
+            'offset': self.offset
+        }
+
+    def restore_state(self, state):
+        self.format = state['format']
+        self.endian = state['endian']
+        self.nano = state['nano']
+        self.linktype = state['linktype']
+        self.interfaces = list(state['interfaces'])
+        self.offset = state['offset']
+
+    def __iter__(self):
+        return self.iter_records()
+
+    def iter_records(self, end=None, headers_only=False):
+        """
+        Zwraca krotki (dane, linktype, czas) aż do pozycji end (lub końca pliku).
+        headers_only=True przeskakuje dane pakietów (seek) - używane przy indeksowaniu.
+        """
+        if self.format == 'pcap':
+            return self.iter_pcap_records(end, headers_only)
+        return self.iter_pcapng_records(end, headers_only)
+
+    def index_shards(self, num_shards, file_size):
+        """
+        Pierwszy, tani przebieg po nagłówkach rekordów. Zwraca listę (stan, numer pierwszego
+        pakietu) dla maksymalnie num_shards zakresów bajtów o zbliżonej wielkości.
+        """
+        shard_size = max(1, (file_size - self.offset) // max(1, num_shards))
+        shards = [(self.get_state(), 0)]
+        next_boundary = self.offset + shard_size
+
+        for count, _ in enumerate(self.iter_records(headers_only=True), 1):
+            if self.offset >= next_boundary and len(shards) < num_shards:
+                shards.append((self.get_state(), count))
+                next_boundary = self.offset + shard_size
+
+        # Ostatnia granica może wypaść na końcu pliku - pusty zakres nie jest potrzebny
+        if len(shards) > 1 and shards[-1][0]['offset'] >= self.offset:
+            shards.pop()
+        return shards
+
+    def skip(self, size):
+        self.f.seek(size, 1)
+
+    def iter_pcap_records(self, end=None, headers_only=False):
+        """Rekordy klasycznego formatu pcap"""
+        read = self.f.read
+        header_struct = struct.Struct(self.endian + "IIII")
+        linktype = self.linktype
+        power = Decimal(10) ** Decimal(-9 if self.nano else -6)
+
+        while end is None or self.offset < end:
+            header = read(16)
+            if len(header) < 16:
+                return
+            sec, frac, caplen, wirelen = header_struct.unpack(header)
+            self.offset += 16 + caplen
+
+            if headers_only:
+                self.skip(caplen)
+                yield None, linktype, None
+                continue
+
+            data = read(caplen)[:MAX_FRAME_SIZE]
+            # Ta sama arytmetyka co w scapy (Decimal), więc float jest identyczny
+            yield data, linktype, float(sec + power * frac)
+
+    def read_section_header(self):
+        """Section Header Block - ustala kolejność bajtów i zeruje listę interfejsów"""
+        header = self.f.read(8)
+        if len(header) < 8:
+            raise ValueError("Invalid pcapng file (too short)")
+
+        bom = header[4:8]
+        if bom == b"\x1a\x2b\x3c\x4d":
+            self.endian = '>'
+        elif bom == b"\x4d\x3c\x2b\x1a":
+            self.endian = '<'
+        else:
+            raise ValueError("Invalid pcapng byte order magic")
+
+        block_len = struct.unpack(self.endian + "I", header[:4])[0]
+        if block_len < 28:
+            raise ValueError("Invalid pcapng section header")
+        self.f.read(block_len - 12)
+        self.offset += block_len - 4
+        self.interfaces = []
+
+    def read_options(self, options):
+        """Parsuje opcje bloku pcapng (z tymi samymi regułami co scapy)"""
+        result = {}
+        while len(options) >= 4:
+            code, length = struct.unpack(self.endian + "HH", options[:4])
+            if code != 0 and 4 + length < len(options):
+                result[code] = options[4:4 + length]
+            if code == 0:
+                break
+            if length % 4:
+                length += 4 - (length % 4)
+            options = options[4 + length:]
+        return result
+
+    def iter_pcapng_records(self, end=None, headers_only=False):
+        """Rekordy formatu pcapng (EPB, SPB i przestarzałe PKT)"""
+        read = self.f.read
+
+        while end is None or self.offset < end:
+            header = read(8)
+            if len(header) < 8:
+                return
+
+            block_type = struct.unpack(self.endian + "I", header[:4])[0]
+            if block_type == PCAPNG_SHB:
+                # Nowa sekcja może mieć inną kolejność bajtów
+                block_len_raw = header[4:8]
+                bom = read(4)
+                self.endian = '>' if bom == b"\x1a\x2b\x3c\x4d" else '<'
+                block_len = struct.unpack(self.endian + "I", block_len_raw)[0]
+                if block_len < 28:
+                    return
+                read(block_len - 12)
+                self.offset += block_len
+                self.interfaces = []
+                continue
+
+            block_len = struct.unpack(self.endian + "I", header[4:8])[0]
+            if block_len < 12:
+                return
+
+            if headers_only and block_type in (PCAPNG_EPB, PCAPNG_SPB, PCAPNG_PKT):
+                self.skip(block_len - 8)
+                self.offset += block_len
+                yield None, None, None
+                continue
+
+            block = read(block_len - 8)
+            if len(block) < block_len - 8:
+                return
+            self.offset += block_len
+            body = block[:-4]
+
+            if block_type == PCAPNG_IDB:
+                self.read_interface(body)
+            elif block_type == PCAPNG_EPB:
+                intid, tshigh, tslow, caplen, wirelen = struct.unpack(self.endian + "5I", body[:20])
+                if intid >= len(self.interfaces):
+                    return
+                linktype, snaplen, tsresol = self.interfaces[intid]
+                packet_time = float(Decimal((tshigh << 32) + tslow) / tsresol)
+                yield body[20:20 + caplen][:MAX_FRAME_SIZE], linktype, packet_time
+            elif block_type == PCAPNG_SPB:
+                if not self.interfaces:
+                    return
+                linktype, snaplen, tsresol = self.interfaces[0]
+                wirelen = struct.unpack(self.endian + "I", body[:4])[0]
+                caplen = min(wirelen, snaplen)
+                # SPB nie zawiera znacznika czasu
+                yield body[4:4 + caplen][:MAX_FRAME_SIZE], linktype, None
+            elif block_type == PCAPNG_PKT:
+                intid, drops, tshigh, tslow, caplen, wirelen = struct.unpack(self.endian + "HH4I", body[:20])
+                if intid >= len(self.interfaces):
+                    return
+                linktype, snaplen, tsresol = self.interfaces[intid]
+                packet_time = float(Decimal((tshigh << 32) + tslow) / tsresol)
+                yield body[20:20 + caplen][:MAX_FRAME_SIZE], linktype, packet_time
+
+    def read_interface(self, body):
+        """Interface Description Block"""
+        linktype, snaplen = struct.unpack(self.endian + "HxxI", body[:8])
+        tsresol = 1000000
+        options = self.read_options(body[8:])
+        if 9 in options and len(options[9]) == 1:
+            value = options[9][0]
+            tsresol = (2 if value & 128 else 10) ** (value & 127)
+        self.interfaces.append((linktype, snaplen, tsresol))
+
+
+class RawPacketDecoder:
+    """
+    Szybki dekoder nagłówków Ethernet/IPv4/IPv6/TCP/UDP oparty na struct.
+    Zwraca rekord o tym samym kształcie co PcapAnalyzer.parse_packet albo None,
+    jeśli ramki nie da się zdekodować tak samo jak scapy (wtedy używany jest scapy).
+    """
+
+    def __init__(self):
+        self.vendor_cache = {}
+        # Porty, dla których scapy dekoduje payload jako inny protokół (DNS, NTP...) -
+        # w takim przypadku 'load' może pochodzić z innej warstwy, więc oddajemy ramkę do scapy
+        self.tcp_bound_ports = self.get_bound_ports(TCP)
+        self.udp_bound_ports = self.get_bound_ports(UDP)
+
+    def get_bound_ports(self, layer):
+        ports = set()
+        for fields, _ in layer.payload_guess:
+            ports.update(value for key, value in fields.items() if key in ('sport', 'dport'))
+        return ports
+
+    def get_vendor(self, mac):
+        vendor = self.vendor_cache.get(mac)
+        if vendor is None:
+            vendor = self.vendor_cache[mac] = get_mac_vendor(mac)
+        return vendor
+
+    def decode(self, data, packet_number, packet_time):
+        if len(data) < 14:
+            return None
+
+        eth_type = (data[12] << 8) | data[13]
+        if eth_type == ETH_TYPE_IPV4:
+            layers = self.decode_ipv4(data)
+        elif eth_type == ETH_TYPE_IPV6:
+            layers = self.decode_ipv6(data)
+        else:
+            return None
+
+        if layers is None:
+            return None
+
+        src_mac = data[6:12].hex(':')
+        dst_mac = data[0:6].hex(':')
+
+        packet_data = {
+            'packet_number': packet_number,
+            'time': packet_time,
+            'time_str': str(datetime.fromtimestamp(packet_time)),
+            'length': len(data),
+            'ethernet': {
+                'src': src_mac,
+                'dst': dst_mac,
+                'type': hex(eth_type),
+                'src_vendor': self.get_vendor(src_mac),
+                'dst_vendor': self.get_vendor(dst_mac)
+            }
+        }
+
+        ip_layer, l4_name, l4_layer, load = layers
+        if ip_layer is not None:
+            packet_data['ip'] = ip_layer
+            if l4_name is not None:
+                packet_data[l4_name] = l4_layer
+
+        if load:
+            packet_data['payload_size'] = len(load)
+            packet_data['payload_data'] = bytes(load)
+
+        return packet_data
+
+    def decode_ipv4(self, data):
+        if len(data) < 34:
+            return None
+
+        version_ihl = data[14]
+        header_len = (version_ihl & 0x0F) * 4
+        if version_ihl >> 4 != 4 or header_len < 20 or len(data) < 14 + header_len:
+            return None
+
+        total_len, flags_frag, ttl, proto = struct.unpack_from('!2xH2xHBB', data, 14)
+        # Fragmenty i nietypowe długości zostawiamy scapy
+        if flags_frag & 0x3FFF or total_len < header_len or proto not in (6, 17):
+            return None
+
+        ip_end = 14 + total_len
+        transport = data[14 + header_len:ip_end]
+        ip_padding = data[ip_end:]
+
+        decoded = self.decode_transport(proto, transport)
+        if decoded is None:
+            return None
+        l4_name, l4_layer, l4_loads = decoded
+
+        ip_layer = {
+            'src': inet_ntoa(data[26:30]),
+            'dst': inet_ntoa(data[30:34]),
+            'proto': proto,
+            'ttl': ttl,
+            'version': 4,
+            'len': total_len
+        }
+        return ip_layer, l4_name, l4_layer, self.first_load(l4_loads + (ip_padding,))
+
+    def decode_ipv6(self, data):
+        if len(data) < 54 or data[14] >> 4 != 6:
+            return None
+
+        payload_len = (data[18] << 8) | data[19]
+        next_header = data[20]
+        if payload_len == 0 or next_header not in (6, 17):
+            return None
+
+        transport = data[54:54 + payload_len]
+        ip_padding = data[54 + payload_len:]
+
+        decoded = self.decode_transport(next_header, transport)
+        if decoded is None:
+            return None
+
+        # parse_packet opisuje tylko IPv4 - dla IPv6 zostaje Ethernet i payload
+        return None, None, None, self.first_load(decoded[2] + (ip_padding,))
+
+    def decode_transport(self, proto, transport):
+        if proto == 6:
+            if len(transport) < 20:
+                return None
+            sport, dport, seq, ack, offset_flags, window = struct.unpack_from('!HHIIHH', transport)
+            header_len = (offset_flags >> 12) * 4
+            if header_len < 20 or header_len > len(transport):
+                return None
+
+            tcp_data = transport[header_len:]
+            if tcp_data and (sport in self.tcp_bound_ports or dport in self.tcp_bound_ports):
+                return None
+
+            flags = offset_flags & 0x1FF
+            tcp_layer = {
+                'sport': sport,
+                'dport': dport,
+                'flags': TCP_FLAG_STRINGS[flags],
+                'seq': seq,
+                'ack': ack,
+                'window': window,
+                'flags_syn': bool(flags & 0x02),
+                'flags_ack': bool(flags & 0x10),
+                'flags_fin': bool(flags & 0x01),
+                'flags_rst': bool(flags & 0x04),
+                'flags_psh': bool(flags & 0x08),
+                'flags_urg': bool(flags & 0x20)
+            }
+            return 'tcp', tcp_layer, (tcp_data,)
+
+        if len(transport) < 8:
+            return None
+        sport, dport, udp_len = struct.unpack_from('!HHH', transport)
+        if udp_len < 8:
+            return None
+
+        udp_data = transport[8:udp_len]
+        udp_padding = transport[udp_len:]
+        if udp_data and (sport in self.udp_bound_ports or dport in self.udp_bound_ports):
+            return None
+
+        udp_layer = {
+            'sport': sport,
+            'dport': dport,
+            'len': udp_len
+        }
+        return 'udp', udp_layer, (udp_data, udp_padding)
+
+    def first_load(self, loads):
+        """Odpowiednik packet.load w scapy - pierwsza niepusta warstwa Raw/Padding"""
+        for load in loads:
+            if load:
+                return load
+        return b''
+
+    def dissect(self, data, linktype, packet_time):
+        """Pełna dysekcja scapy dla ramek, których nie obsługuje szybka ścieżka"""
+        layer_class = conf.l2types.num2layer.get(linktype, conf.raw_layer)
+        try:
+            packet = layer_class(data)
+        except Exception:
+            packet = conf.raw_layer(data)
+        if packet_time is not None:
+            packet.time = packet_time
+        return packet
@@ -11,6 +11,8 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Tabl
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from reportlab.lib.units import inch
+from packet_table import (PacketTable, CHUNK_SIZE, LAYER_ETHERNET, LAYER_IP, LAYER_TCP, LAYER_UDP,
+                          PROTO_TCP, PROTO_UDP, PROTO_OTHER, int_to_ip, int_to_mac)
 
 class ReportGenerator:
     def __init__(self, upload_folder='uploads'):
@@ -111,6 +113,31 @@ class ReportGenerator:
                 summary_data.append(["Average throughput", f"{avg_throughput_kbps:.2f} KB/s"])
                 summary_data.append(["Peak throughput", f"{peak_throughput_kbps:.2f} KB/s"])
             
+            # Liczby różnych wartości (szacowane szkicem HyperLogLog)
+            if stats.get('distinct_counts'):
+                distinct = stats['distinct_counts']
+                summary_data.append(["Distinct source IPs", f"~{distinct.get('src_ips', 0)}"])
+                summary_data.append(["Distinct destination IPs", f"~{distinct.get('dst_ips', 0)}"])
+                summary_data.append(["Distinct MAC addresses", f"~{distinct.get('macs', 0)}"])
+                summary_data.append(["Distinct ports", f"~{distinct.get('ports', 0)}"])
+                summary_data.append(["Distinct flows (5-tuple)", f"~{distinct.get('flows', 0)}"])
+            
+            if stats.get('packet_size_quantiles'):
+                sizes = stats['packet_size_quantiles']
+                summary_data.append(["Packet size p50/p90/p99/p99.9",
+                                     " / ".join(f"{sizes[name]} B" for name in ('p50', 'p90', 'p99', 'p99.9'))])
+            if stats.get('inter_arrival_quantiles'):
+                gaps = stats['inter_arrival_quantiles']
+                summary_data.append(["Inter-arrival p50/p90/p99/p99.9",
+                                     " / ".join(f"{gaps[name] * 1000:.3f} ms" for name in ('p50', 'p90', 'p99', 'p99.9'))])
+            # Kwantyle pochodzą ze szkicu KLL - błąd rangi podany obok (dokładne wartości jako "exact")
+            for label, key in (("sizes", 'packet_size'), ("inter-arrival", 'inter_arrival')):
+                if stats.get('quantile_errors'):
+                    errors = stats['quantile_errors'][key]
+                    summary_data.append([f"Quantile rank error ({label})",
+                                         " / ".join("exact" if errors[name] == 0 else f"±{errors[name] * 100:.2f}%"
+                                                    for name in ('p50', 'p90', 'p99', 'p99.9'))])
+            
             # Dodanie głównych protokołów do podsumowania
             if stats.get('protocols'):
                 top_protocols = sorted(stats['protocols'].items(), key=lambda x: x[1], reverse=True)[:3]
@@ -202,12 +229,8 @@ class ReportGenerator:
         if 'packet_size' in options and stats.get('packet_size_distribution'):
             elements.append(Paragraph("Packet Size Distribution", subtitle_style))
             
-            if 'bins' in stats['packet_size_distribution'] and 'counts' in stats['packet_size_distribution']:
-                chart_img = self.create_histogram(
-                    {'labels': stats['packet_size_distribution']['bins'],
-                     'values': stats['packet_size_distribution']['counts']},
-                    'Packet Sizes'
-                )
+            if stats['packet_size_distribution'].get('labels'):
+                chart_img = self.create_histogram(stats['packet_size_distribution'], 'Packet Sizes')
                 if chart_img:
                     elements.append(Image(chart_img, width=400, height=300))
             elements.append(Spacer(1, 0.3*inch))
@@ -498,8 +521,8 @@ class ReportGenerator:
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
             
-            for packet in packets:
-                row = {
+            rows = self.table_csv_rows(packets) if isinstance(packets, PacketTable) else (
+                {
                     'packet_number': packet.get('packet_number', ''),
                     'time': packet.get('time', ''),
                     'length': packet.get('length', ''),
@@ -511,9 +534,45 @@ class ReportGenerator:
                     'src_port': self.get_port(packet, 'sport'),
                     'dst_port': self.get_port(packet, 'dport')
                 }
+                for packet in packets
+            )
+            
+            for row in rows:
                 writer.writerow(row)
         return csv_path
     
+    def table_csv_rows(self, table):
+        """Wiersze CSV budowane z kolumn PacketTable (bez odtwarzania pełnych słowników)"""
+        protocol_names = {PROTO_TCP: 'TCP', PROTO_UDP: 'UDP', PROTO_OTHER: 'Other'}
+        
+        for start in range(0, len(table), CHUNK_SIZE):
+            chunk_table = table.take(slice(start, start + CHUNK_SIZE))
+            chunk = chunk_table.data
+            classes = chunk_table.protocol_class().tolist()
+            columns = {name: chunk[name].tolist() for name in
+                       ('packet_number', 'time', 'length', 'layers', 'src_mac', 'dst_mac',
+                        'src_ip', 'dst_ip', 'ip_proto', 'sport', 'dport')}
+            
+            for i in range(len(chunk)):
+                layers = columns['layers'][i]
+                has_ethernet = layers & LAYER_ETHERNET
+                has_ip = layers & LAYER_IP
+                has_ports = has_ip and layers & (LAYER_TCP | LAYER_UDP)
+                protocol = protocol_names.get(classes[i]) or f"IP({columns['ip_proto'][i]})"
+                
+                yield {
+                    'packet_number': columns['packet_number'][i],
+                    'time': columns['time'][i],
+                    'length': columns['length'][i],
+                    'src_mac': int_to_mac(columns['src_mac'][i]) if has_ethernet else '',
+                    'dst_mac': int_to_mac(columns['dst_mac'][i]) if has_ethernet else '',
+                    'src_ip': int_to_ip(columns['src_ip'][i]) if has_ip else '',
+                    'dst_ip': int_to_ip(columns['dst_ip'][i]) if has_ip else '',
+                    'protocol': protocol,
+                    'src_port': columns['sport'][i] if has_ports else '',
+                    'dst_port': columns['dport'][i] if has_ports else ''
+                }
+    
     def generate_filtered_pdf(self, filename, packets, filters):
         """Generowanie raportu dla przefiltrowanych pakietów"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
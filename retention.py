@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+# Pliki generowane przez ReportGenerator w folderze uploadów (pozostałe pliki nie są ruszane)
+ARTIFACT_PREFIXES = ('report_', 'filtered_report_', 'packets_')
+ARTIFACT_EXTENSIONS = ('.pdf', '.csv')
+# Świeżo wygenerowany plik nie jest usuwany, zanim przeglądarka zdąży go pobrać
+ARTIFACT_GRACE = 5 * 60
+
+
+class RetentionManager:
+    """
+    Sprzątanie w tle: analizy nieużywane dłużej niż analysis_ttl oraz najdawniej
+    używane ponad limit max_analyses_size (LRU po last_used), wygenerowane raporty
+    i CSV według artifact_ttl / max_artifacts_size (LRU po czasie modyfikacji -
+    pobranie pliku go odświeża), a na końcu przyrostowy VACUUM bazy. None wyłącza
+    dany limit. Najświeższa analiza nigdy nie jest usuwana z powodu limitu rozmiaru.
+    """
+
+    def __init__(self, db, artifact_folder, interval=15 * 60, analysis_ttl=None, max_analyses_size=None,
+                 artifact_ttl=None, max_artifacts_size=None, vacuum_pages=4096):
+        self.db = db
+        self.artifact_folder = artifact_folder
+        self.interval = interval
+        self.analysis_ttl = analysis_ttl
+        self.max_analyses_size = max_analyses_size
+        self.artifact_ttl = artifact_ttl
+        self.max_artifacts_size = max_artifacts_size
+        self.vacuum_pages = vacuum_pages
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_run = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error during retention pass: {str(e)}")
+
+    def run_once(self):
+        """Jeden przebieg sprzątania - zwraca, co zostało usunięte i ile stron bazy zwolniono"""
+        with self.lock:
+            start = time.perf_counter()
+            now = datetime.now()
+            result = {
+                'analyses_deleted': self.expire_analyses(now),
+                'artifacts_deleted': self.expire_artifacts(now.timestamp()),
+                'vacuumed_pages': self.db.incremental_vacuum(self.vacuum_pages)
+            }
+            result['duration_ms'] = (time.perf_counter() - start) * 1000
+            self.last_run = {'time': now.strftime('%Y-%m-%d %H:%M:%S'), **result}
+
+            if result['analyses_deleted'] or result['artifacts_deleted'] or result['vacuumed_pages']:
+                print(f"Retention: deleted {len(result['analyses_deleted'])} analyses, "
+                      f"{len(result['artifacts_deleted'])} artifacts, vacuumed {result['vacuumed_pages']} pages "
+                      f"({result['duration_ms']:.0f} ms)")
+            return result
+
+    def expire_analyses(self, now):
+        analyses = sorted(self.db.analysis_usage(), key=lambda analysis: analysis['last_used'])
+        deleted = []
+
+        if self.analysis_ttl is not None:
+            for analysis in analyses:
+                last_used = datetime.strptime(analysis['last_used'], '%Y-%m-%d %H:%M:%S')
+                if (now - last_used).total_seconds() > self.analysis_ttl:
+                    deleted.append(analysis)
+
+        if self.max_analyses_size is not None:
+            expired = {analysis['id'] for analysis in deleted}
+            remaining = [analysis for analysis in analyses if analysis['id'] not in expired]
+            total = sum(analysis['size'] for analysis in remaining)
+            for analysis in remaining[:-1]:
+                if total <= self.max_analyses_size:
+                    break
+                deleted.append(analysis)
+                total -= analysis['size']
+
+        for analysis in deleted:
+            self.db.delete_analysis(analysis['id'])
+        return [analysis['id'] for analysis in deleted]
+
+    def artifacts(self):
+        """Wygenerowane pliki: (ścieżka, czas modyfikacji, rozmiar) od najstarszego"""
+        if not os.path.isdir(self.artifact_folder):
+            return []
+
+        files = []
+        for entry in os.scandir(self.artifact_folder):
+            if entry.is_file() and entry.name.startswith(ARTIFACT_PREFIXES) \
+                    and entry.name.endswith(ARTIFACT_EXTENSIONS):
+                stat = entry.stat()
+                files.append((entry.path, stat.st_mtime, stat.st_size))
+        return sorted(files, key=lambda artifact: artifact[1])
+
+    def expire_artifacts(self, now):
+        artifacts = self.artifacts()
+        # Czas modyfikacji rośnie wzdłuż listy - wygasłe pliki są jej początkiem
+        candidates = [artifact for artifact in artifacts if now - artifact[1] > ARTIFACT_GRACE]
+        expired = 0
+        if self.artifact_ttl is not None:
+            expired = sum(1 for artifact in candidates if now - artifact[1] > self.artifact_ttl)
+        deleted = candidates[:expired]
+
+        if self.max_artifacts_size is not None:
+            total = sum(artifact[2] for artifact in artifacts[expired:])
+            for artifact in candidates[expired:]:
+                if total <= self.max_artifacts_size:
+                    break
+                deleted.append(artifact)
+                total -= artifact[2]
+
+        removed = []
+        for path, _, _ in deleted:
+            try:
+                os.remove(path)
+                removed.append(os.path.basename(path))
+            except OSError as e:
+                print(f"Error removing artifact {path}: {str(e)}")
+        return removed
+
+    def usage(self):
+        """Zajętość dysku: analizy (od najdawniej używanej), wygenerowane pliki i plik bazy"""
+        analyses = sorted(self.db.analysis_usage(), key=lambda analysis: analysis['last_used'])
+        artifacts = self.artifacts()
+        return {
+            'analyses': {
+                'count': len(analyses),
+                'size': sum(analysis['size'] for analysis in analyses),
+                'quota': self.max_analyses_size,
+                'ttl': self.analysis_ttl,
+                'items': analyses
+            },
+            'artifacts': {
+                'count': len(artifacts),
+                'size': sum(artifact[2] for artifact in artifacts),
+                'quota': self.max_artifacts_size,
+                'ttl': self.artifact_ttl
+            },
+            'database': self.db.storage_usage(),
+            'last_run': self.last_run
+        }
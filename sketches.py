@@ -0,0 +1,368 @@
+import heapq
+import math
+from hashlib import blake2b
+import numpy as np
+
+UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def key_hash(key):
+    """Stabilny (niezależny od procesu) 64-bitowy skrót klucza - liczby całkowite bez zmian"""
+    if isinstance(key, (int, np.integer)):
+        return int(key) & UINT64_MASK
+    return int.from_bytes(blake2b(str(key).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def key_hashes(keys):
+    if isinstance(keys, np.ndarray) and keys.dtype.kind in 'iu':
+        return keys.astype(np.uint64)
+    return np.fromiter((key_hash(key) for key in keys), dtype=np.uint64, count=len(keys))
+
+
+class SpaceSaving:
+    """
+    Łączalne podsumowanie najczęstszych kluczy (Space-Saving / Misra-Gries w wersji
+    Agarwal et al.): co najwyżej `capacity` liczników niezależnie od liczby różnych kluczy.
+    Licznik klucza zaniża prawdziwą częstość najwyżej o error_bound() <= N / (capacity + 1).
+    Dopóki różnych kluczy jest nie więcej niż capacity, wynik jest dokładny.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.counters = {}
+        self.total = 0
+
+    def merge_counts(self, counts):
+        """Dołącza dokładne liczniki porcji danych (słownik klucz -> liczba)"""
+        counters = self.counters
+        for key, count in counts.items():
+            counters[key] = counters.get(key, 0) + count
+            self.total += count
+        if len(counters) > self.capacity:
+            self.reduce()
+
+    def merge(self, other):
+        if other.capacity != self.capacity:
+            raise ValueError("Cannot merge SpaceSaving summaries with different capacity")
+        counters = self.counters
+        for key, count in other.counters.items():
+            counters[key] = counters.get(key, 0) + count
+        self.total += other.total
+        if len(counters) > self.capacity:
+            self.reduce()
+        return self
+
+    def reduce(self):
+        # Odejmij (capacity + 1)-szy największy licznik od wszystkich i usuń niedodatnie
+        threshold = heapq.nlargest(self.capacity + 1, self.counters.values())[-1]
+        self.counters = {key: count - threshold for key, count in self.counters.items() if count > threshold}
+
+    def error_bound(self):
+        return (self.total - sum(self.counters.values())) // (self.capacity + 1)
+
+    def top(self, limit):
+        """[(klucz, dolne oszacowanie)] malejąco; remisy w kolejności pierwszego wystąpienia"""
+        return sorted(self.counters.items(), key=lambda item: -item[1])[:limit]
+
+
+class CountMinSketch:
+    """
+    Szkic Count-Min: depth x width liczników. Oszacowanie nigdy nie zaniża częstości,
+    a zawyża ją najwyżej o e/width * N z prawdopodobieństwem 1 - e^-depth.
+    """
+
+    def __init__(self, width=4096, depth=4, seed=0x5EED):
+        self.width = 1 << max(1, (width - 1).bit_length())
+        self.depth = depth
+        self.seed = seed
+        self.shift = np.uint64(64 - int(math.log2(self.width)))
+        rng = np.random.default_rng(seed)
+        # Haszowanie multiply-shift: nieparzyste mnożniki, przesunięcie do log2(width) bitów
+        self.multipliers = rng.integers(0, 1 << 63, size=depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.offsets = rng.integers(0, 1 << 63, size=depth, dtype=np.uint64)
+        self.table = np.zeros((depth, self.width), dtype=np.int64)
+        self.total = 0
+
+    def indexes(self, keys):
+        hashes = key_hashes(keys)
+        return (hashes[None, :] * self.multipliers[:, None] + self.offsets[:, None]) >> self.shift
+
+    def add_many(self, keys, counts):
+        if len(keys) == 0:
+            return
+        counts = np.asarray(counts, dtype=np.int64)
+        rows = self.indexes(keys).astype(np.int64) + (np.arange(self.depth, dtype=np.int64) * self.width)[:, None]
+        weights = np.broadcast_to(counts, rows.shape).ravel()
+        self.table += np.bincount(rows.ravel(), weights=weights,
+                                  minlength=self.depth * self.width).astype(np.int64).reshape(self.table.shape)
+        self.total += int(counts.sum())
+
+    def estimate(self, keys):
+        if len(keys) == 0:
+            return []
+        columns = self.indexes(keys).astype(np.int64)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0).tolist()
+
+    def merge(self, other):
+        if (other.width, other.depth, other.seed) != (self.width, self.depth, self.seed):
+            raise ValueError("Cannot merge Count-Min sketches with different dimensions")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+    def error_bound(self):
+        return math.ceil(math.e / self.width * self.total)
+
+    def confidence(self):
+        return 1 - math.exp(-self.depth)
+
+
+class HeavyHitters:
+    """
+    Najczęstsze klucze w stałej pamięci: Space-Saving wybiera kandydatów, Count-Min
+    zawęża oszacowanie ich liczności z góry. Klucze dochodzą porcjami (add_many).
+    """
+
+    def __init__(self, capacity=1024, width=4096, depth=4):
+        self.space_saving = SpaceSaving(capacity)
+        self.count_min = CountMinSketch(width, depth)
+
+    def add_many(self, keys, counts):
+        """Dołącza porcję różnych kluczy z licznikami (np. wynik np.unique)"""
+        self.space_saving.merge_counts(dict(zip(keys.tolist() if isinstance(keys, np.ndarray) else keys,
+                                                counts.tolist() if isinstance(counts, np.ndarray) else counts)))
+        self.count_min.add_many(keys, counts)
+
+    def merge(self, other):
+        self.space_saving.merge(other.space_saving)
+        self.count_min.merge(other.count_min)
+        return self
+
+    def top(self, limit):
+        """[(klucz, oszacowanie)] - oszacowanie = min(Space-Saving + błąd, Count-Min)"""
+        candidates = self.space_saving.top(len(self.space_saving.counters))
+        error = self.space_saving.error_bound()
+        estimates = self.count_min.estimate([key for key, _ in candidates])
+        ranked = [(key, min(count + error, estimate)) for (key, count), estimate in zip(candidates, estimates)]
+        return sorted(ranked, key=lambda item: -item[1])[:limit]
+
+    def error_report(self):
+        """Parametry i granice błędu oszacowań (liczone w pakietach)"""
+        return {
+            'capacity': self.space_saving.capacity,
+            'width': self.count_min.width,
+            'depth': self.count_min.depth,
+            'total': self.space_saving.total,
+            'max_error': self.space_saving.error_bound(),
+            'space_saving_error': self.space_saving.error_bound(),
+            'count_min_error': self.count_min.error_bound(),
+            'count_min_confidence': round(self.count_min.confidence(), 4)
+        }
+
+
+def mix64(values):
+    """Mieszanie bitów splitmix64 (wektorowo) - równomierne skróty także dla kolejnych liczb"""
+    with np.errstate(over='ignore'):
+        h = np.asarray(values, dtype=np.uint64)
+        h = h ^ (h >> np.uint64(30))
+        h = h * np.uint64(0xBF58476D1CE4E5B9)
+        h = h ^ (h >> np.uint64(27))
+        h = h * np.uint64(0x94D049BB133111EB)
+        return h ^ (h >> np.uint64(31))
+
+
+def bit_lengths(values):
+    """int.bit_length dla tablicy uint64 (rozmazanie najwyższego bitu + popcount)"""
+    smeared = np.asarray(values, dtype=np.uint64)
+    for shift in (1, 2, 4, 8, 16, 32):
+        smeared = smeared | (smeared >> np.uint64(shift))
+    return np.bitwise_count(smeared)
+
+
+class HyperLogLog:
+    """
+    Szkic HyperLogLog liczby różnych kluczy: 2^precision rejestrów po jednym bajcie
+    (4 KB dla precision=12), błąd względny ok. 1.04 / sqrt(2^precision) (~1.6%).
+    Przyjmuje gotowe 64-bitowe skróty (mix64) - ten sam klucz daje ten sam skrót
+    w każdym procesie, więc szkice z fragmentów pliku łączy merge() (maksimum rejestrów).
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        if len(hashes) == 0:
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        rest_bits = 64 - self.precision
+        indexes = (hashes >> np.uint64(rest_bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # Pozycja pierwszej jedynki w pozostałych bitach (1 = najstarszy bit)
+        ranks = (rest_bits + 1 - bit_lengths(rest)).astype(np.uint8)
+        np.maximum.at(self.registers, indexes, ranks)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / float(np.ldexp(1.0, -self.registers.astype(np.int32)).sum())
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Poprawka dla małych liczności: zliczanie liniowe pustych rejestrów
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+
+class KllSketch:
+    """
+    Szkic kwantyli KLL: poziom h przechowuje elementy o wadze 2^h, a przepełniony
+    poziom jest sortowany i co drugi element przechodzi poziom wyżej. Pamięć rośnie
+    najwyżej logarytmicznie (ok. 1.3k liczb), zmierzony błąd rangi nie przekracza
+    ok. 2 / k (rank_error). Dopóki elementów jest nie więcej niż pojemność poziomu 0,
+    wyniki są dokładne.
+    
+    Błąd rangi przekłada się na duży błąd wartości w długim ogonie rozkładu (p99.9
+    wielkości pakietów), dlatego `tail` największych elementów jest trzymanych osobno
+    bez kompresji: kwantyl, który wypada w tym ogonie, jest dokładny. Szkic podsumowuje
+    tylko elementy spoza ogona - wszystkie są nie większe od najmniejszego elementu ogona.
+    
+    Wybór połówki jest deterministyczny (naprzemiennie na każdym poziomie), więc te
+    same dane podane w tych samych porcjach dają zawsze ten sam szkic.
+    """
+
+    def __init__(self, k=200, tail=0):
+        self.k = k
+        self.tail_size = tail
+        self.tail = np.empty(0, dtype=np.float64)
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self.offsets = [0]
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(8, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        self.update_range(float(values.min()), float(values.max()))
+        self.count += len(values)
+        self.levels[0] = np.concatenate((self.levels[0], self.update_tail(values)))
+        self.compress()
+
+    def update_tail(self, values):
+        """Dołącza wartości do ogona i zwraca elementy, które się w nim nie mieszczą"""
+        if not self.tail_size:
+            return values
+        values = np.concatenate((self.tail, values))
+        evicted = len(values) - self.tail_size
+        if evicted <= 0:
+            self.tail = values
+            return values[:0]
+        values = np.partition(values, evicted)
+        self.tail = values[evicted:]
+        return values[:evicted]
+
+    def update_range(self, low, high):
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def compress(self):
+        while True:
+            full = [level for level, items in enumerate(self.levels) if len(items) > self.capacity(level)]
+            if not full:
+                return
+            self.compact(full[0])
+
+    def compact(self, level):
+        if level + 1 == len(self.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+            self.offsets.append(0)
+        items = np.sort(self.levels[level])
+        # Przy nieparzystej liczbie najmniejszy element zostaje na swoim poziomie
+        odd = len(items) % 2
+        offset = self.offsets[level]
+        self.offsets[level] ^= 1
+        self.levels[level + 1] = np.concatenate((self.levels[level + 1], items[odd + offset::2]))
+        self.levels[level] = items[:odd]
+
+    def merge(self, other):
+        if (other.k, other.tail_size) != (self.k, self.tail_size):
+            raise ValueError("Cannot merge KLL sketches with different k or tail size")
+        if other.count == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+            self.offsets.append(0)
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate((self.levels[level], items))
+        self.levels[0] = np.concatenate((self.levels[0], self.update_tail(other.tail)))
+        self.count += other.count
+        self.update_range(other.min, other.max)
+        self.compress()
+        return self
+
+    def weighted_items(self, tail=True):
+        """(posortowane wartości, wagi) - suma wag jest równa liczbie dodanych elementów"""
+        weights = [np.full(len(items), 1 << level, dtype=np.int64) for level, items in enumerate(self.levels)]
+        values = self.levels
+        if tail:
+            values = values + [self.tail]
+            weights.append(np.ones(len(self.tail), dtype=np.int64))
+        values = np.concatenate(values)
+        weights = np.concatenate(weights)
+        order = np.argsort(values, kind='stable')
+        return values[order], weights[order]
+
+    def quantiles(self, fractions):
+        """Najmniejsza wartość x, dla której odsetek elementów <= x wynosi co najmniej q"""
+        if self.count == 0:
+            return [0.0 for _ in fractions]
+        targets = np.asarray(fractions, dtype=np.float64) * self.count
+        # Elementy szkicu to dokładnie count - len(tail) najmniejszych wartości
+        sketched = self.count - len(self.tail)
+        tail = np.sort(self.tail)
+        in_tail = targets > sketched
+        result = np.empty(len(targets), dtype=np.float64)
+        if in_tail.any():
+            indexes = np.ceil(targets[in_tail] - sketched).astype(np.int64) - 1
+            result[in_tail] = tail[np.clip(indexes, 0, len(tail) - 1)]
+        if not in_tail.all():
+            values, weights = self.weighted_items(tail=False)
+            indexes = np.searchsorted(np.cumsum(weights), targets[~in_tail], side='left')
+            result[~in_tail] = values[np.minimum(indexes, len(values) - 1)]
+        return result.tolist()
+
+    def rank_error(self, fractions):
+        """
+        Oszacowanie błędu rangi każdego kwantyla jako ułamek liczby elementów: 0, gdy
+        wynik jest dokładny (kwantyl w ogonie albo szkic bez kompresji), w pozostałych
+        przypadkach 2 / k części podsumowanej szkicem (zmierzony maksymalny błąd KLL)
+        """
+        if self.count == 0:
+            return [0.0 for _ in fractions]
+        sketched = self.count - len(self.tail)
+        compressed = len(self.levels) > 1
+        return [0.0 if not compressed or fraction * self.count > sketched
+                else 2 / self.k * sketched / self.count for fraction in fractions]
+
+    def histogram(self, bins):
+        """Histogram (liczniki, krawędzie) w zakresie [min, max] z wag zachowanych elementów"""
+        values, weights = self.weighted_items()
+        counts, edges = np.histogram(values, bins=bins, range=(self.min, self.max), weights=weights)
+        return counts.astype(np.int64), edges
+
+    def distinct_values(self):
+        return len(np.unique(np.concatenate(self.levels + [self.tail])))
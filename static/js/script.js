@@ -103,8 +103,11 @@ function initCharts() {
         initThroughputChart();
     }
     
+    // Sekcje leniwe - pobierane przy pierwszym otwarciu zakładki
     if (document.getElementById('protocolPayloadChart')) {
-        initProtocolPayloadChart();
+        whenTabShown('network-metrics-tab', () => {
+            loadStatsSection('protocol_payload', 'protocolPayloadData').then(initProtocolPayloadChart);
+        });
     }
     
     if (document.getElementById('networkEfficiencyChart')) {
@@ -112,10 +115,39 @@ function initCharts() {
     }
     
     if (document.getElementById('enhancedMacGraph')) {
-        initEnhancedMacGraph();
+        whenTabShown('advanced-tab', () => {
+            loadStatsSection('enhanced_mac_graph', 'enhancedMacGraphData').then(initEnhancedMacGraph);
+        });
     }
 }
 
+// Wywołuje callback raz - od razu, jeśli zakładka jest aktywna, albo przy jej pierwszym pokazaniu
+function whenTabShown(tabId, callback) {
+    const tab = document.getElementById(tabId);
+    if (!tab || tab.classList.contains('active')) {
+        callback();
+        return;
+    }
+    tab.addEventListener('shown.bs.tab', callback, { once: true });
+}
+
+// Sekcja statystyk osadzona w stronie albo (gdy jeszcze nie policzona) pobierana z serwera
+function loadStatsSection(section, elementId) {
+    const element = document.getElementById(elementId);
+    const embedded = element ? JSON.parse(element.textContent) : null;
+    if (embedded !== null) {
+        return Promise.resolve(embedded);
+    }
+    
+    return fetch(`/stats_section/${analysisId}/${section}`)
+        .then(response => response.json())
+        .then(data => data[section] !== undefined ? data[section] : null)
+        .catch(error => {
+            console.error(`Błąd pobierania sekcji ${section}:`, error);
+            return null;
+        });
+}
+
 // Wykres payload (bar chart)
 function initPayloadChart() {
     const payloadCtx = document.getElementById('payloadChart').getContext('2d');
@@ -176,6 +208,85 @@ function initPayloadChart() {
     });
 }
 
+// Przybliżanie i przesuwanie wykresu throughput - dane z piramidy agregatów (/throughput)
+function initThroughputZoom(chart, canvas) {
+    if (typeof analysisId === 'undefined') return;
+    
+    const view = { start: 0, end: null, duration: null };
+    const header = canvas.closest('.card').querySelector('.card-header');
+    const toolbar = document.createElement('div');
+    toolbar.className = 'btn-group btn-group-sm mt-1';
+    toolbar.innerHTML = `
+        <button type="button" class="btn btn-outline-secondary" data-action="out" title="Oddal">−</button>
+        <button type="button" class="btn btn-outline-secondary" data-action="in" title="Przybliż">+</button>
+        <button type="button" class="btn btn-outline-secondary" data-action="left" title="W lewo">←</button>
+        <button type="button" class="btn btn-outline-secondary" data-action="right" title="W prawo">→</button>
+        <button type="button" class="btn btn-outline-secondary" data-action="reset">Całość</button>
+        <span class="btn btn-sm disabled text-muted throughput-resolution"></span>`;
+    header.appendChild(toolbar);
+    const resolutionLabel = toolbar.querySelector('.throughput-resolution');
+    
+    const formatResolution = resolution => resolution < 1 ? `${resolution * 1000} ms` :
+        resolution < 60 ? `${resolution} s` : resolution < 3600 ? `${resolution / 60} min` : `${resolution / 3600} h`;
+    
+    function load(start, end) {
+        const query = new URLSearchParams({ start: start, points: 500 });
+        if (end !== null) query.set('end', end);
+        
+        fetch(`/throughput/${analysisId}?${query}`)
+            .then(response => response.json())
+            .then(series => {
+                if (series.error) {
+                    console.log('Brak piramidy throughput:', series.error);
+                    return;
+                }
+                view.start = start;
+                view.end = end === null ? series.duration : end;
+                view.duration = series.duration;
+                
+                chart.data.labels = series.time_labels;
+                chart.data.datasets[0].data = series.bytes_per_second;
+                chart.data.datasets[0].pointRadius = series.bytes_per_second.length > 100 ? 0 : 3;
+                chart.update('none');
+                resolutionLabel.textContent = `Rozdzielczość: ${formatResolution(series.resolution)}`;
+            })
+            .catch(error => console.error('Błąd pobierania throughput:', error));
+    }
+    
+    // Nowy zakres: środek i szerokość, przycięte do czasu trwania przechwycenia
+    function zoomTo(center, span) {
+        span = Math.min(view.duration, Math.max(0.01, span));
+        const start = Math.max(0, Math.min(view.duration - span, center - span / 2));
+        load(start, start + span);
+    }
+    
+    toolbar.addEventListener('click', function(e) {
+        const action = e.target.getAttribute('data-action');
+        if (!action || view.duration === null) return;
+        
+        const span = view.end - view.start;
+        const center = view.start + span / 2;
+        if (action === 'in') zoomTo(center, span / 4);
+        if (action === 'out') zoomTo(center, span * 4);
+        if (action === 'left') zoomTo(center - span / 2, span);
+        if (action === 'right') zoomTo(center + span / 2, span);
+        if (action === 'reset') load(0, null);
+    });
+    
+    // Kółko myszy - przybliżenie wokół wskazanego miejsca
+    canvas.addEventListener('wheel', function(e) {
+        if (view.duration === null || !chart.chartArea) return;
+        e.preventDefault();
+        
+        const area = chart.chartArea;
+        const fraction = Math.min(1, Math.max(0, (e.offsetX - area.left) / (area.right - area.left)));
+        const span = view.end - view.start;
+        zoomTo(view.start + fraction * span, e.deltaY < 0 ? span / 2 : span * 2);
+    }, { passive: false });
+    
+    load(0, null);
+}
+
 // Wykres throughput (linia czasu)
 function initThroughputChart() {
     const throughputCtx = document.getElementById('throughputChart');
@@ -214,7 +325,7 @@ function initThroughputChart() {
         }
         
         // Utworzenie wykresu
-        new Chart(throughputCtx, {
+        const throughputChart = new Chart(throughputCtx, {
             type: 'line',
             data: {
                 labels: throughputData.time_labels,
@@ -298,6 +409,7 @@ function initThroughputChart() {
         });
         
         console.log('Wykres throughput został utworzony pomyślnie');
+        initThroughputZoom(throughputChart, throughputCtx);
         
     } catch (error) {
         console.error('Błąd podczas tworzenia wykresu throughput:', error);
@@ -306,9 +418,9 @@ function initThroughputChart() {
 }
 
 // Wykres payload według protokołów (bar chart z dwiema osiami Y)
-function initProtocolPayloadChart() {
+function initProtocolPayloadChart(protocolPayloadData) {
     const protocolPayloadCtx = document.getElementById('protocolPayloadChart').getContext('2d');
-    const protocolPayloadData = JSON.parse(document.getElementById('protocolPayloadData').textContent);
+    protocolPayloadData = protocolPayloadData || {};
     
     const protocols = Object.keys(protocolPayloadData);
     const payloadTotals = protocols.map(proto => protocolPayloadData[proto].total);
@@ -843,7 +955,7 @@ function initNetworkGraph() {
         }
         
         // Przygotowanie węzłów z lepszym kolorowaniem - kod z dokumentu
-        const nodes = new vis.DataSet(networkData.nodes.map(node => {
+        const toVisNode = (node, graphEdges = networkData.edges) => {
             let nodeColor = UNIFIED_COLORS.Inne;
             let ipType = 'Inne prywatne';
             
@@ -862,7 +974,7 @@ function initNetworkGraph() {
                 ipType = 'Publiczne';
             }
             
-            const connections = networkData.edges.filter(edge => 
+            const connections = graphEdges.filter(edge => 
                 edge.from === node.id || edge.to === node.id
             ).length;
             
@@ -881,7 +993,7 @@ function initNetworkGraph() {
                     size: 12,
                     face: 'Arial'
                 },
-                shape: 'dot',
+                shape: node.aggregate ? 'diamond' : 'dot',
                 size: Math.max(15, Math.min(50, node.value * 2)),
                 borderWidth: 2,
                 shadow: {
@@ -891,13 +1003,16 @@ function initNetworkGraph() {
                     x: 3,
                     y: 3
                 },
-                title: `IP: ${node.id}\nTyp: ${ipType}\nPakiety: ${node.value}\nPołączenia: ${connections}`,
+                title: node.aggregate
+                    ? `Grupa: ${node.label}\nPakiety: ${node.value}\nKliknij dwukrotnie, aby rozwinąć`
+                    : `IP: ${node.id}\nTyp: ${ipType}\nPakiety: ${node.value}\nPołączenia: ${connections}`,
                 ipType: ipType,
                 connections: connections
             };
-        }));
+        };
+        const nodes = new vis.DataSet(networkData.nodes.map(node => toVisNode(node)));
         
-        const edges = new vis.DataSet(networkData.edges.map(edge => ({
+        const toVisEdge = edge => ({
             ...edge,
             width: Math.max(1, Math.min(8, edge.value / 3)),
             color: {
@@ -924,7 +1039,8 @@ function initNetworkGraph() {
                 y: 2
             },
             title: `${edge.from} → ${edge.to}\nPakiety: ${edge.value}`
-        })));
+        });
+        const edges = new vis.DataSet(networkData.edges.map(toVisEdge));
         
         const data = { nodes, edges };
         const options = {
@@ -954,8 +1070,9 @@ function initNetworkGraph() {
                     roundness: 0.5
                 }
             },
+            // Pozycje policzone na serwerze - bez symulacji fizyki w przeglądarce
             physics: {
-                enabled: true,
+                enabled: !networkData.positioned,
                 solver: 'repulsion',
                 repulsion: {
                     centralGravity: 0.1, 
@@ -976,13 +1093,15 @@ function initNetworkGraph() {
                 keyboard: true
             },
             layout: {
-                improvedLayout: true,
+                improvedLayout: !networkData.positioned,
                 randomSeed: 42
             }
         };
         
         networkContainer.style.height = '500px';
         const network = new vis.Network(networkContainer, data, options);
+        enableAggregateExpansion(network, 'network', nodes, edges, toVisNode, toVisEdge);
+        showGraphReductionNote(networkContainer, networkData.reduction);
         
         // Dodaj legendę i kontrolki
         createUnifiedLegend('networkGraph', 'Typy adresów IP', {
@@ -1001,26 +1120,18 @@ function initNetworkGraph() {
 }
 
 // Graf MAC - zunifikowany z kodem z dokumentu
-function initEnhancedMacGraph() {
+function initEnhancedMacGraph(macData) {
     const macContainer = document.getElementById('enhancedMacGraph');
     if (!macContainer) return;
     
-    const macDataElement = document.getElementById('enhancedMacGraphData');
-    if (!macDataElement || !macDataElement.textContent) {
-        macContainer.innerHTML = '<div class="alert alert-info text-center">Graf niedostępny - brak danych</div>';
-        return;
-    }
-    
     try {
-        const macData = JSON.parse(macDataElement.textContent);
-        
         if (!macData || !macData.nodes || macData.nodes.length === 0) {
             macContainer.innerHTML = '<div class="alert alert-info text-center">Graf niedostępny - brak komunikacji MAC</div>';
             return;
         }
         
         // Przygotowanie węzłów z protokołami
-        const nodes = new vis.DataSet(macData.nodes.map(node => {
+        const toVisNode = node => {
             const protocol = node.protocol || 'Unknown';
             const nodeColor = UNIFIED_COLORS[protocol] || UNIFIED_COLORS.Unknown;
             
@@ -1039,7 +1150,7 @@ function initEnhancedMacGraph() {
                     size: 12,
                     face: 'Arial'
                 },
-                shape: 'dot',
+                shape: node.aggregate ? 'diamond' : 'dot',
                 size: Math.max(15, Math.min(50, (node.value || 1) / 2)),
                 borderWidth: 2,
                 shadow: {
@@ -1049,11 +1160,14 @@ function initEnhancedMacGraph() {
                     x: 3,
                     y: 3
                 },
-                title: `MAC: ${node.id}\nVendor: ${node.vendor || 'Unknown'}\nDominujący: ${protocol}\nPakiety: ${node.value || 0}`
+                title: node.aggregate
+                    ? `Grupa: ${node.label}\nVendor: ${node.vendor || 'Unknown'}\nDominujący: ${protocol}\nPakiety: ${node.value || 0}\nKliknij dwukrotnie, aby rozwinąć`
+                    : `MAC: ${node.id}\nVendor: ${node.vendor || 'Unknown'}\nDominujący: ${protocol}\nPakiety: ${node.value || 0}`
             };
-        }));
+        };
+        const nodes = new vis.DataSet(macData.nodes.map(toVisNode));
         
-        const edges = new vis.DataSet((macData.edges || []).map(edge => ({
+        const toVisEdge = edge => ({
             ...edge,
             width: Math.max(1, Math.min(8, (edge.value || 1) / 3)),
             color: {
@@ -1079,7 +1193,8 @@ function initEnhancedMacGraph() {
                 y: 2
             },
             title: edge.title || `Packets: ${edge.value || 0}`
-        })));
+        });
+        const edges = new vis.DataSet((macData.edges || []).map(toVisEdge));
         
         const data = { nodes, edges };
         const options = {
@@ -1109,8 +1224,9 @@ function initEnhancedMacGraph() {
                     roundness: 0.5
                 }
             },
+            // Pozycje policzone na serwerze - bez symulacji fizyki w przeglądarce
             physics: {
-                enabled: true,
+                enabled: !macData.positioned,
                 solver: 'repulsion',
                 repulsion: {
                     centralGravity: 0.1,    
@@ -1131,13 +1247,15 @@ function initEnhancedMacGraph() {
                 keyboard: true
             },
             layout: {
-                improvedLayout: true,
+                improvedLayout: !macData.positioned,
                 randomSeed: 42
             }
         };
         
         macContainer.style.height = '500px';
         const network = new vis.Network(macContainer, data, options);
+        enableAggregateExpansion(network, 'mac', nodes, edges, toVisNode, toVisEdge);
+        showGraphReductionNote(macContainer, macData.reduction);
         
         const protocolsInGraph = [...new Set(macData.nodes.map(n => n.protocol).filter(p => p))];
         const legendItems = {};
@@ -1155,15 +1273,147 @@ function initEnhancedMacGraph() {
     }
 }
 
+// Rozwijanie węzłów zbiorczych (podsieci / prefiksy OUI) po dwukrotnym kliknięciu
+function enableAggregateExpansion(network, graphName, nodes, edges, toVisNode, toVisEdge) {
+    network.on('doubleClick', function(params) {
+        if (params.nodes.length !== 1) return;
+        
+        const node = nodes.get(params.nodes[0]);
+        if (!node || !node.aggregate) return;
+        
+        const query = new URLSearchParams({ node: node.id, offset: node.next_offset || 0 });
+        fetch(`/graph_expand/${analysisId}/${graphName}?${query}`)
+            .then(response => response.json())
+            .then(expanded => {
+                if (expanded.error) {
+                    console.error('Błąd rozwijania węzła:', expanded.error);
+                    return;
+                }
+                
+                // Węzeł zbiorczy znika razem z krawędziami; reszta członków wraca jako mniejsza grupa
+                const center = network.getPositions([node.id])[node.id];
+                edges.remove(network.getConnectedEdges(node.id));
+                nodes.remove(node.id);
+                
+                // Członkowie na okręgu wokół miejsca węzła zbiorczego (fizyka może być wyłączona)
+                const radius = 60 + 8 * expanded.nodes.length;
+                nodes.add(expanded.nodes.map((member, index) => {
+                    const angle = 2 * Math.PI * index / expanded.nodes.length;
+                    const position = member.aggregate ? { x: center.x, y: center.y } :
+                        { x: center.x + radius * Math.cos(angle), y: center.y + radius * Math.sin(angle) };
+                    return { ...toVisNode(member, expanded.edges), ...position };
+                }));
+                
+                // Koniec krawędzi: sam węzeł, jeśli jest widoczny, w przeciwnym razie jego grupa
+                const merged = {};
+                expanded.edges.forEach(edge => {
+                    const from = nodes.get(edge.from) ? edge.from : edge.from_group;
+                    const to = nodes.get(edge.to) ? edge.to : edge.to_group;
+                    if (from === to && from !== edge.from) return;
+                    
+                    const key = `${from}|${to}`;
+                    if (merged[key]) {
+                        merged[key].value += edge.value || 0;
+                    } else {
+                        merged[key] = { ...edge, from: from, to: to };
+                    }
+                });
+                edges.add(Object.values(merged).map(toVisEdge));
+            })
+            .catch(error => console.error('Błąd rozwijania węzła:', error));
+    });
+}
+
+function showGraphReductionNote(container, reduction) {
+    if (!reduction) return;
+    
+    const note = document.createElement('div');
+    note.className = 'text-muted small mt-1';
+    note.textContent = `Pokazano ${reduction.shown_nodes} z ${reduction.total_nodes} węzłów i ` +
+        `${reduction.shown_edges} z ${reduction.total_edges} krawędzi - ` +
+        `węzły zbiorcze (romby) można rozwinąć dwukrotnym kliknięciem`;
+    container.parentNode.insertBefore(note, container.nextSibling);
+}
+
+// Wartości pól panelu filtrów pakietów (nazwy jak w PacketFilter)
+function packetFilterValues() {
+    return {
+        expression: document.getElementById('filter-expression').value,
+        srcMac: document.getElementById('filter-src-mac').value,
+        dstMac: document.getElementById('filter-dst-mac').value,
+        srcIp: document.getElementById('filter-src-ip').value,
+        dstIp: document.getElementById('filter-dst-ip').value,
+        protocol: document.getElementById('filter-protocol').value,
+        port: document.getElementById('filter-port').value,
+        lengthMin: document.getElementById('filter-length-min').value,
+        lengthMax: document.getElementById('filter-length-max').value,
+        timeStart: document.getElementById('filter-time-start').value,
+        timeEnd: document.getElementById('filter-time-end').value
+    };
+}
+
+// Błąd wyrażenia filtra zwrócony przez serwer (400) pod polem wyrażenia; null czyści komunikat
+function showFilterError(message) {
+    const input = document.getElementById('filter-expression');
+    input.classList.toggle('is-invalid', Boolean(message));
+    document.getElementById('filter-expression-error').textContent = message || '';
+}
+
+// Pakiety bieżącej strony tabeli (numer pakietu -> dane) - dla okna szczegółów
+const packetCache = {};
+
+function escapeHtml(value) {
+    return String(value === undefined || value === null ? '' : value)
+        .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+}
+
 function initAdvancedPacketViewer() {
     // Sprawdź czy DataTable już istnieje i zniszcz je
     if ($.fn.DataTable.isDataTable('#packetsTable')) {
         $('#packetsTable').DataTable().destroy();
     }
     
-    // Inicjalizacja DataTables dla tabeli pakietów
+    // Inicjalizacja DataTables dla tabeli pakietów - strony, sortowanie i filtry liczone na kolumnach (/packets)
     if (document.getElementById('packetsTable')) {
         $('#packetsTable').DataTable({
+            serverSide: true,
+            processing: true,
+            searching: false,
+            ajax: {
+                url: `/packets/${analysisId}`,
+                data: request => Object.assign(request, packetFilterValues()),
+                error: xhr => {
+                    // Niepoprawny filtr - komunikat przy polu zamiast okna DataTables
+                    const error = xhr.responseJSON && xhr.responseJSON.error;
+                    showFilterError(error || 'Nie udało się pobrać pakietów');
+                    $('#packetsTable_processing').hide();
+                },
+                dataSrc: response => {
+                    showFilterError(null);
+                    Object.keys(packetCache).forEach(key => delete packetCache[key]);
+                    response.data.forEach(packet => { packetCache[packet.packet_number] = packet; });
+                    return response.data;
+                }
+            },
+            columns: [
+                { data: 'packet_number' },
+                { data: packet => escapeHtml(packet.time_str || packet.time) },
+                { data: packet => packet.ethernet ? packet.ethernet.src : '', orderable: false },
+                { data: packet => packet.ethernet ? packet.ethernet.dst : '', orderable: false },
+                { data: packet => packet.ethernet ? escapeHtml(packet.ethernet.src_vendor) : '', orderable: false },
+                { data: packet => packet.ip ? packet.ip.src : '', orderable: false },
+                { data: packet => packet.ip ? packet.ip.dst : '', orderable: false },
+                { data: packet => packet.tcp ? 'TCP' : packet.udp ? 'UDP' : packet.ip ? packet.ip.proto : 'Inne',
+                  orderable: false },
+                { data: packet => {
+                    const ports = packet.tcp || packet.udp;
+                    return ports ? `${ports.sport} → ${ports.dport}` : '-';
+                  }, orderable: false },
+                { data: 'length' },
+                { data: packet => `<button class="btn btn-sm btn-info packet-details-btn" ` +
+                                  `data-packet-id="${packet.packet_number}">Szczegóły</button>`,
+                  orderable: false }
+            ],
             pageLength: 25,
             order: [[0, 'asc']],
             responsive: true,
@@ -1199,31 +1449,14 @@ function initAdvancedPacketViewer() {
             const packetId = e.target.getAttribute('data-packet-id');
             console.log('Kliknięto przycisk szczegółów dla pakietu:', packetId);
             
-            const packetDataElement = document.getElementById(`packet-data-${packetId}`);
-            
-            if (!packetDataElement) {
-                console.error(`Nie znaleziono elementu packet-data-${packetId}`);
+            const packetData = packetCache[packetId];
+            if (!packetData) {
+                console.error(`Brak danych pakietu ${packetId} na bieżącej stronie`);
                 alert('Nie można załadować szczegółów pakietu - brak danych');
                 return;
             }
             
-            const jsonContent = packetDataElement.textContent || packetDataElement.innerHTML;
-            if (!jsonContent.trim()) {
-                console.error(`Element packet-data-${packetId} jest pusty`);
-                alert('Nie można załadować szczegółów pakietu - dane są puste');
-                return;
-            }
-            
-            try {
-                console.log('Parsowanie JSON dla pakietu:', packetId);
-                const packetData = JSON.parse(jsonContent);
-                console.log('Dane pakietu:', packetData);
-                displayPacketDetails(packetId, packetData);
-            } catch (error) {
-                console.error('Błąd parsowania danych pakietu:', error);
-                console.error('JSON content:', jsonContent);
-                alert('Błąd podczas ładowania szczegółów pakietu: nieprawidłowy format danych');
-            }
+            displayPacketDetails(packetId, packetData);
         }
     });
 }
@@ -1251,6 +1484,7 @@ function displayPacketDetails(packetId, packetData) {
     
     // Generuj zawartość modalu
     modalBody.innerHTML = generatePacketDetailsHTML(packetData);
+    loadPacketPayload(packetData);
     
     // POPRAWKA: Prawidłowe zamknięcie modalu z obsługą błędów
     try {
@@ -1356,6 +1590,7 @@ function generatePacketDetailsHTML(packetData) {
     const hasIP = packetData.ip && typeof packetData.ip === 'object';
     const hasTCP = packetData.tcp && typeof packetData.tcp === 'object';
     const hasUDP = packetData.udp && typeof packetData.udp === 'object';
+    const hasPayload = packetData.payload_size > 0 || packetData.payload || packetData.payload_hex;
     
     return `
         <div class="packet-tabs">
@@ -1398,6 +1633,14 @@ function generatePacketDetailsHTML(packetData) {
                         </button>
                     </li>
                 ` : ''}
+                ${hasPayload ? `
+                    <li class="nav-item" role="presentation">
+                        <button class="nav-link" id="payload-tab" data-bs-toggle="tab" 
+                                data-bs-target="#payload" type="button" role="tab">
+                            Payload
+                        </button>
+                    </li>
+                ` : ''}
                 <li class="nav-item" role="presentation">
                     <button class="nav-link" id="raw-tab" data-bs-toggle="tab" 
                             data-bs-target="#raw" type="button" role="tab">
@@ -1487,6 +1730,19 @@ function generatePacketDetailsHTML(packetData) {
                     </div>
                 ` : ''}
                 
+                <!-- Zakładka Payload - treść pobierana dopiero po otwarciu szczegółów -->
+                ${hasPayload ? `
+                    <div class="tab-pane fade" id="payload" role="tabpanel">
+                        <div id="packetPayloadContent">
+                            <div class="text-center">
+                                <div class="spinner-border spinner-border-sm" role="status">
+                                    <span class="visually-hidden">Ładowanie...</span>
+                                </div>
+                            </div>
+                        </div>
+                    </div>
+                ` : ''}
+                
                 <!-- Zakładka Raw JSON -->
                 <div class="tab-pane fade" id="raw" role="tabpanel">
                     <pre style="background-color: #f8f9fa; padding: 15px; border-radius: 5px; max-height: 400px; overflow-y: auto;"><code class="language-json">${JSON.stringify(packetData, null, 2)}</code></pre>
@@ -1496,6 +1752,56 @@ function generatePacketDetailsHTML(packetData) {
     `;
 }
 
+function loadPacketPayload(packetData) {
+    const container = document.getElementById('packetPayloadContent');
+    if (!container) return;
+    
+    // Starsze analizy mają payload zapisany bezpośrednio w danych pakietu
+    if (packetData.payload || packetData.payload_hex) {
+        renderPacketPayload(container, {
+            size: packetData.payload_size || null,
+            payload: packetData.payload || '',
+            payload_hex: packetData.payload_hex || ''
+        });
+        return;
+    }
+    
+    fetch(`/packet_payload/${analysisId}/${packetData.packet_number}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => renderPacketPayload(container, data))
+        .catch(error => {
+            console.error('Błąd pobierania payload:', error);
+            container.innerHTML = '<div class="alert alert-warning">Nie można pobrać payload pakietu</div>';
+        });
+}
+
+function renderPacketPayload(container, data) {
+    const preStyle = 'background-color: #f8f9fa; padding: 15px; border-radius: 5px; max-height: 300px; overflow-y: auto; white-space: pre-wrap; word-break: break-all;';
+    
+    const text = document.createElement('pre');
+    text.setAttribute('style', preStyle);
+    text.textContent = data.payload;
+    
+    const hex = document.createElement('pre');
+    hex.setAttribute('style', preStyle);
+    hex.textContent = (data.payload_hex.match(/.{1,2}/g) || []).join(' ');
+    
+    container.innerHTML = data.size ? `<p><strong>Rozmiar:</strong> ${data.size} bajtów</p>` : '';
+    if (data.payload) {
+        container.insertAdjacentHTML('beforeend', '<h6>Tekst (UTF-8)</h6>');
+        container.appendChild(text);
+    }
+    if (data.payload_hex) {
+        container.insertAdjacentHTML('beforeend', '<h6>Hex</h6>');
+        container.appendChild(hex);
+    }
+}
+
 function formatTcpFlags(tcp) {
     if (!tcp) return 'N/A';
     
@@ -1618,31 +1924,8 @@ function initFilteredReportGenerator() {
    
    // Wspólna funkcja do generowania eksportów
    function generateFilteredExport(exportType) {
-       // Pobieranie wartości filtrów
-       const srcMac = document.getElementById('filter-src-mac').value;
-       const dstMac = document.getElementById('filter-dst-mac').value;
-       const srcIp = document.getElementById('filter-src-ip').value;
-       const dstIp = document.getElementById('filter-dst-ip').value;
-       const protocol = document.getElementById('filter-protocol').value;
-       const port = document.getElementById('filter-port').value;
-       const lengthMin = document.getElementById('filter-length-min').value;
-       const lengthMax = document.getElementById('filter-length-max').value;
-       const timeStart = document.getElementById('filter-time-start').value;
-       const timeEnd = document.getElementById('filter-time-end').value;
-       
-       // Przygotowanie danych do wysłania
-       const filterData = {
-           srcMac: srcMac,
-           dstMac: dstMac,
-           srcIp: srcIp,
-           dstIp: dstIp,
-           protocol: protocol,
-           port: port,
-           lengthMin: lengthMin,
-           lengthMax: lengthMax,
-           timeStart: timeStart,
-           timeEnd: timeEnd
-       };
+       // Wartości filtrów do wysłania
+       const filterData = packetFilterValues();
        
        // Określenie przycisku i endpointu
        let button, endpoint, loadingText, originalText;
@@ -1672,7 +1955,8 @@ function initFilteredReportGenerator() {
            body: JSON.stringify(filterData)
        })
        .then(response => {
-           if (!response.ok) {
+           // 400 to niepoprawny filtr - treść błędu pokazuje gałąź data.error poniżej
+           if (!response.ok && response.status !== 400) {
                throw new Error('Network response was not ok');
            }
            return response.json();
@@ -1708,63 +1992,14 @@ function initFilteredReportGenerator() {
    const applyFiltersBtn = document.getElementById('apply-filters');
    if (applyFiltersBtn) {
        applyFiltersBtn.addEventListener('click', function() {
-           // Tutaj można dodać kod do filtrowania tabeli bez generowania raportu PDF
-           // Na przykład filtrowanie w DataTables
-           
-           // Pobieranie wartości filtrów
-           const srcMac = document.getElementById('filter-src-mac').value.toLowerCase();
-           const dstMac = document.getElementById('filter-dst-mac').value.toLowerCase();
-           const srcIp = document.getElementById('filter-src-ip').value.toLowerCase();
-           const dstIp = document.getElementById('filter-dst-ip').value.toLowerCase();
-           const protocol = document.getElementById('filter-protocol').value;
-           const port = document.getElementById('filter-port').value;
-           const lengthMin = parseInt(document.getElementById('filter-length-min').value) || 0;
-           const lengthMax = parseInt(document.getElementById('filter-length-max').value) || Number.MAX_SAFE_INTEGER;
-           
-           // Zastosowanie niestandardowego filtra do DataTables
-           const dataTable = $('#packetsTable').DataTable();
-           
-           // Własny filtr wyszukiwania
-           $.fn.dataTable.ext.search.push(
-               function(settings, data, dataIndex) {
-                   // Indeksy kolumn w tabeli
-                   const srcMacIdx = 2; // MAC Źródłowe
-                   const dstMacIdx = 3; // MAC Docelowe
-                   const srcIdx = 5;    // Źródło IP
-                   const dstIdx = 6;    // Cel IP
-                   const protoIdx = 7;  // Protokół
-                   const portsIdx = 8;  // Porty
-                   const lengthIdx = 9; // Długość
-                   
-                   // Dane z wiersza
-                   const rowSrcMac = data[srcMacIdx].toLowerCase();
-                   const rowDstMac = data[dstMacIdx].toLowerCase();
-                   const rowSrc = data[srcIdx].toLowerCase();
-                   const rowDst = data[dstIdx].toLowerCase();
-                   const rowProto = data[protoIdx];
-                   const rowPorts = data[portsIdx];
-                   const rowLength = parseInt(data[lengthIdx]) || 0;
-                   
-                   // Sprawdzanie warunków filtrowania
-                   let match = true;
-                   
-                   if (srcMac && !rowSrcMac.includes(srcMac)) match = false;
-                   if (dstMac && !rowDstMac.includes(dstMac)) match = false;
-                   if (srcIp && !rowSrc.includes(srcIp)) match = false;
-                   if (dstIp && !rowDst.includes(dstIp)) match = false;
-                   if (protocol && rowProto !== protocol) match = false;
-                   if (port && !rowPorts.includes(port)) match = false;
-                   if (rowLength < lengthMin || rowLength > lengthMax) match = false;
-                   
-                   return match;
-               }
-           );
-           
-           // Przeładowanie tabeli z uwzględnieniem filtrów
-           dataTable.draw();
-           
-           // Usunięcie filtra po zastosowaniu
-           $.fn.dataTable.ext.search.pop();
+           // Filtry są wysyłane z każdym żądaniem strony - przeładowanie od pierwszej strony
+           $('#packetsTable').DataTable().ajax.reload();
+       });
+       // Enter w polu wyrażenia działa jak "Zastosuj filtry"
+       document.getElementById('filter-expression').addEventListener('keydown', function(event) {
+           if (event.key === 'Enter') {
+               applyFiltersBtn.click();
+           }
        });
    }
    
@@ -1773,6 +2008,8 @@ function initFilteredReportGenerator() {
    if (resetFiltersBtn) {
        resetFiltersBtn.addEventListener('click', function() {
            // Czyszczenie pól filtrów
+           document.getElementById('filter-expression').value = '';
+           showFilterError(null);
            document.getElementById('filter-src-mac').value = '';
            document.getElementById('filter-dst-mac').value = '';
            document.getElementById('filter-src-ip').value = '';
@@ -1784,8 +2021,8 @@ function initFilteredReportGenerator() {
            document.getElementById('filter-time-start').value = '';
            document.getElementById('filter-time-end').value = '';
            
-           // Przywrócenie oryginalnej tabeli
-           $('#packetsTable').DataTable().search('').columns().search('').draw();
+           // Przywrócenie pełnej tabeli
+           $('#packetsTable').DataTable().ajax.reload();
        });
    }
 }
\ No newline at end of file
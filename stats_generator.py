@@ -2,294 +2,611 @@ from datetime import datetime, timedelta
 from collections import Counter
 import numpy as np
 from mac_vendors import get_mac_vendor
+from sketches import HeavyHitters, HyperLogLog, KllSketch, mix64
+from timeseries import TimeBuckets
+from packet_table import (PacketTable, CHUNK_SIZE, LAYER_ETHERNET, LAYER_IP, LAYER_TCP, LAYER_UDP,
+                          PROTO_TCP, PROTO_UDP, int_to_ip, int_to_mac)
+
+# Liczniki różnych wartości (HyperLogLog) w stats['distinct_counts']
+DISTINCT_COUNTS = ('src_ips', 'dst_ips', 'macs', 'ports', 'flows')
+
+# Kwantyle wielkości pakietów i odstępów między pakietami: szkic KLL (błąd rangi do ok. 2 / k
+# = 0.05%) z dokładnym ogonem QUANTILE_SKETCH_TAIL największych wartości - p99.9 jest dokładny
+# do ok. 8 mln pakietów, p99 do ok. 800 tys. Oszacowanie błędu trafia do stats['quantile_errors'].
+QUANTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p99.9', 0.999))
+QUANTILE_SKETCH_K = 4000
+QUANTILE_SKETCH_TAIL = 8192
+
+# Grupy agregatów StatsAccumulator - sekcje statystyk deklarują, których potrzebują
+ACCUMULATOR_PARTS = ('top', 'times', 'ip_edges', 'mac_edges', 'protocol_payload', 'mac_protocols',
+                     'mac_edge_protocols', 'distributions', 'distinct')
+
+def first_seen_unique(values):
+    """np.unique z zachowaniem kolejności pierwszego wystąpienia (jak wstawianie do dict)"""
+    axis = 0 if values.ndim > 1 else None
+    uniq, first, inverse, counts = np.unique(values, axis=axis, return_index=True,
+                                             return_inverse=True, return_counts=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return uniq[order], first[order], rank[inverse.reshape(-1)], counts[order]
+
+def interleave(first, second):
+    """[a0, b0, a1, b1, ...] - ta sama kolejność zliczania co src/dst w pętli po pakietach"""
+    return np.column_stack((first, second)).ravel()
+
+def nodes_from_edges(edges):
+    """Liczniki węzłów z mapy krawędzi (src, dst) -> liczba, w kolejności pierwszego wystąpienia"""
+    nodes = {}
+    for (src, dst), count in edges.items():
+        nodes[src] = nodes.get(src, 0) + count
+        nodes[dst] = nodes.get(dst, 0) + count
+    return nodes
+
+def count_keys(counter, values, labels=None):
+    """
+    Dolicza porcję kluczy (kolumnę albo pary kolumn) do licznika: słownika w kolejności
+    pierwszego wystąpienia albo szkicu HeavyHitters. labels zamienia klucze-indeksy na
+    wartości (identyfikatory producentów na nazwy).
+    """
+    if len(values) == 0:
+        return
+    uniq, _, _, counts = first_seen_unique(values)
+    keys = uniq.tolist()
+    if values.ndim > 1:
+        keys = list(map(tuple, keys))
+    if labels is not None:
+        keys = [labels[key] for key in keys]
+    if isinstance(counter, HeavyHitters):
+        counter.add_many(keys, counts)
+        return
+    for key, count in zip(keys, counts.tolist()):
+        counter[key] = counter.get(key, 0) + count
+
+def flow_hashes(src_ips, dst_ips, protos, sports, dports):
+    """64-bitowe skróty 5-krotek (src, dst, proto, sport, dport) podanych jako kolumny liczb"""
+    u64 = lambda column: np.asarray(column, dtype=np.uint64)
+    addresses = (u64(src_ips) << np.uint64(32)) | u64(dst_ips)
+    transport = (u64(protos) << np.uint64(32)) | (u64(sports) << np.uint64(16)) | u64(dports)
+    return mix64(mix64(addresses) ^ transport)
+
+def distinct_counts(sketches):
+    counts = {name: sketch.count() for name, sketch in sketches.items()}
+    counts['relative_error'] = round(sketches['src_ips'].relative_error(), 4)
+    return counts
+
+class TableColumns:
+    """Kolumny i maski porcji PacketTable współdzielone przez agregaty StatsAccumulator"""
+
+    def __init__(self, table):
+        self.table = table
+        self.data = data = table.data
+        layers = data['layers']
+        self.lengths = data['length'].astype(np.int64)
+        self.times = data['time']
+        self.is_ethernet = (layers & LAYER_ETHERNET) != 0
+        self.is_ip = (layers & LAYER_IP) != 0
+        self.is_tcp = self.is_ip & ((layers & LAYER_TCP) != 0)
+        self.is_udp = self.is_ip & ((layers & LAYER_UDP) != 0)
+        
+        # Rozmiar nagłówków: Ethernet (+ IP) (+ TCP / UDP)
+        self.header_sizes = 14 + 20 * self.is_ip + 20 * self.is_tcp + 8 * self.is_udp
+        
+        # Kod protokołu: numer IP (0-255), a powyżej TCP / UDP / brak IP
+        self.protocol_codes = np.where(self.is_ip, data['ip_proto'].astype(np.int16), 258)
+        self.protocol_codes[self.is_tcp] = 256
+        self.protocol_codes[self.is_udp] = 257
+
+
+class StatsAccumulator:
+    """
+    Łączalne agregaty statystyk zbierane porcjami PacketTable (add_table) - każda porcja
+    jest liczona wektorowo na kolumnach, a wynik dopisywany do stanu. Stan nie rośnie
+    z liczbą pakietów: czasy i wielkości pakietów nie są przechowywane - rozkład czasowy
+    i przepustowość korzystają z liczników TimeBuckets, kwantyle i histogram wielkości ze
+    szkiców KLL, liczby różnych wartości z HyperLogLog. Liczniki kluczy (protokoły, adresy,
+    porty, krawędzie grafów) mają wpis na każdy różny klucz; z parametrem sketch
+    (np. {'capacity': 1024, 'width': 4096, 'depth': 4}) liczniki TOP adresów IP, portów,
+    MAC i producentów są szkicami HeavyHitters o stałej pamięci.
+    
+    merge() dołącza agregaty pakietów występujących po pakietach self (fragmenty pliku
+    z równoległego parsowania, kolejne porcje). Liczniki, sumy, TimeBuckets i HyperLogLog
+    łączą się dokładnie - wynik jest taki sam jak dla jednego przebiegu i nie zależy od
+    sposobu grupowania - a szkice KLL i HeavyHitters w granicach swoich błędów.
+    
+    parts - zbierane grupy agregatów (ACCUMULATOR_PARTS), sections - sekcje statystyk,
+    które z nich zbuduje StatsGenerator.finalize().
+    """
+    
+    def __init__(self, sketch=None, parts=ACCUMULATOR_PARTS, sections=None):
+        self.sketch = sketch
+        self.parts = frozenset(parts)
+        self.sections = sections
+        self.total_packets = 0
+        self.total_bytes = 0
+        self.header_overhead = 0
+        self.payload_total = 0
+        self.payload_max = 0
+        self.payload_min = None
+        # Kod protokołu pakietów IP (TableColumns.protocol_codes) -> liczba pakietów
+        self.protocols = {}
+        if sketch:
+            self.ips = HeavyHitters(**sketch)
+            self.ports = HeavyHitters(**sketch)
+            self.macs = HeavyHitters(**sketch)
+            self.vendors = HeavyHitters(**sketch)
+        else:
+            self.ips = {}
+            self.ports = {}
+            self.macs = {}
+            self.vendors = {}
+        self.time_buckets = TimeBuckets()
+        self.ip_edges = {}
+        self.mac_edges = {}
+        # Kod protokołu -> [bajty, pakiety]; MAC -> [TCP, UDP, inne]
+        self.protocol_payload = {}
+        self.mac_protocols = {}
+        # Protokoły krawędzi jako dict (uporządkowany zbiór) - kolejność pierwszego wystąpienia
+        self.mac_edge_protocols = {}
+        self.sizes = KllSketch(QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL)
+        self.gaps = KllSketch(QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL)
+        # Czas pierwszego i ostatniego pakietu - odstęp na granicy fragmentów w merge()
+        self.first_time = None
+        self.last_time = None
+        self.distinct = {name: HyperLogLog() for name in DISTINCT_COUNTS}
+    
+    def add_table(self, table):
+        """Dolicza pakiety PacketTable porcjami po CHUNK_SIZE wierszy"""
+        for start in range(0, len(table), CHUNK_SIZE):
+            self.add_columns(TableColumns(table.take(slice(start, start + CHUNK_SIZE))))
+        return self
+    
+    def add_columns(self, c):
+        data = c.data
+        self.total_packets += len(data)
+        self.total_bytes += int(c.lengths.sum())
+        self.header_overhead += int(c.header_sizes.sum())
+        payloads = c.lengths - c.header_sizes
+        payloads = payloads[payloads > 0]
+        if len(payloads):
+            self.payload_total += int(payloads.sum())
+            self.payload_max = max(self.payload_max, int(payloads.max()))
+            self.update_payload_min(int(payloads.min()))
+        
+        parts = self.parts
+        if 'top' in parts:
+            count_keys(self.protocols, c.protocol_codes[c.is_ip])
+            count_keys(self.ips, interleave(data['src_ip'][c.is_ip], data['dst_ip'][c.is_ip]))
+            has_ports = c.is_tcp | c.is_udp
+            count_keys(self.ports, interleave(data['sport'][has_ports], data['dport'][has_ports]))
+            count_keys(self.macs, interleave(data['src_mac'][c.is_ethernet], data['dst_mac'][c.is_ethernet]))
+            count_keys(self.vendors, interleave(data['src_vendor'][c.is_ethernet], data['dst_vendor'][c.is_ethernet]),
+                       c.table.vendors)
+        if 'times' in parts:
+            self.time_buckets.add(c.times, c.lengths)
+        if 'ip_edges' in parts:
+            count_keys(self.ip_edges, np.column_stack((data['src_ip'][c.is_ip], data['dst_ip'][c.is_ip])))
+        if 'mac_edges' in parts:
+            count_keys(self.mac_edges, np.column_stack((data['src_mac'][c.is_ethernet], data['dst_mac'][c.is_ethernet])))
+        if 'protocol_payload' in parts:
+            self.add_protocol_payload(c)
+        if 'mac_protocols' in parts:
+            self.add_mac_protocols(c)
+        if 'mac_edge_protocols' in parts:
+            self.add_mac_edge_protocols(c)
+        if 'distributions' in parts:
+            self.add_distributions(c.lengths, c.times)
+        if 'distinct' in parts:
+            self.add_distinct(c)
+    
+    def update_payload_min(self, value):
+        if self.payload_min is None or value < self.payload_min:
+            self.payload_min = value
+    
+    def add_protocol_payload(self, c):
+        if len(c.protocol_codes) == 0:
+            return
+        uniq, _, inverse, counts = first_seen_unique(c.protocol_codes)
+        totals = np.bincount(inverse, weights=c.lengths, minlength=len(uniq))
+        for code, total, count in zip(uniq.tolist(), totals.astype(np.int64).tolist(), counts.tolist()):
+            entry = self.protocol_payload.get(code)
+            if entry is None:
+                self.protocol_payload[code] = [total, count]
+            else:
+                entry[0] += total
+                entry[1] += count
+    
+    def add_mac_protocols(self, c):
+        data = c.data
+        macs = interleave(data['src_mac'][c.is_ethernet], data['dst_mac'][c.is_ethernet])
+        if len(macs) == 0:
+            return
+        classes = np.repeat(c.table.protocol_class()[c.is_ethernet], 2)
+        uniq, _, inverse, _ = first_seen_unique(macs)
+        tcp = np.bincount(inverse[classes == PROTO_TCP], minlength=len(uniq))
+        udp = np.bincount(inverse[classes == PROTO_UDP], minlength=len(uniq))
+        other = np.bincount(inverse[(classes != PROTO_TCP) & (classes != PROTO_UDP)], minlength=len(uniq))
+        for mac, counts in zip(uniq.tolist(), np.column_stack((tcp, udp, other)).tolist()):
+            entry = self.mac_protocols.get(mac)
+            if entry is None:
+                self.mac_protocols[mac] = counts
+            else:
+                for i, count in enumerate(counts):
+                    entry[i] += count
+    
+    def add_mac_edge_protocols(self, c):
+        data = c.data
+        pairs = np.column_stack((data['src_mac'][c.is_ethernet], data['dst_mac'][c.is_ethernet]))
+        if len(pairs) == 0:
+            return
+        edge_pairs, _, edge_index, _ = first_seen_unique(pairs)
+        edges = list(map(tuple, edge_pairs.tolist()))
+        edge_protocols, _, _, _ = first_seen_unique(np.column_stack((edge_index, c.protocol_codes[c.is_ethernet])))
+        for edge, code in edge_protocols.tolist():
+            self.mac_edge_protocols.setdefault(edges[edge], {})[code] = True
+    
+    def add_distributions(self, lengths, times):
+        self.sizes.add_many(lengths)
+        if len(times) == 0:
+            return
+        # Odstępy w kolejności przechwycenia (ujemne jako 0), także na granicy porcji
+        gaps = np.diff(times) if self.last_time is None else np.diff(times, prepend=self.last_time)
+        self.gaps.add_many(np.maximum(gaps, 0))
+        if self.first_time is None:
+            self.first_time = float(times[0])
+        self.last_time = float(times[-1])
+    
+    def add_distinct(self, c):
+        data = c.data
+        sketches = self.distinct
+        has_ports = c.is_tcp | c.is_udp
+        src_ips = data['src_ip'][c.is_ip]
+        dst_ips = data['dst_ip'][c.is_ip]
+        sketches['src_ips'].add_hashes(mix64(src_ips))
+        sketches['dst_ips'].add_hashes(mix64(dst_ips))
+        sketches['macs'].add_hashes(mix64(data['src_mac'][c.is_ethernet]))
+        sketches['macs'].add_hashes(mix64(data['dst_mac'][c.is_ethernet]))
+        sketches['ports'].add_hashes(mix64(data['sport'][has_ports]))
+        sketches['ports'].add_hashes(mix64(data['dport'][has_ports]))
+        # Pakiety IP bez TCP/UDP mają w kolumnach portów zera (sport = dport = 0)
+        sketches['flows'].add_hashes(flow_hashes(src_ips, dst_ips, data['ip_proto'][c.is_ip],
+                                                 data['sport'][c.is_ip], data['dport'][c.is_ip]))
+    
+    def merge(self, other):
+        """Dołącza agregaty z other (pakiety występujące po pakietach self)"""
+        if self.sketch != other.sketch:
+            raise ValueError("Cannot merge exact and sketch-based statistics")
+        if self.parts != other.parts:
+            raise ValueError("Cannot merge statistics collected for different sections")
+        
+        self.total_packets += other.total_packets
+        self.total_bytes += other.total_bytes
+        self.header_overhead += other.header_overhead
+        self.payload_total += other.payload_total
+        self.payload_max = max(self.payload_max, other.payload_max)
+        if other.payload_min is not None:
+            self.update_payload_min(other.payload_min)
+        
+        top_counters = ((self.ips, other.ips), (self.ports, other.ports),
+                        (self.macs, other.macs), (self.vendors, other.vendors))
+        if self.sketch:
+            for sketch, other_sketch in top_counters:
+                sketch.merge(other_sketch)
+            top_counters = ()
+        
+        for counter, other_counter in ((self.protocols, other.protocols), (self.ip_edges, other.ip_edges),
+                                       (self.mac_edges, other.mac_edges)) + top_counters:
+            for key, count in other_counter.items():
+                counter[key] = counter.get(key, 0) + count
+        
+        for nested, other_nested in ((self.protocol_payload, other.protocol_payload),
+                                     (self.mac_protocols, other.mac_protocols)):
+            for key, other_counts in other_nested.items():
+                counts = nested.get(key)
+                if counts is None:
+                    nested[key] = list(other_counts)
+                else:
+                    for i, count in enumerate(other_counts):
+                        counts[i] += count
+        
+        for edge, protocols in other.mac_edge_protocols.items():
+            self.mac_edge_protocols.setdefault(edge, {}).update(protocols)
+        
+        self.time_buckets.merge(other.time_buckets)
+        self.sizes.merge(other.sizes)
+        if self.last_time is not None and other.first_time is not None:
+            self.gaps.add_many([max(other.first_time - self.last_time, 0)])
+        self.gaps.merge(other.gaps)
+        if self.first_time is None:
+            self.first_time = other.first_time
+        if other.last_time is not None:
+            self.last_time = other.last_time
+        
+        for name, sketch in self.distinct.items():
+            sketch.merge(other.distinct[name])
+        
+        return self
+
+
+class StatsSection:
+    """
+    Sekcja statystyk: calculator(accumulator, stats) zwraca słownik kluczy dopisywanych
+    do stats. parts - grupy agregatów StatsAccumulator, z których korzysta, depends -
+    sekcje, których wyniki calculator czyta ze stats. Sekcje leniwe (lazy) nie są liczone
+    przy wczytaniu pliku, tylko przy pierwszym żądaniu.
+    """
+
+    def __init__(self, name, calculator, keys=None, depends=(), lazy=False, parts=()):
+        self.name = name
+        self.calculator = calculator
+        self.keys = tuple(keys or (name,))
+        self.depends = tuple(depends)
+        self.lazy = lazy
+        self.parts = tuple(parts)
+
+    def present(self, stats):
+        return all(key in stats for key in self.keys)
+
 
 class StatsGenerator:
+    def __init__(self, sketch=None):
+        # Konfiguracja szkiców TOP (None = dokładne liczniki)
+        self.sketch = sketch
+        
+        # Rejestr sekcji statystyk - kolejność rejestracji = kolejność kluczy w wyniku
+        self.sections = {}
+        self.register_section('top', self.top_section, parts=('top',),
+                              keys=('protocols', 'top_ips', 'top_ports', 'top_mac_addresses', 'top_mac_vendors'))
+        self.register_section('time_distribution', lambda acc, stats: {
+            'time_distribution': self.time_distribution_from_buckets(acc.time_buckets, acc.total_packets)},
+                              parts=('times',))
+        self.register_section('network_graph', lambda acc, stats: {
+            'network_graph': self.graph_from_edges(acc.ip_edges, int_to_ip)}, parts=('ip_edges',))
+        self.register_section('mac_graph', lambda acc, stats: {
+            'mac_graph': self.graph_from_edges(acc.mac_edges, int_to_mac, with_vendor=True)}, parts=('mac_edges',))
+        self.register_section('geo_data', lambda acc, stats: {'geo_data': []})
+        self.register_section('payload_stats', lambda acc, stats: {'payload_stats': {
+            'total_payload_bytes': acc.payload_total,
+            'avg_payload_per_packet': acc.payload_total / acc.total_packets if acc.total_packets else 0,
+            'max_payload_size': acc.payload_max,
+            'min_payload_size': acc.payload_min if acc.payload_min is not None else 0
+        }})
+        self.register_section('throughput_stats', lambda acc, stats: {
+            'throughput_stats': self.throughput_from_buckets(acc.time_buckets, acc.total_packets, acc.total_bytes)},
+                              parts=('times',))
+        self.register_section('network_load', lambda acc, stats: {'network_load': {
+            'total_bytes': acc.total_bytes,
+            'header_overhead': acc.header_overhead,
+            'payload_efficiency': ((acc.total_bytes - acc.header_overhead) / acc.total_bytes * 100)
+                                  if acc.total_bytes > 0 else 0
+        }})
+        self.register_section('protocol_payload', lambda acc, stats: {'protocol_payload': {
+            self.protocol_code_name(code): {'total': total, 'packets': packets}
+            for code, (total, packets) in acc.protocol_payload.items()
+        }}, parts=('protocol_payload',), lazy=True)
+        self.register_section('mac_protocol_stats', lambda acc, stats: {'mac_protocol_stats': {
+            int_to_mac(mac): {'TCP': tcp, 'UDP': udp, 'Other': other}
+            for mac, (tcp, udp, other) in acc.mac_protocols.items()
+        }}, parts=('mac_protocols',), lazy=True)
+        self.register_section('distributions', lambda acc, stats: self.distribution_stats(acc.sizes, acc.gaps),
+                              keys=('packet_size_distribution', 'packet_size_quantiles', 'inter_arrival_quantiles',
+                                    'quantile_errors'), parts=('distributions',))
+        self.register_section('enhanced_mac_graph', self.enhanced_mac_graph_section,
+                              depends=('mac_protocol_stats',), lazy=True, parts=('mac_edges', 'mac_edge_protocols'))
+        self.register_section('top_data', lambda acc, stats: {
+            'top_ports_data': [{'port': p, 'count': n} for p, n in list(stats['top_ports'].items())[:5]],
+            'top_mac_data': [{'mac': m, 'count': n} for m, n in list(stats['top_mac_addresses'].items())[:5]]
+        }, keys=('top_ports_data', 'top_mac_data'), depends=('top',))
+        self.register_section('distinct_counts', lambda acc, stats: {
+            'distinct_counts': distinct_counts(acc.distinct)}, parts=('distinct',))
+    
+    def register_section(self, name, calculator, keys=None, depends=(), lazy=False, parts=()):
+        """Dodaje sekcję statystyk; zależności muszą być zarejestrowane wcześniej"""
+        for dependency in depends:
+            if dependency not in self.sections:
+                raise ValueError(f"Unknown stats section dependency: {dependency}")
+        for part in parts:
+            if part not in ACCUMULATOR_PARTS:
+                raise ValueError(f"Unknown stats accumulator part: {part}")
+        self.sections[name] = StatsSection(name, calculator, keys, depends, lazy, parts)
+    
+    def core_sections(self):
+        """Sekcje liczone przy wczytaniu pliku (bez leniwych)"""
+        return [name for name, section in self.sections.items() if not section.lazy]
+    
+    def section_names(self, stats_keys):
+        """Sekcje dostarczające podane klucze statystyk (nieznane klucze są pomijane)"""
+        return [name for name, section in self.sections.items() if set(section.keys) & set(stats_keys)]
+    
+    def resolve_sections(self, names):
+        """Podane sekcje wraz z zależnościami, w kolejności rejestracji"""
+        needed = set()
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.sections[name].depends)
+        return [name for name in self.sections if name in needed]
+    
+    def accumulator(self, sections=None):
+        """Pusty StatsAccumulator zbierający agregaty potrzebne podanym sekcjom (domyślnie wszystkim)"""
+        names = self.resolve_sections(sections) if sections is not None else list(self.sections)
+        parts = {part for name in names for part in self.sections[name].parts}
+        return StatsAccumulator(self.sketch, parts, names)
+    
+    def compute_sections(self, stats, accumulator, names):
+        for name in names:
+            stats.update(self.sections[name].calculator(accumulator, stats))
+    
+    def finalize(self, accumulator):
+        """Słownik statystyk z sekcji, dla których accumulator zbierał agregaty"""
+        stats = {'total_packets': accumulator.total_packets}
+        self.compute_sections(stats, accumulator, accumulator.sections)
+        return stats
+    
+    def ensure_sections(self, stats, load_table, names):
+        """
+        Dolicza brakujące sekcje (i ich zależności) do gotowego słownika statystyk.
+        load_table() jest wywoływane tylko wtedy, gdy czegoś brakuje. Zwraca listę
+        policzonych sekcji.
+        """
+        missing = [name for name in self.resolve_sections(names) if not self.sections[name].present(stats)]
+        if missing:
+            accumulator = self.accumulator(missing)
+            accumulator.add_table(load_table())
+            self.compute_sections(stats, accumulator, missing)
+        return missing
+    
     def generate_stats(self, packets):
         """Główna metoda generująca wszystkie statystyki"""
-        stats = {
-            'total_packets': len(packets),
-            'protocols': {},
-            'top_ips': {},
-            'top_ports': {},
-            'top_mac_addresses': {},
-            'top_mac_vendors': {},
-            'packet_sizes': [],
-            'time_distribution': {},
-            'network_graph': {'nodes': [], 'edges': []},
-            'mac_graph': {'nodes': [], 'edges': []},
-            'geo_data': []
+        if isinstance(packets, PacketTable):
+            return self.generate_table_stats(packets)
+        
+        # Strumień słowników pakietów (PcapAnalyzer.iter_packets) - porcjami przez PacketTable
+        accumulator = self.accumulator()
+        for table in PacketTable.chunked(packets):
+            accumulator.add_table(table)
+        return self.finalize(accumulator)
+    
+    def generate_table_stats(self, table, sections=None):
+        """
+        Statystyki PacketTable. sections - nazwy sekcji z rejestru (domyślnie wszystkie);
+        zależności są dołączane.
+        """
+        return self.finalize(self.accumulator(sections).add_table(table))
+    
+    def merge_stats(self, partials):
+        """Łączy częściowe agregaty (StatsAccumulator) w kolejności pakietów i zwraca statystyki"""
+        merged = None
+        for partial in partials:
+            if merged is None:
+                merged = StatsAccumulator(partial.sketch, partial.parts, partial.sections)
+            merged.merge(partial)
+        return self.finalize(merged if merged is not None else self.accumulator())
+    
+    def top_section(self, acc, stats):
+        top = {
+            'protocols': {self.protocol_code_name(code, 'Protocol'): count for code, count in acc.protocols.items()},
+            'top_ips': {int_to_ip(ip): count for ip, count in self.top_keys(acc.ips)},
+            'top_ports': dict(self.top_keys(acc.ports)),
+            'top_mac_addresses': {int_to_mac(mac): count for mac, count in self.top_keys(acc.macs)},
+            'top_mac_vendors': dict(self.top_keys(acc.vendors))
+        }
+        if acc.sketch:
+            top['sketch_errors'] = {
+                'top_ips': acc.ips.error_report(),
+                'top_ports': acc.ports.error_report(),
+                'top_mac_addresses': acc.macs.error_report(),
+                'top_mac_vendors': acc.vendors.error_report()
+            }
+        return top
+    
+    def top_keys(self, counter, limit=10):
+        """TOP kluczy licznika; remisy w kolejności pierwszego wystąpienia"""
+        if isinstance(counter, HeavyHitters):
+            return counter.top(limit)
+        return Counter(counter).most_common(limit)
+    
+    def protocol_code_name(self, code, ip_prefix='IP'):
+        if code == 256:
+            return 'TCP'
+        if code == 257:
+            return 'UDP'
+        if code == 258:
+            return 'Other'
+        return f"{ip_prefix}({code})" if ip_prefix == 'IP' else f"{ip_prefix} {code}"
+    
+    def graph_from_edges(self, edges, to_label, with_vendor=False):
+        """Węzły i krawędzie grafu w kolejności pierwszego wystąpienia"""
+        graph = {'nodes': [], 'edges': []}
+        labels = {}
+        for value, count in nodes_from_edges(edges).items():
+            label = labels[value] = to_label(value)
+            node = {'id': label, 'label': label, 'value': count}
+            if with_vendor:
+                node['title'] = get_mac_vendor(label)
+            graph['nodes'].append(node)
+        
+        graph['edges'] = [{'from': labels[src], 'to': labels[dst], 'value': count}
+                          for (src, dst), count in edges.items()]
+        return graph
+    
+    def enhanced_mac_graph_section(self, acc, stats):
+        enhanced_mac_graph = {
+            'nodes': [],
+            'edges': []
         }
         
-        # Podstawowe statystyki
-        self.collect_basic_stats(packets, stats)
-        
-        # Zaawansowane statystyki sieciowe
-        stats['payload_stats'] = self.calculate_payload_stats(packets)
-        stats['throughput_stats'] = self.calculate_throughput_stats(packets)
-        stats['network_load'] = self.calculate_network_load(packets)
-        stats['protocol_payload'] = self.calculate_protocol_payload(packets)
-        stats['mac_protocol_stats'] = self.calculate_mac_protocol_stats(packets)
-        
-        # Rozkład czasowy i wielkości
-        stats['time_distribution'] = self.calculate_time_distribution(packets)
-        stats['packet_size_distribution'] = self.calculate_size_distribution(stats['packet_sizes'])
-        
-        # Grafy sieciowe
-        self.build_network_graph(packets, stats)
-        self.build_mac_graph(packets, stats)
-        
-        # Ulepszony graf MAC z protokołami
-        stats['enhanced_mac_graph'] = self.build_enhanced_mac_graph(packets, stats['mac_protocol_stats'])
+        mac_protocol_stats = stats['mac_protocol_stats']
+        if not acc.total_packets or not mac_protocol_stats:
+            return {'enhanced_mac_graph': enhanced_mac_graph}
         
-        # Sortowanie i limitowanie TOP wartości
-        stats['top_ips'] = dict(Counter(stats['top_ips']).most_common(10))
-        stats['top_ports'] = dict(Counter(stats['top_ports']).most_common(10))
-        stats['top_mac_addresses'] = dict(Counter(stats['top_mac_addresses']).most_common(10))
-        stats['top_mac_vendors'] = dict(Counter(stats['top_mac_vendors']).most_common(10))
+        enhanced_mac_graph['nodes'] = self.build_enhanced_mac_nodes(mac_protocol_stats)
         
-        # Dane dla wykresów
-        stats['top_ports_data'] = [{'port': p, 'count': c} for p, c in list(stats['top_ports'].items())[:5]]
-        stats['top_mac_data'] = [{'mac': m, 'count': c} for m, c in list(stats['top_mac_addresses'].items())[:5]]
+        edges_data = {}
+        for edge, count in acc.mac_edges.items():
+            src_mac, dst_mac = int_to_mac(edge[0]), int_to_mac(edge[1])
+            edges_data[f"{src_mac}->{dst_mac}"] = {
+                'from': src_mac,
+                'to': dst_mac,
+                'value': count,
+                'protocols': {self.protocol_code_name(code): True for code in acc.mac_edge_protocols[edge]}
+            }
         
-        return stats
+        enhanced_mac_graph['edges'] = self.format_enhanced_mac_edges(edges_data)
+        return {'enhanced_mac_graph': enhanced_mac_graph}
     
-    def collect_basic_stats(self, packets, stats):
-        for packet in packets:
-            stats['packet_sizes'].append(packet['length'])
-            
-            if 'ethernet' in packet:
-                src_mac = packet['ethernet']['src']
-                dst_mac = packet['ethernet']['dst']
-                stats['top_mac_addresses'][src_mac] = stats['top_mac_addresses'].get(src_mac, 0) + 1
-                stats['top_mac_addresses'][dst_mac] = stats['top_mac_addresses'].get(dst_mac, 0) + 1
-                
-                src_vendor = packet['ethernet']['src_vendor']
-                dst_vendor = packet['ethernet']['dst_vendor']
-                stats['top_mac_vendors'][src_vendor] = stats['top_mac_vendors'].get(src_vendor, 0) + 1
-                stats['top_mac_vendors'][dst_vendor] = stats['top_mac_vendors'].get(dst_vendor, 0) + 1
-            
-            if 'ip' in packet:
-                if 'tcp' in packet:
-                    stats['protocols']['TCP'] = stats['protocols'].get('TCP', 0) + 1
-                    stats['top_ports'][packet['tcp']['sport']] = stats['top_ports'].get(packet['tcp']['sport'], 0) + 1
-                    stats['top_ports'][packet['tcp']['dport']] = stats['top_ports'].get(packet['tcp']['dport'], 0) + 1
-                elif 'udp' in packet:
-                    stats['protocols']['UDP'] = stats['protocols'].get('UDP', 0) + 1
-                    stats['top_ports'][packet['udp']['sport']] = stats['top_ports'].get(packet['udp']['sport'], 0) + 1
-                    stats['top_ports'][packet['udp']['dport']] = stats['top_ports'].get(packet['udp']['dport'], 0) + 1
-                else:
-                    proto = f"Protocol {packet['ip']['proto']}"
-                    stats['protocols'][proto] = stats['protocols'].get(proto, 0) + 1
-                
-                src_ip = packet['ip']['src']
-                dst_ip = packet['ip']['dst']
-                stats['top_ips'][src_ip] = stats['top_ips'].get(src_ip, 0) + 1
-                stats['top_ips'][dst_ip] = stats['top_ips'].get(dst_ip, 0) + 1
-    
-    def calculate_time_distribution(self, packets):
-        """Oblicza rozkład czasowy pakietów"""
-        if not packets:
+    def time_label(self, bucket_time, duration):
+        if duration < 60:  # mniej niż minuta - pokazuj sekundy
+            return datetime.fromtimestamp(bucket_time).strftime('%H:%M:%S.%f')[:-3]
+        elif duration < 3600:  # mniej niż godzina - pokazuj minuty i sekundy
+            return datetime.fromtimestamp(bucket_time).strftime('%H:%M:%S')
+        else:  # więcej niż godzina - pokazuj godziny i minuty
+            return datetime.fromtimestamp(bucket_time).strftime('%H:%M')
+    
+    def offset_label(self, offset, duration):
+        if duration < 60:  # mniej niż minuta
+            return f"{offset:.1f}s"
+        elif duration < 3600:  # mniej niż godzina
+            minutes = int(offset // 60)
+            seconds = int(offset % 60)
+            return f"{minutes:02d}:{seconds:02d}"
+        else:  # więcej niż godzina
+            hours = int(offset // 3600)
+            minutes = int((offset % 3600) // 60)
+            return f"{hours}h {minutes:02d}m"
+    
+    def time_distribution_from_buckets(self, buckets, total_packets):
+        """Rozkład czasowy (10-50 równych okien) z liczników TimeBuckets"""
+        if not total_packets:
             return {'labels': [], 'values': []}
         
-        # Funkcja pomocnicza do konwersji czasu
-        def get_packet_time(packet):
-            time_val = packet.get('time', 0)
-            if isinstance(time_val, (int, float)):
-                return float(time_val)
-            elif isinstance(time_val, str):
-                try:
-                    from datetime import datetime
-                    dt = datetime.fromisoformat(time_val.replace('Z', '+00:00'))
-                    return dt.timestamp()
-                except:
-                    try:
-                        dt = datetime.strptime(time_val, '%Y-%m-%d %H:%M:%S.%f')
-                        return dt.timestamp()
-                    except:
-                        try:
-                            dt = datetime.strptime(time_val, '%Y-%m-%d %H:%M:%S')
-                            return dt.timestamp()
-                        except:
-                            return 0
-            return 0
-        
-        # Sortowanie pakietów według czasu
-        packets_with_time = []
-        for packet in packets:
-            packet_time = get_packet_time(packet)
-            if packet_time > 0:
-                packets_with_time.append(packet_time)
-        
-        if not packets_with_time:
-            return {'labels': ['0s'], 'values': [len(packets)]}
-        
-        packets_with_time.sort()
-        
-        # Znajdź zakres czasowy
-        start_time = packets_with_time[0]
-        end_time = packets_with_time[-1]
+        timed_packets = buckets.timed_packets()
+        if timed_packets == 0:
+            return {'labels': ['0s'], 'values': [total_packets]}
         
+        start_time, end_time = buckets.start, buckets.end
         if start_time == end_time:
             # Wszystkie pakiety w tym samym czasie
-            from datetime import datetime
-            time_str = datetime.fromtimestamp(start_time).strftime('%H:%M:%S')
             return {
-                'labels': [time_str],
-                'values': [len(packets_with_time)]
+                'labels': [datetime.fromtimestamp(start_time).strftime('%H:%M:%S')],
+                'values': [timed_packets]
             }
         
-        # Podziel na równomierne okna czasowe
         duration = end_time - start_time
-        num_buckets = min(50, max(10, len(packets_with_time) // 10))  # 10-50 bucketów
+        num_buckets = min(50, max(10, timed_packets // 10))
         bucket_size = duration / num_buckets
-        
-        # Inicjalizacja bucketów
-        buckets = [0] * num_buckets
-        labels = []
-        
-        # Wypełnij buckety
-        for packet_time in packets_with_time:
-            bucket_index = int((packet_time - start_time) / bucket_size)
-            if bucket_index >= num_buckets:
-                bucket_index = num_buckets - 1
-            buckets[bucket_index] += 1
-        
-        # Generuj etykiety czasowe
-        from datetime import datetime
-        for i in range(num_buckets):
-            bucket_time = start_time + (i * bucket_size)
-            if duration < 60:  # mniej niż minuta - pokazuj sekundy
-                label = datetime.fromtimestamp(bucket_time).strftime('%H:%M:%S.%f')[:-3]
-            elif duration < 3600:  # mniej niż godzina - pokazuj minuty i sekundy
-                label = datetime.fromtimestamp(bucket_time).strftime('%H:%M:%S')
-            else:  # więcej niż godzina - pokazuj godziny i minuty
-                label = datetime.fromtimestamp(bucket_time).strftime('%H:%M')
-            labels.append(label)
+        packets, _ = buckets.window_totals(start_time, bucket_size, num_buckets)
         
         return {
-            'labels': labels,
-            'values': buckets
-        }
-
-    def calculate_size_distribution(self, packet_sizes):
-        """Oblicza rozkład wielkości pakietów"""
-        if not packet_sizes:
-            return {'labels': [], 'values': []}
-        
-        import numpy as np
-        
-        # Znajdź zakresy wielkości
-        min_size = min(packet_sizes)
-        max_size = max(packet_sizes)
-        
-        if min_size == max_size:
-            return {
-                'labels': [f'{min_size} B'],
-                'values': [len(packet_sizes)]
-            }
-        
-        # Stwórz histogram z inteligentnym podziałem
-        num_bins = min(20, max(5, len(set(packet_sizes))))
-        hist, bin_edges = np.histogram(packet_sizes, bins=num_bins)
-        
-        # Generuj etykiety dla przedziałów
-        labels = []
-        for i in range(len(bin_edges) - 1):
-            start = int(bin_edges[i])
-            end = int(bin_edges[i + 1])
-            if end - start == 1:
-                labels.append(f'{start} B')
-            else:
-                labels.append(f'{start}-{end} B')
-        
-        return {
-            'labels': labels,
-            'values': hist.tolist()
+            'labels': [self.time_label(start_time + i * bucket_size, duration) for i in range(num_buckets)],
+            'values': packets.tolist()
         }
     
-    def build_network_graph(self, packets, stats):
-        edges = {}
-        nodes = {}
-        
-        for packet in packets:
-            if 'ip' in packet:
-                src = packet['ip']['src']
-                dst = packet['ip']['dst']
-                
-                nodes[src] = nodes.get(src, 0) + 1
-                nodes[dst] = nodes.get(dst, 0) + 1
-                
-                edge_key = f"{src}->{dst}"
-                edges[edge_key] = edges.get(edge_key, 0) + 1
-        
-        stats['network_graph']['nodes'] = [
-            {'id': ip, 'label': ip, 'value': count}
-            for ip, count in nodes.items()
-        ]
-        
-        stats['network_graph']['edges'] = [
-            {'from': key.split('->')[0], 'to': key.split('->')[1], 'value': count}
-            for key, count in edges.items()
-        ]
-    
-    def build_mac_graph(self, packets, stats):
-        edges = {}
-        nodes = {}
-        
-        for packet in packets:
-            if 'ethernet' in packet:
-                src = packet['ethernet']['src']
-                dst = packet['ethernet']['dst']
-                
-                nodes[src] = nodes.get(src, 0) + 1
-                nodes[dst] = nodes.get(dst, 0) + 1
-                
-                edge_key = f"{src}->{dst}"
-                edges[edge_key] = edges.get(edge_key, 0) + 1
-        
-        stats['mac_graph']['nodes'] = [
-            {'id': mac, 'label': mac, 'value': count, 'title': get_mac_vendor(mac)}
-            for mac, count in nodes.items()
-        ]
-        
-        stats['mac_graph']['edges'] = [
-            {'from': key.split('->')[0], 'to': key.split('->')[1], 'value': count}
-            for key, count in edges.items()
-        ]
-    
-    def calculate_payload_stats(self, packets):
-        total = 0
-        count = 0
-        max_size = 0
-        min_size = float('inf')
-        
-        for packet in packets:
-            size = packet.get('length', 0)
-            header_size = 14  # Ethernet
-            if 'ip' in packet:
-                header_size += 20
-            if 'tcp' in packet:
-                header_size += 20
-            elif 'udp' in packet:
-                header_size += 8
-            
-            payload = max(0, size - header_size)
-            if payload > 0:
-                total += payload
-                count += 1
-                max_size = max(max_size, payload)
-                min_size = min(min_size, payload)
-        
-        return {
-            'total_payload_bytes': total,
-            'avg_payload_per_packet': total / len(packets) if packets else 0,
-            'max_payload_size': max_size,
-            'min_payload_size': min_size if min_size != float('inf') else 0
-        }
-    
-    def calculate_throughput_stats(self, packets):
-        """Oblicza statystyki przepustowości w czasie - POPRAWIONA WERSJA"""
-        if not packets:
+    def throughput_from_buckets(self, buckets, total_packets, total_bytes):
+        """Przepustowość w oknach czasowych z liczników TimeBuckets"""
+        if not total_packets:
             return {
                 'avg_throughput': 0,
                 'peak_throughput': 0,
@@ -298,201 +615,93 @@ class StatsGenerator:
                 'packets_per_second': []
             }
         
-        # Sortowanie pakietów wg czasu - obsługa różnych formatów
-        def get_packet_time(packet):
-            time_val = packet.get('time', 0)
-            if isinstance(time_val, (int, float)):
-                return float(time_val)
-            elif isinstance(time_val, str):
-                try:
-                    # Próba parsowania jako ISO format
-                    from datetime import datetime
-                    dt = datetime.fromisoformat(time_val.replace('Z', '+00:00'))
-                    return dt.timestamp()
-                except:
-                    try:
-                        # Próba parsowania innych formatów
-                        dt = datetime.strptime(time_val, '%Y-%m-%d %H:%M:%S.%f')
-                        return dt.timestamp()
-                    except:
-                        try:
-                            dt = datetime.strptime(time_val, '%Y-%m-%d %H:%M:%S')
-                            return dt.timestamp()
-                        except:
-                            print(f"Nie można sparsować czasu: {time_val}")
-                            return 0
-            else:
-                return 0
-        
-        # Sortowanie pakietów wg czasu
-        sorted_packets = sorted(packets, key=get_packet_time)
-        
-        # Znajdź zakres czasowy
-        start_time = get_packet_time(sorted_packets[0])
-        end_time = get_packet_time(sorted_packets[-1])
-        
-        if end_time == start_time or start_time == 0:
+        if buckets.untimed_packets or buckets.start == buckets.end:
             # Jeśli wszystkie pakiety mają ten sam czas lub błędny czas
-            total_bytes = sum(p.get('length', 0) for p in packets)
             return {
                 'avg_throughput': total_bytes,
                 'peak_throughput': total_bytes,
                 'time_labels': ['0s'],
                 'bytes_per_second': [total_bytes],
-                'packets_per_second': [len(packets)]
+                'packets_per_second': [total_packets]
             }
         
-        # Podziel na okna czasowe
-        duration = end_time - start_time
+        duration = buckets.end - buckets.start
         if duration < 10:  # mniej niż 10 sekund
             window_size = max(0.1, duration / 50)  # max 50 okien
         else:
             window_size = max(1.0, duration / 100)  # max 100 okien
         
-        time_windows = {}
-        
-        for packet in sorted_packets:
-            packet_time = get_packet_time(packet)
-            if packet_time == 0:
-                continue
-                
-            window_index = int((packet_time - start_time) / window_size)
-            
-            if window_index not in time_windows:
-                time_windows[window_index] = {'bytes': 0, 'packets': 0}
-            
-            time_windows[window_index]['bytes'] += packet.get('length', 0)
-            time_windows[window_index]['packets'] += 1
-        
-        # Przygotuj dane dla wykresu
-        max_window = max(time_windows.keys()) if time_windows else 0
-        time_labels = []
-        bytes_per_second = []
-        packets_per_second = []
-        
-        for i in range(max_window + 1):
-            # Format etykiety czasowej
-            if duration < 60:  # mniej niż minuta
-                time_label = f"{(i * window_size):.1f}s"
-            elif duration < 3600:  # mniej niż godzina
-                minutes = int((i * window_size) // 60)
-                seconds = int((i * window_size) % 60)
-                time_label = f"{minutes:02d}:{seconds:02d}"
-            else:  # więcej niż godzina
-                hours = int((i * window_size) // 3600)
-                minutes = int(((i * window_size) % 3600) // 60)
-                time_label = f"{hours}h {minutes:02d}m"
-            
-            time_labels.append(time_label)
-            
-            if i in time_windows:
-                bytes_rate = time_windows[i]['bytes'] / window_size
-                packets_rate = time_windows[i]['packets'] / window_size
-            else:
-                bytes_rate = 0
-                packets_rate = 0
-            
-            bytes_per_second.append(int(bytes_rate))
-            packets_per_second.append(int(packets_rate))
-        
-        # Oblicz średnią i szczytową przepustowość
-        total_bytes = sum(p.get('length', 0) for p in packets)
-        avg_throughput = total_bytes / duration if duration > 0 else 0
-        peak_throughput = max(bytes_per_second) if bytes_per_second else 0
+        windows = int(duration / window_size) + 1
+        window_packets, window_bytes = buckets.window_totals(buckets.start, window_size, windows)
+        bytes_per_second = (window_bytes / window_size).astype(np.int64).tolist()
+        packets_per_second = (window_packets / window_size).astype(np.int64).tolist()
         
         return {
-            'avg_throughput': int(avg_throughput),
-            'peak_throughput': int(peak_throughput),
-            'time_labels': time_labels,
+            'avg_throughput': int(total_bytes / duration),
+            'peak_throughput': int(max(bytes_per_second)),
+            'time_labels': [self.offset_label(i * window_size, duration) for i in range(windows)],
             'bytes_per_second': bytes_per_second,
             'packets_per_second': packets_per_second
         }
     
-    def calculate_network_load(self, packets):
-        total_bytes = sum(p.get('length', 0) for p in packets)
-        header_overhead = 0
-        
-        for packet in packets:
-            overhead = 14  # Ethernet
-            if 'ip' in packet:
-                overhead += 20
-            if 'tcp' in packet:
-                overhead += 20
-            elif 'udp' in packet:
-                overhead += 8
-            header_overhead += overhead
-        
-        payload_bytes = total_bytes - header_overhead
-        
+    def distribution_stats(self, size_sketch, gap_sketch):
+        """Histogram i kwantyle wielkości pakietów oraz kwantyle odstępów - ze szkiców KLL"""
         return {
-            'total_bytes': total_bytes,
-            'header_overhead': header_overhead,
-            'payload_efficiency': (payload_bytes / total_bytes * 100) if total_bytes > 0 else 0
+            'packet_size_distribution': self.calculate_size_distribution(size_sketch),
+            'packet_size_quantiles': self.sketch_quantiles(size_sketch, int),
+            'inter_arrival_quantiles': self.sketch_quantiles(gap_sketch, lambda value: round(value, 6)),
+            # Błąd rangi każdego kwantyla (ułamek liczby pakietów, 0 = wartość dokładna)
+            'quantile_errors': {
+                'packet_size': self.sketch_rank_errors(size_sketch),
+                'inter_arrival': self.sketch_rank_errors(gap_sketch)
+            }
         }
     
-    def calculate_protocol_payload(self, packets):
-        protocol_stats = {}
+    def sketch_quantiles(self, sketch, convert):
+        values = sketch.quantiles([fraction for _, fraction in QUANTILES])
+        return {name: convert(value) for (name, _), value in zip(QUANTILES, values)}
+    
+    def sketch_rank_errors(self, sketch):
+        errors = sketch.rank_error([fraction for _, fraction in QUANTILES])
+        return {name: round(error, 6) for (name, _), error in zip(QUANTILES, errors)}
+    
+    def calculate_size_distribution(self, packet_sizes):
+        """Oblicza rozkład wielkości pakietów ze szkicu KLL"""
+        if packet_sizes.count == 0:
+            return {'labels': [], 'values': []}
         
-        for packet in packets:
-            if 'tcp' in packet:
-                proto = 'TCP'
-            elif 'udp' in packet:
-                proto = 'UDP'
-            elif 'ip' in packet:
-                proto = f"IP({packet['ip']['proto']})"
-            else:
-                proto = 'Other'
-            
-            if proto not in protocol_stats:
-                protocol_stats[proto] = {'total': 0, 'packets': 0}
-            
-            protocol_stats[proto]['packets'] += 1
-            protocol_stats[proto]['total'] += packet.get('length', 0)
+        # Znajdź zakresy wielkości
+        min_size = int(packet_sizes.min)
+        max_size = int(packet_sizes.max)
         
-        return protocol_stats
-    
-    def calculate_mac_protocol_stats(self, packets):
-        """Oblicza statystyki protokołów dla każdego adresu MAC"""
-        mac_stats = {}
+        if min_size == max_size:
+            return {
+                'labels': [f'{min_size} B'],
+                'values': [packet_sizes.count]
+            }
         
-        for packet in packets:
-            if 'ethernet' not in packet:
-                continue
-                
-            src_mac = packet['ethernet']['src']
-            dst_mac = packet['ethernet']['dst']
-            
-            # Określ protokół
-            if 'tcp' in packet:
-                protocol = 'TCP'
-            elif 'udp' in packet:
-                protocol = 'UDP'
-            elif 'ip' in packet:
-                protocol = 'Other'
+        # Stwórz histogram z inteligentnym podziałem (wagi elementów szkicu sumują się do liczby pakietów)
+        num_bins = min(20, max(5, packet_sizes.distinct_values()))
+        hist, bin_edges = packet_sizes.histogram(num_bins)
+        
+        # Generuj etykiety dla przedziałów
+        labels = []
+        for i in range(len(bin_edges) - 1):
+            start = int(bin_edges[i])
+            end = int(bin_edges[i + 1])
+            if end - start == 1:
+                labels.append(f'{start} B')
             else:
-                protocol = 'Other'
-            
-            # Zliczaj dla src_mac
-            if src_mac not in mac_stats:
-                mac_stats[src_mac] = {'TCP': 0, 'UDP': 0, 'Other': 0}
-            mac_stats[src_mac][protocol] += 1
-            
-            # Zliczaj dla dst_mac
-            if dst_mac not in mac_stats:
-                mac_stats[dst_mac] = {'TCP': 0, 'UDP': 0, 'Other': 0}
-            mac_stats[dst_mac][protocol] += 1
+                labels.append(f'{start}-{end} B')
         
-        return mac_stats
-
-    def build_enhanced_mac_graph(self, packets, mac_protocol_stats):
-        """Buduje ulepszony graf MAC z informacjami o protokołach"""
-        enhanced_mac_graph = {
-            'nodes': [],
-            'edges': []
+        return {
+            'labels': labels,
+            'values': hist.tolist()
         }
-        
-        if not packets or not mac_protocol_stats:
-            return enhanced_mac_graph
+    
+    def build_enhanced_mac_nodes(self, mac_protocol_stats):
+        """Węzły MAC z dominującym protokołem i producentem"""
+        nodes = []
         
         # Mapa kolorów dla protokołów
         color_map = {
@@ -507,13 +716,6 @@ class StatsGenerator:
             'Unknown': '#C8C8C8'
         }
         
-        # Import do pobierania informacji o producentach
-        try:
-            from mac_vendors import get_mac_vendor
-        except ImportError:
-            def get_mac_vendor(mac):
-                return "Unknown"
-        
         # Przygotuj węzły MAC z informacjami o protokołach
         for mac, protocol_stats in mac_protocol_stats.items():
             if not protocol_stats or sum(protocol_stats.values()) == 0:
@@ -529,7 +731,7 @@ class StatsGenerator:
             # Pobierz informacje o producencie
             vendor = get_mac_vendor(mac)
             
-            enhanced_mac_graph['nodes'].append({
+            nodes.append({
                 'id': mac,
                 'label': mac[-8:],  # Ostatnie 8 znaków MAC
                 'title': f"MAC: {mac}\\nVendor: {vendor}\\nDominant: {dominant_protocol}\\nPackets: {total_packets}",
@@ -540,49 +742,17 @@ class StatsGenerator:
                 'vendor': vendor
             })
         
-        # Przygotuj krawędzie z informacjami o komunikacji
-        edges_data = {}
-        
-        for packet in packets:
-            if 'ethernet' not in packet:
-                continue
-                
-            src_mac = packet['ethernet']['src']
-            dst_mac = packet['ethernet']['dst']
-            
-            # Sprawdź czy oba MAC są w naszych węzłach
-            if src_mac not in mac_protocol_stats or dst_mac not in mac_protocol_stats:
-                continue
-            
-            edge_key = f"{src_mac}->{dst_mac}"
-            
-            # Określ protokół krawędzi
-            if 'tcp' in packet:
-                edge_protocol = 'TCP'
-            elif 'udp' in packet:
-                edge_protocol = 'UDP'
-            elif 'ip' in packet:
-                edge_protocol = f"IP({packet['ip'].get('proto', '?')})"
-            else:
-                edge_protocol = 'Other'
-            
-            if edge_key not in edges_data:
-                edges_data[edge_key] = {
-                    'from': src_mac,
-                    'to': dst_mac,
-                    'value': 0,
-                    'protocols': set()
-                }
-            
-            edges_data[edge_key]['value'] += 1
-            edges_data[edge_key]['protocols'].add(edge_protocol)
+        return nodes
+    
+    def format_enhanced_mac_edges(self, edges_data):
+        """Konwertuje krawędzie do formatu vis.js"""
+        edges = []
         
-        # Konwertuj krawędzie do formatu vis.js
         for edge_key, edge_data in edges_data.items():
             protocols_list = list(edge_data['protocols'])
             protocols_str = ', '.join(protocols_list)
             
-            enhanced_mac_graph['edges'].append({
+            edges.append({
                 'from': edge_data['from'],
                 'to': edge_data['to'],
                 'value': edge_data['value'],
@@ -591,4 +761,4 @@ class StatsGenerator:
                 'protocols': protocols_list
             })
         
-        return enhanced_mac_graph
\ No newline at end of file
+        return edges
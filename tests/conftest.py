@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Moduły aplikacji leżą płasko w katalogu głównym repozytorium
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """Moduł app z własną bazą w tmp_path - import app tworzy bazę i katalogi w bieżącym katalogu"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('uploads', exist_ok=True)
+    import app
+    from database import Database
+    monkeypatch.setattr(app, 'db', Database(str(tmp_path / 'analyses.db')))
+    monkeypatch.setattr(app, 'cache_metrics', {'hits': 0, 'misses': 0, 'lookup_ms_total': 0.0})
+    app.app.config['TESTING'] = True
+    return app
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from benchmark import generate_capture
+from pcap_analyzer import PcapAnalyzer
+
+
+@pytest.fixture(scope='module')
+def capture(tmp_path_factory):
+    path = tmp_path_factory.mktemp('capture') / 'capture.pcap'
+    generate_capture(str(path), 3000)
+    return str(path)
+
+
+def saved_analysis(app_module, capture):
+    table = PcapAnalyzer('raw').analyze_table(capture)
+    stats = app_module.stats_gen.generate_table_stats(table, app_module.stats_gen.core_sections())
+    return app_module.db.save_analysis('capture.pcap', table, stats)
+
+
+def test_interleaved_lazy_sections_are_all_kept(app_module, capture):
+    analysis_id = saved_analysis(app_module, capture)
+    lazy = ('enhanced_mac_graph', 'mac_protocol_stats', 'protocol_payload')
+    assert not set(lazy) & set(app_module.db.get_stats(analysis_id))
+
+    # Dwa żądania zakładki zaawansowanej czytają statystyki, zanim którekolwiek zapisze swoją sekcję
+    first = app_module.db.get_stats(analysis_id)
+    second = app_module.db.get_stats(analysis_id)
+    app_module.ensure_stats(analysis_id, first, ['enhanced_mac_graph'])
+    app_module.ensure_stats(analysis_id, second, ['protocol_payload'])
+
+    stored = app_module.db.get_stats(analysis_id)
+    for key in lazy:
+        assert stored[key] == (first[key] if key in first else second[key])
+
+
+def test_repeated_upload_reuses_analysis(app_module, capture, monkeypatch):
+    monkeypatch.setattr(app_module, 'precompute_layouts', lambda analysis_id, stats: None)
+    client = app_module.app.test_client()
+
+    with open(capture, 'rb') as f:
+        first = client.post('/upload', data={'file': (f, 'capture.pcap')})
+    analysis_id = app_module.db.find_analysis_by_hash(app_module.hash_file(capture))
+    assert analysis_id is not None
+    assert first.headers['Location'].endswith(f'/view/{analysis_id}')
+
+    # Ta sama zawartość podana ścieżką - trafienie po skrócie, bez ponownej analizy
+    second = client.post('/upload', data={'file_path': capture})
+    assert second.headers['Location'] == first.headers['Location']
+    assert len(app_module.db.get_all_analyses()) == 1
+
+    cache = client.get('/metrics').get_json()['analysis_cache']
+    assert (cache['hits'], cache['misses'], cache['hit_ratio']) == (1, 1, 0.5)
+
+
+def test_concurrent_layout_requests_compute_once(app_module, capture, monkeypatch):
+    analysis_id = saved_analysis(app_module, capture)
+    stats = app_module.db.get_stats(analysis_id)
+    calls = []
+    compute = app_module.graph_layout.compute
+
+    def slow_compute(graph):
+        calls.append(len(graph['nodes']))
+        time.sleep(0.2)
+        return compute(graph)
+
+    monkeypatch.setattr(app_module.graph_layout, 'compute', slow_compute)
+    # Układ liczony w tle po zapisie analizy i równoległe otwarcie zakładki grafu
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(app_module.display_graph(analysis_id, 'network', stats)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results[0] == results[1]
+    assert app_module.layout_locks == {}
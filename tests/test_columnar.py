@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+import pytest
+
+from benchmark import generate_capture
+from columnar import ColumnStore, STORED_COLUMNS
+from database import Database
+from packet_table import LAYER_PAYLOAD, PacketTable
+from pcap_analyzer import PcapAnalyzer
+from stats_generator import StatsGenerator
+
+
+@pytest.fixture(scope='module')
+def capture(tmp_path_factory):
+    path = tmp_path_factory.mktemp('capture') / 'capture.pcap'
+    generate_capture(str(path), 3000)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def table(capture):
+    return PcapAnalyzer('raw').analyze_table(capture)
+
+
+def assert_same_columns(stored, table):
+    for column in STORED_COLUMNS:
+        expected = table.data[column]
+        if column == 'layers':
+            expected = expected & np.uint8(~LAYER_PAYLOAD & 0xFF)
+        assert np.array_equal(stored.data[column], expected), column
+
+
+def test_chunked_writer_matches_single_write(tmp_path, table):
+    store = ColumnStore(str(tmp_path))
+    store.write('single', table)
+    writer = store.writer()
+    for start in range(0, len(table), 700):
+        writer.append(table.take(slice(start, start + 700)))
+    writer.finish('chunked')
+
+    assert_same_columns(store.open('chunked'), table)
+    for name in ('payload_offsets', 'payload_size'):
+        assert np.array_equal(np.load(tmp_path / 'single' / f'{name}.npy'),
+                              np.load(tmp_path / 'chunked' / f'{name}.npy'))
+    for number, payload_id in zip(table.data['packet_number'][:200].tolist(), table.data['payload_id'][:200].tolist()):
+        expected = table.payloads[payload_id] if payload_id >= 0 else None
+        assert store.payload('chunked', number) == expected
+
+
+def test_writer_remaps_vendors_of_separate_tables(tmp_path):
+    ethernet = lambda vendor: {'src': '00:1a:2b:3c:4d:5e', 'dst': 'ff:ff:ff:ff:ff:ff', 'type': '0x800',
+                               'src_vendor': vendor, 'dst_vendor': 'Unknown'}
+    first = PacketTable.from_records([{'packet_number': 1, 'time': 1.0, 'length': 60, 'ethernet': ethernet('A')}])
+    second = PacketTable.from_records([{'packet_number': 2, 'time': 2.0, 'length': 60, 'ethernet': ethernet('B')},
+                                       {'packet_number': 3, 'time': 3.0, 'length': 60}])
+    store = ColumnStore(str(tmp_path))
+    writer = store.writer()
+    writer.append(first)
+    writer.append(second)
+    writer.finish('parts')
+
+    records = list(store.open('parts').to_records())
+    assert [packet.get('ethernet', {}).get('src_vendor') for packet in records] == ['A', 'B', None]
+
+
+def test_write_table_streams_capture(tmp_path, capture, table):
+    store = ColumnStore(str(tmp_path))
+    writer = PcapAnalyzer('raw').write_table(capture, store.writer())
+    writer.finish('streamed')
+
+    assert writer.length == len(table)
+    assert_same_columns(store.open('streamed'), table)
+
+
+def test_sharded_write_table_stitches_parts(tmp_path, capture, table):
+    store = ColumnStore(str(tmp_path))
+    generator = StatsGenerator()
+    accumulator = generator.accumulator(generator.core_sections())
+    analyzer = PcapAnalyzer('raw', workers=2, parallel_min_size=0)
+    assert len(analyzer.index_shards(capture, 2)) == 2
+    writer = analyzer.write_table(capture, store.writer(), accumulator)
+    writer.finish('sharded')
+
+    # Katalogi fragmentów są usuwane po doklejeniu
+    assert os.listdir(tmp_path) == ['sharded']
+    assert_same_columns(store.open('sharded'), table)
+    for number in table.data['packet_number'][-50:].tolist():
+        row = number - 1
+        payload_id = int(table.data['payload_id'][row])
+        assert store.payload('sharded', number) == (table.payloads[payload_id] if payload_id >= 0 else None)
+    assert generator.finalize(accumulator) == generator.generate_table_stats(table, generator.core_sections())
+
+
+def test_empty_and_aborted_writes(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    store.writer().finish('empty')
+    assert len(store.open('empty')) == 0
+
+    writer = store.writer()
+    writer.append(PacketTable.from_records([{'packet_number': 1, 'time': 1.0, 'length': 60}]))
+    writer.abort()
+    assert os.listdir(tmp_path) == ['empty']
+
+
+def test_save_replaces_leftover_directory(tmp_path, table):
+    db = Database(str(tmp_path / 'analyses.db'))
+    # Katalog po analizie, której wiersz zniknął - SQLite nada nowej analizie to samo id
+    db.columns.write('1', table.take(slice(0, 500)))
+    analysis_id = db.save_analysis('new.pcap', table, {'total_packets': len(table)})
+
+    assert analysis_id == 1
+    assert len(db.get_packet_table(analysis_id)) == len(table)
+    assert [entry for entry in os.listdir(db.columns.root) if entry.startswith('.')] == []
+
+
+def test_migration_keeps_existing_directory(tmp_path, table):
+    store = ColumnStore(str(tmp_path))
+    store.write('1', table)
+    store.write('1', table.take(slice(0, 10)), keep_existing=True)
+
+    assert len(store.open('1')) == len(table)
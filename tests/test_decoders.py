@@ -0,0 +1,92 @@
+import pytest
+from scapy.all import ARP, DNS, DNSQR, ICMP, IP, IPv6, TCP, UDP, Ether, Padding, Raw, wrpcap
+
+from benchmark import compress_file, generate_capture
+from pcap_analyzer import PcapAnalyzer
+from raw_decoder import RawPacketDecoder, detect_compression
+
+ETHER = Ether(src='00:1a:2b:3c:4d:5e', dst='00:0c:29:aa:bb:cc')
+
+# Ramki dekodowane szybką ścieżką (struct) - muszą dać dokładnie to samo co scapy
+FAST_PATH_FRAMES = [
+    ETHER / IP(src='10.0.0.1', dst='10.0.0.2') / TCP(sport=40000, dport=8080, flags='PA') / Raw(b'GET / HTTP/1.1\r\n'),
+    ETHER / IP(src='10.0.0.1', dst='10.0.0.2') / TCP(sport=40000, dport=8080, flags='S',
+                                                       options=[('MSS', 1460), ('NOP', None), ('WScale', 7)]),
+    ETHER / IP(src='10.0.0.2', dst='10.0.0.1', ttl=3) / TCP(sport=8080, dport=40000, flags='FRUAECN', seq=7, ack=9),
+    # Krótka ramka (54 B) dopełniona przez kartę sieciową zerami po końcu pakietu IP
+    ETHER / IP(src='10.0.0.1', dst='10.0.0.2') / TCP(sport=40000, dport=8080, flags='A') / Padding(b'\x00' * 6),
+    ETHER / IP(src='10.0.0.1', dst='10.0.0.2', options=b'\x94\x04\x00\x00') / UDP(sport=5000, dport=9999) / Raw(b'x'),
+    ETHER / IP(src='10.0.0.1', dst='10.0.0.2') / UDP(sport=5000, dport=9999, len=12) / Raw(b'abcdefgh'),
+    ETHER / IP(src='10.0.0.1', dst='10.0.0.2') / UDP(sport=5000, dport=9999),
+    ETHER / IPv6(src='fe80::1', dst='fe80::2') / TCP(sport=40000, dport=8080) / Raw(b'v6 payload'),
+    ETHER / IPv6(src='fe80::1', dst='fe80::2') / UDP(sport=5000, dport=9999) / Raw(b'v6 udp'),
+]
+
+# Ramki oddawane do scapy (inne protokoły, fragmenty, porty z dekoderem warstwy aplikacji)
+FALLBACK_FRAMES = [
+    ETHER / ARP(psrc='10.0.0.1', pdst='10.0.0.2'),
+    ETHER / IP(src='10.0.0.1', dst='10.0.0.2') / ICMP() / Raw(b'ping'),
+    ETHER / IP(src='10.0.0.1', dst='10.0.0.2', flags='MF', frag=0) / UDP(sport=5000, dport=9999) / Raw(b'f' * 40),
+    ETHER / IP(src='10.0.0.1', dst='8.8.8.8') / UDP(sport=5353, dport=53) / DNS(qd=DNSQR(qname='example.com')),
+    ETHER / IP(src='10.0.0.1', dst='10.0.0.2') / Raw(b'\x00' * 4),
+]
+
+
+@pytest.fixture(scope='module')
+def edge_capture(tmp_path_factory):
+    path = tmp_path_factory.mktemp('decoders') / 'edge.pcap'
+    frames = FAST_PATH_FRAMES + FALLBACK_FRAMES
+    for i, frame in enumerate(frames):
+        frame.time = 1700000000 + i * 0.25
+    wrpcap(str(path), frames)
+    return str(path)
+
+
+def records(engine, path):
+    return list(PcapAnalyzer(engine).iter_packets(path))
+
+
+def test_fast_path_covers_edge_frames():
+    decoder = RawPacketDecoder()
+    for i, frame in enumerate(FAST_PATH_FRAMES):
+        assert decoder.decode(bytes(frame), i + 1, 1700000000.0) is not None, frame.summary()
+    for i, frame in enumerate(FALLBACK_FRAMES):
+        assert decoder.decode(bytes(frame), i + 1, 1700000000.0) is None, frame.summary()
+
+
+def test_raw_and_scapy_engines_agree_on_edge_frames(edge_capture):
+    raw, scapy = records('raw', edge_capture), records('scapy', edge_capture)
+
+    assert len(raw) == len(FAST_PATH_FRAMES) + len(FALLBACK_FRAMES)
+    for raw_packet, scapy_packet in zip(raw, scapy):
+        assert raw_packet == scapy_packet
+
+
+def test_raw_and_scapy_engines_agree_on_generated_capture(tmp_path):
+    path = str(tmp_path / 'generated.pcap')
+    generate_capture(path, 2000)
+    raw, scapy = records('raw', path), records('scapy', path)
+
+    assert len(raw) == 2000
+    assert raw == scapy
+    assert PcapAnalyzer('raw').analyze_table(path).data.tobytes() == \
+        PcapAnalyzer('scapy').analyze_table(path).data.tobytes()
+
+
+@pytest.mark.parametrize('suffix, compression', [('gz', 'gzip'), ('bz2', 'bzip2'), ('xz', 'xz'), ('zst', 'zstd')])
+def test_compressed_capture_is_streamed(tmp_path, suffix, compression):
+    plain = str(tmp_path / 'plain.pcap')
+    generate_capture(plain, 2000)
+    # Rozszerzenie nie wskazuje kompresji - rozpoznanie tylko po zawartości
+    packed = str(tmp_path / 'packed.pcap')
+    compress_file(plain, packed, suffix)
+
+    assert detect_compression(plain) is None
+    assert detect_compression(packed) == compression
+    expected = PcapAnalyzer('raw').analyze_table(plain)
+    # Przy kilku procesach skompresowany plik jest czytany jednym strumieniem
+    for analyzer in (PcapAnalyzer('raw'), PcapAnalyzer('raw', workers=2, parallel_min_size=0)):
+        table = analyzer.analyze_table(packed)
+        assert table.data.tobytes() == expected.data.tobytes()
+        assert table.payloads == expected.payloads
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['packed.pcap', 'plain.pcap']
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from columnar import ColumnStore
+from filter_expression import And, Comparison, Not, Or, Presence, parse_filter
+from packet_table import PacketTable
+
+
+def packet(number, src='10.0.0.1', dst='10.0.0.2', proto=6, sport=40000, dport=443, flags='PA', length=100,
+           mac='00:1a:2b:3c:4d:5e'):
+    record = {'packet_number': number, 'time': 1700000000.0 + number, 'length': length,
+              'ethernet': {'src': mac, 'dst': 'ff:ff:ff:ff:ff:ff', 'type': '0x800',
+                           'src_vendor': 'Unknown', 'dst_vendor': 'Unknown'}}
+    if src is not None:
+        record['ip'] = {'src': src, 'dst': dst, 'proto': proto, 'ttl': 64, 'version': 4, 'len': length - 14}
+        if proto == 6:
+            record['tcp'] = {'sport': sport, 'dport': dport, 'flags': flags, 'seq': 0, 'ack': 0, 'window': 512}
+        elif proto == 17:
+            record['udp'] = {'sport': sport, 'dport': dport, 'len': length - 34}
+    return record
+
+
+PACKETS = [
+    packet(1),
+    packet(2, src='10.1.2.3', dport=80, flags='S', length=60),
+    packet(3, src='192.168.1.5', dst='10.0.0.1', proto=17, sport=5353, dport=53, length=90),
+    packet(4, src='192.168.1.6', dst='8.8.8.8', proto=1, length=98),
+    packet(5, src=None, mac='00:0c:29:aa:bb:cc', length=60),
+    packet(6, src='172.16.0.9', dst='10.0.0.2', sport=443, dport=51000, flags='FA', length=1500),
+]
+
+
+@pytest.fixture(scope='module')
+def table():
+    return PacketTable.from_records(PACKETS)
+
+
+def matching(text, table):
+    mask = parse_filter(text).evaluate(table, None)
+    return table.data['packet_number'][mask].tolist()
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('tcp', [1, 2, 6]),
+    ('udp', [3]),
+    ('icmp', [4]),
+    ('not ip', [5]),
+    ('ip.src == 10.1.2.3', [2]),
+    ('ip.addr == 10.0.0.1', [1, 3]),
+    ('ip.addr != 10.0.0.1', [2, 4, 6]),
+    ('ip.src in 10.0.0.0/8', [1, 2]),
+    ('ip.dst in {8.8.8.8, 10.0.0.1}', [3, 4]),
+    ('ip.src contains "192.168"', [3, 4]),
+    ('eth.src == 00-0C-29-AA-BB-CC', [5]),
+    ('tcp.port == 443', [1, 6]),
+    ('udp.port eq 53', [3]),
+    ('tcp.flags.syn', [2]),
+    ('tcp.flags.fin == 1 || tcp.flags.syn == 1', [2, 6]),
+    ('ip.proto == udp', [3]),
+    ('frame.len >= 100 && !udp', [1, 6]),
+    ('frame.number > 2 and frame.number <= 4', [3, 4]),
+    # and wiąże silniej niż or
+    ('udp or tcp and frame.len > 1000', [3, 6]),
+    ('(udp or tcp) and frame.len > 1000', [6]),
+])
+def test_expressions_match_expected_packets(table, text, expected):
+    assert matching(text, table) == expected
+
+
+def test_parse_tree_and_operator_aliases():
+    node = parse_filter('not ip.src == 10.0.0.1 || tcp.port eq 80 && (udp and frame.len gt 10)')
+    assert isinstance(node, Or)
+    assert {type(child) for child in node.children} == {Not, And}
+    conjunction = next(child for child in node.children if isinstance(child, And))
+    # (a and b) and c jest spłaszczane do jednej listy
+    assert len(conjunction.children) == 3
+    assert {child.describe() for child in conjunction.children} == {'tcp.port == 80', 'udp', 'frame.len > 10'}
+    assert isinstance(parse_filter('tcp.flags.syn'), Comparison)
+    assert isinstance(parse_filter('eth'), Presence)
+
+
+def test_planner_keeps_results(table):
+    expressions = ['ip.addr in 10.0.0.0/8 and tcp.port == 443 and frame.len > 50',
+                   'frame.len > 1000 or ip.src contains "10." or udp']
+    rows = np.array([0, 2, 3, 5])
+    for text in expressions:
+        node = parse_filter(text)
+        assert node.evaluate(table, rows).tolist() == node.evaluate(table, None)[rows].tolist()
+
+
+def test_frame_number_index_matches_scan(tmp_path, table):
+    store = ColumnStore(str(tmp_path))
+    store.write('stored', table)
+    stored = store.open('stored')
+    for text in ('frame.number == 3', 'frame.number < 3', 'frame.number >= 5', 'frame.number > 6'):
+        assert matching(text, stored) == matching(text, table)
+
+
+@pytest.mark.parametrize('text, position, message', [
+    ('', 0, 'empty expression'),
+    ('foo.bar == 1', 0, "unknown field 'foo.bar'"),
+    ('ip == 1', 0, "'ip' cannot be compared"),
+    ('ip.src ==', 9, 'missing value'),
+    ('ip.src == 10.0.0', 10, "invalid value '10.0.0'"),
+    ('ip.src == 10.0.0.0/33', 10, 'prefix out of range'),
+    ('eth.src == 00:11:22', 11, 'expected aa:bb:cc:dd:ee:ff'),
+    ('tcp.port == ==', 12, "expected a value, got '=='"),
+    ('tcp.port == 80 and', 18, 'unexpected end of expression'),
+    ('(tcp.port == 80', 15, "missing ')'"),
+    ('tcp.port == 80)', 14, "unexpected ')'"),
+    ('tcp.port == 80 # x', 15, 'unexpected character'),
+    ('tcp.port contains 8', 18, "'contains' needs an address field"),
+    ('tcp.port in 80', 12, "'in' needs a set"),
+    ('ip.addr != 10.0.0.0/8', 11, "use 'not ip.addr in a.b.c.d/n'"),
+    ('ip.addr in {}', 11, 'empty set'),
+    ('ip.addr in {10.0.0.1', 20, "missing '}'"),
+])
+def test_errors_report_position(text, position, message):
+    with pytest.raises(ValueError) as error:
+        parse_filter(text)
+    assert str(error.value).startswith(f"Invalid filter expression at position {position}: ")
+    assert message in str(error.value)
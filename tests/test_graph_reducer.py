@@ -0,0 +1,70 @@
+import pytest
+
+from graph_reducer import GraphReducer
+
+
+@pytest.fixture
+def graph():
+    # 40 adresów w czterech podsieciach /24, ruch malejący z numerem węzła
+    ids = [f'10.0.{i % 4}.{i}' for i in range(40)]
+    nodes = [{'id': node_id, 'label': node_id, 'value': 100 - i} for i, node_id in enumerate(ids)]
+    edges = [{'from': ids[i], 'to': ids[(i * 7 + 3) % 40], 'value': i + 1} for i in range(40)]
+    return {'nodes': nodes, 'edges': edges}
+
+
+def expand_all(reducer, graph, aggregate_id):
+    """Wszyscy członkowie węzła zbiorczego i ich krawędzie - strona po stronie (next_offset)"""
+    members, edges, offset = [], [], 0
+    while offset is not None:
+        expanded = reducer.expand(graph, aggregate_id, 'ip', offset)
+        page = [node for node in expanded['nodes'] if not node.get('aggregate')]
+        members.extend(page)
+        edges.extend(expanded['edges'])
+        offset = next((node['next_offset'] for node in expanded['nodes'] if node.get('aggregate')), None)
+    assert len(members) == expanded['total_members']
+    return members, edges
+
+
+def test_small_graph_is_unchanged(graph):
+    assert GraphReducer(max_nodes=40, max_edges=40).reduce(graph) is graph
+
+
+def test_reduce_keeps_heaviest_nodes_and_total_traffic(graph):
+    reduced = GraphReducer(max_nodes=5, max_aggregates=2).reduce(graph)
+
+    plain = [node['id'] for node in reduced['nodes'] if not node.get('aggregate')]
+    aggregates = {node['id']: node for node in reduced['nodes'] if node.get('aggregate')}
+    assert plain == [node['id'] for node in graph['nodes'][:5]]
+    assert set(aggregates) == {'10.0.1.0/24', '10.0.2.0/24', GraphReducer.OTHER_ID}
+    assert sum(node['value'] for node in reduced['nodes']) == sum(node['value'] for node in graph['nodes'])
+    assert sum(node['members'] for node in aggregates.values()) == 35
+    assert reduced['reduction'] == {'total_nodes': 40, 'total_edges': 40,
+                                    'shown_nodes': 8, 'shown_edges': len(reduced['edges'])}
+
+
+def test_expanding_every_aggregate_restores_the_graph(graph):
+    reducer = GraphReducer(max_nodes=5, max_aggregates=2)
+    reduced = reducer.reduce(graph)
+    shown = {node['id'] for node in reduced['nodes'] if not node.get('aggregate')}
+    groups = reducer.node_groups(graph, 'ip')
+
+    restored = [node for node in graph['nodes'] if node['id'] in shown]
+    touched = []
+    for aggregate in (node['id'] for node in reduced['nodes'] if node.get('aggregate')):
+        members, edges = expand_all(reducer, graph, aggregate)
+        assert {groups[node['id']] for node in members} == {aggregate}
+        restored.extend(members)
+        touched.extend(edges)
+
+    assert sorted(node['id'] for node in restored) == sorted(node['id'] for node in graph['nodes'])
+    # Każda krawędź członka grupy wraca z rozwinięciem; koniec poza rozwijaną grupą wskazuje widoczny węzeł
+    full = {(edge['from'], edge['to']) for edge in graph['edges']
+            if edge['from'] not in shown or edge['to'] not in shown}
+    assert {(edge['from'], edge['to']) for edge in touched} == full
+    for edge in touched:
+        for end in ('from', 'to'):
+            assert edge[f'{end}_group'] in (edge[end], groups[edge[end]])
+
+
+def test_expand_unknown_aggregate(graph):
+    assert GraphReducer(max_nodes=5).expand(graph, '192.168.0.0/24') is None
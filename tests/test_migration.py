@@ -0,0 +1,142 @@
+import json
+import sqlite3
+import zlib
+
+import pytest
+
+from database import Database
+
+# Schemat analyses z pierwszej wersji aplikacji - pakiety i payloady w jednym blobie JSON
+BASELINE_SCHEMA = '''
+    CREATE TABLE analyses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL,
+        upload_date TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+        total_packets INTEGER,
+        packet_data TEXT,
+        statistics TEXT
+    )
+'''
+
+
+def baseline_packet(number, **extra):
+    """Pakiet w kształcie zapisywanym przez pierwszą wersję parse_packet"""
+    packet = {
+        'packet_number': number,
+        'time': 1700000000.0 + number,
+        'time_str': '2023-11-14 22:13:20',
+        'length': 60 + number,
+        'ethernet': {'src': '00:1a:2b:3c:4d:5e', 'dst': 'ff:ff:ff:ff:ff:ff', 'type': '0x800',
+                     'src_vendor': 'Vendor A', 'dst_vendor': 'Unknown'},
+        'ip': {'src': '10.0.0.1', 'dst': '10.0.0.2', 'proto': 6, 'ttl': 64, 'version': 4, 'len': 40 + number},
+        'tcp': {'sport': 40000 + number, 'dport': 443, 'flags': 'PA', 'seq': number, 'ack': 1, 'window': 512,
+                'flags_syn': False, 'flags_ack': True, 'flags_fin': False, 'flags_rst': False,
+                'flags_psh': True, 'flags_urg': False},
+    }
+    packet.update(extra)
+    return packet
+
+
+def create_legacy_db(path, packets):
+    conn = sqlite3.connect(path)
+    conn.execute(BASELINE_SCHEMA)
+    cursor = conn.execute('INSERT INTO analyses (filename, total_packets, packet_data, statistics) VALUES (?, ?, ?, ?)',
+                          ('old.pcap', len(packets), json.dumps(packets), json.dumps({'total_packets': len(packets)})))
+    conn.commit()
+    conn.close()
+    return cursor.lastrowid
+
+
+def test_baseline_blob_keeps_payload_bytes(tmp_path):
+    packets = [
+        baseline_packet(1, payload='GET / HTTP/1.1\r\nHost: example\r\n\r\n'),
+        baseline_packet(2, payload_hex='00ff10deadbeef'),
+        baseline_packet(3, payload='zażółć'),
+        baseline_packet(4),
+    ]
+    db_path = str(tmp_path / 'analyses.db')
+    analysis_id = create_legacy_db(db_path, packets)
+
+    db = Database(db_path)
+    assert db.get_payload(analysis_id, 1) == b'GET / HTTP/1.1\r\nHost: example\r\n\r\n'
+    assert db.get_payload(analysis_id, 2) == bytes.fromhex('00ff10deadbeef')
+    assert db.get_payload(analysis_id, 3) == 'zażółć'.encode('utf-8')
+    assert db.get_payload(analysis_id, 4) is None
+
+    table = db.get_packet_table(analysis_id)
+    assert table.data['packet_number'].tolist() == [1, 2, 3, 4]
+    assert table.data['payload_size'].tolist() == [33, 7, len('zażółć'.encode('utf-8')), -1]
+    records = list(table.records())
+    assert [packet['ip']['src'] for packet in records] == ['10.0.0.1'] * 4
+    assert records[1]['tcp']['dport'] == 443
+
+    with db.get_connection() as conn:
+        assert conn.execute('SELECT packet_data FROM analyses WHERE id = ?', (analysis_id,)).fetchone()[0] is None
+    db.close_connection()
+
+    # Ponowne otwarcie czyta już pliki kolumnowe
+    reopened = Database(db_path)
+    assert reopened.get_payload(analysis_id, 2) == bytes.fromhex('00ff10deadbeef')
+
+
+def test_blob_with_payload_table_keeps_payload_bytes(tmp_path):
+    """Blob z samym payload_size, bajty w tabeli payloads (zapis sprzed plików kolumnowych)"""
+    packets = [baseline_packet(1, payload_size=5), baseline_packet(2)]
+    db_path = str(tmp_path / 'analyses.db')
+    db = Database(db_path)
+    with db.get_connection() as conn:
+        analysis_id = conn.execute(
+            'INSERT INTO analyses (filename, total_packets, packet_data, statistics) VALUES (?, ?, ?, ?)',
+            ('mid.pcap', len(packets), json.dumps(packets), json.dumps({}))
+        ).lastrowid
+        conn.execute('INSERT INTO payloads (analysis_id, packet_number, data) VALUES (?, ?, ?)',
+                     (analysis_id, 1, zlib.compress(b'\x01\x02\x03\x04\x05')))
+        conn.commit()
+
+    assert db.get_payload(analysis_id, 1) == b'\x01\x02\x03\x04\x05'
+    assert db.get_payload(analysis_id, 2) is None
+    with db.get_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM payloads').fetchone()[0] == 0
+
+
+def test_packet_rows_keep_payload_bytes(tmp_path):
+    """Analizy zapisane w tabelach packets/payloads"""
+    db_path = str(tmp_path / 'analyses.db')
+    db = Database(db_path)
+    with db.get_connection() as conn:
+        analysis_id = conn.execute(
+            'INSERT INTO analyses (filename, total_packets, statistics) VALUES (?, ?, ?)',
+            ('rows.pcap', 2, json.dumps({}))
+        ).lastrowid
+        for number, payload_size in ((1, None), (2, 3)):
+            conn.execute(
+                'INSERT INTO packets (analysis_id, number, ts, length, layers, src_mac, dst_mac, eth_type, '
+                'src_vendor, dst_vendor, src_ip, dst_ip, proto, ttl, ip_version, ip_len, sport, dport, flags, '
+                'seq, ack, window, udp_len, payload_size) '
+                'VALUES (?, ?, ?, 60, 11, 1, 2, 2048, ?, NULL, 167772161, 167772162, 17, 64, 4, 46, 53, 5353, '
+                '0, 0, 0, 0, 26, ?)',
+                (analysis_id, number, 1700000000.0 + number, 'Vendor A', payload_size)
+            )
+        conn.execute('INSERT INTO payloads (analysis_id, packet_number, data) VALUES (?, ?, ?)',
+                     (analysis_id, 2, zlib.compress(b'abc')))
+        conn.commit()
+
+    assert db.get_payload(analysis_id, 2) == b'abc'
+    assert db.get_payload(analysis_id, 1) is None
+    table = db.get_packet_table(analysis_id)
+    assert table.data['dport'].tolist() == [5353, 5353]
+    with db.get_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM packets').fetchone()[0] == 0
+
+
+@pytest.mark.parametrize('storage_format', ['json', 'zlib', 'zstd'])
+def test_saved_analysis_roundtrip(tmp_path, storage_format):
+    db = Database(str(tmp_path / 'analyses.db'), storage_format=storage_format)
+    packets = [baseline_packet(1), baseline_packet(2)]
+    packets[0]['payload_data'] = b'\x00payload'
+    stats = {'total_packets': 2, 'protocols': {'TCP': 2}}
+
+    analysis_id = db.save_analysis('new.pcap', packets, stats)
+    assert db.get_stats(analysis_id) == stats
+    assert db.get_payload(analysis_id, 1) == b'\x00payload'
+    assert len(db.get_packet_table(analysis_id)) == 2
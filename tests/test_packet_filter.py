@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+
+import packet_filter
+from packet_filter import PacketFilter
+from packet_table import PacketTable
+from test_filter_expression import PACKETS
+
+QUERIES = [
+    {},
+    {'srcIp': '192.168'},
+    {'dstMac': 'FF:FF'},
+    {'protocol': 'UDP'},
+    {'protocol': 'IP(1)'},
+    {'port': '443'},
+    {'lengthMin': '90', 'lengthMax': '100'},
+    {'timeStart': '1700000002.5'},
+    {'expression': 'tcp.port == 443 or udp'},
+    {'expression': 'ip.src in 10.0.0.0/8', 'lengthMax': '80'},
+]
+
+
+def numbers(packets):
+    return [packet['packet_number'] for packet in packets]
+
+
+@pytest.mark.parametrize('filters', QUERIES)
+def test_compiled_filter_matches_packet_filter(filters):
+    table = PacketTable.from_records(PACKETS)
+    compiled = PacketFilter().compile(filters)
+    expected = numbers(PacketFilter().filter_packets(PACKETS, filters))
+
+    assert [packet['packet_number'] for packet in PACKETS if compiled(packet)] == expected
+    assert table.data['packet_number'][compiled.mask(table)].tolist() == expected
+    assert numbers(PacketFilter().filter_packets(table, filters)) == expected
+    assert [packet['packet_number'] for packet in PACKETS
+            if PacketFilter().packet_matches_filters(packet, filters)] == expected
+
+
+def test_time_filters_on_packet_dicts():
+    # Pole datetime-local panelu (czas lokalny) i znacznik w sekundach - pakiety mają czas jako float
+    start = datetime.fromtimestamp(1700000002).isoformat()
+    filters = {'timeStart': start, 'timeEnd': '1700000004'}
+
+    assert numbers(PacketFilter().filter_packets(PACKETS, filters)) == [2, 3, 4]
+    assert numbers(PacketFilter().filter_packets(PacketTable.from_records(PACKETS), filters)) == [2, 3, 4]
+    with pytest.raises(ValueError):
+        PacketFilter().compile({'timeStart': 'yesterday'})
+
+
+def test_expression_on_records_builds_one_table(monkeypatch):
+    calls = []
+    from_records = PacketTable.from_records.__func__
+    monkeypatch.setattr(packet_filter.PacketTable, 'from_records',
+                        classmethod(lambda cls, packets: calls.append(len(packets)) or from_records(cls, packets)))
+
+    filters = {'expression': 'tcp', 'port': '443'}
+    matched = PacketFilter().filter_packets(PACKETS, filters)
+    hits = PacketFilter().compile(filters).matches(PACKETS)
+
+    assert numbers(matched) == [1, 6]
+    assert hits == [packet['packet_number'] in (1, 6) for packet in PACKETS]
+    assert calls == [len(PACKETS), len(PACKETS)]
@@ -0,0 +1,121 @@
+import importlib
+import os
+import sys
+import time
+
+import pytest
+
+from database import Database
+from retention import RetentionManager
+
+
+def make_packets(count):
+    return [{'packet_number': number, 'time': 1700000000.0 + number, 'time_str': '', 'length': 60}
+            for number in range(1, count + 1)]
+
+
+def set_last_used(db, analysis_id, last_used):
+    with db.get_connection() as conn:
+        conn.execute('UPDATE analyses SET last_accessed = ? WHERE id = ?', (last_used, analysis_id))
+        conn.commit()
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'analyses.db'))
+    yield database
+    database.close_connection()
+
+
+def test_ttl_deletes_only_expired_analyses(db, tmp_path):
+    old = db.save_analysis('old.pcap', make_packets(10), {})
+    fresh = db.save_analysis('fresh.pcap', make_packets(10), {})
+    set_last_used(db, old, '2000-01-01 00:00:00')
+
+    manager = RetentionManager(db, str(tmp_path), analysis_ttl=24 * 3600)
+    result = manager.run_once()
+
+    assert result['analyses_deleted'] == [old]
+    assert db.get_analysis_metadata(old) is None
+    assert db.get_packet_table(fresh) is not None
+    assert not os.path.exists(db.columns.full_path(str(old)))
+
+
+def test_quota_deletes_least_recently_used_and_keeps_newest(db, tmp_path):
+    ids = [db.save_analysis(f'{index}.pcap', make_packets(1000), {}) for index in range(3)]
+    set_last_used(db, ids[0], '2024-01-03 00:00:00')
+    set_last_used(db, ids[1], '2024-01-01 00:00:00')
+    set_last_used(db, ids[2], '2024-01-02 00:00:00')
+    sizes = {analysis['id']: analysis['size'] for analysis in db.analysis_usage()}
+
+    # Limit mieści dwie analizy - usuwana jest najdawniej używana
+    manager = RetentionManager(db, str(tmp_path), max_analyses_size=sizes[ids[0]] + sizes[ids[2]])
+    assert manager.run_once()['analyses_deleted'] == [ids[1]]
+
+    # Limit mniejszy niż jedna analiza - ostatnio używana zostaje
+    manager = RetentionManager(db, str(tmp_path), max_analyses_size=1)
+    assert manager.run_once()['analyses_deleted'] == [ids[2]]
+    assert [analysis['id'] for analysis in db.get_all_analyses()] == [ids[0]]
+
+
+def test_no_limits_delete_nothing(db, tmp_path):
+    analysis_id = db.save_analysis('a.pcap', make_packets(5), {})
+    set_last_used(db, analysis_id, '2000-01-01 00:00:00')
+    result = RetentionManager(db, str(tmp_path)).run_once()
+    assert result['analyses_deleted'] == [] and result['artifacts_deleted'] == []
+    assert db.get_analysis_metadata(analysis_id) is not None
+
+
+def test_artifacts_expire_by_ttl_and_quota_with_grace(db, tmp_path):
+    folder = tmp_path / 'uploads'
+    folder.mkdir()
+    now = time.time()
+
+    def artifact(name, age, size=100):
+        path = folder / name
+        path.write_bytes(b'x' * size)
+        os.utime(path, (now - age, now - age))
+        return path
+
+    expired = artifact('report_old.pdf', 3 * 3600)
+    older = artifact('packets_1.csv', 2 * 3600)
+    newer = artifact('filtered_report_2.pdf', 3600)
+    recent = artifact('packets_new.csv', 10)
+    capture = artifact('capture.pcap', 10 * 3600)
+    other = artifact('notes.csv', 10 * 3600)
+
+    manager = RetentionManager(db, str(folder), artifact_ttl=2.5 * 3600, max_artifacts_size=250)
+    deleted = manager.run_once()['artifacts_deleted']
+
+    # TTL usuwa najstarszy raport, limit rozmiaru kolejny najstarszy; plik w okresie karencji,
+    # przesłane przechwycenie i obce pliki zostają
+    assert deleted == ['report_old.pdf', 'packets_1.csv']
+    assert not expired.exists() and not older.exists()
+    assert newer.exists() and recent.exists() and capture.exists() and other.exists()
+
+
+@pytest.fixture
+def app_module(tmp_path_factory, monkeypatch):
+    # app tworzy bazę i folder uploadów względem katalogu roboczego przy imporcie
+    monkeypatch.chdir(tmp_path_factory.mktemp('app'))
+    sys.modules.pop('app', None)
+    module = importlib.import_module('app')
+    yield module
+    sys.modules.pop('app', None)
+
+
+def test_import_does_not_start_retention(app_module):
+    assert app_module.retention.thread is None
+
+
+def test_admin_requires_configured_token(app_module, monkeypatch):
+    client = app_module.app.test_client()
+    monkeypatch.setattr(app_module.Config, 'ADMIN_TOKEN', None)
+    assert client.get('/admin/storage').status_code == 403
+    assert client.post('/admin/storage/cleanup', headers={'X-Admin-Token': ''}).status_code == 403
+
+    monkeypatch.setattr(app_module.Config, 'ADMIN_TOKEN', 'secret')
+    assert client.get('/admin/storage', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    response = client.get('/admin/storage', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    assert response.get_json()['analyses']['count'] == 0
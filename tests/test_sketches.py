@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from sketches import KllSketch
+from stats_generator import QUANTILES, QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL, StatsGenerator
+
+FRACTIONS = [fraction for _, fraction in QUANTILES]
+
+
+def exact_quantiles(values, fractions):
+    ordered = np.sort(values)
+    return [ordered[int(np.ceil(fraction * len(ordered))) - 1] for fraction in fractions]
+
+
+def fill(sketch, values, chunk=65536):
+    for start in range(0, len(values), chunk):
+        sketch.add_many(values[start:start + chunk])
+    return sketch
+
+
+@pytest.fixture(scope='module')
+def lognormal():
+    return np.random.default_rng(7).lognormal(5, 1.2, 600_000)
+
+
+def test_tail_quantiles_are_exact(lognormal):
+    sketch = fill(KllSketch(QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL), lognormal)
+    estimates = sketch.quantiles(FRACTIONS)
+    truth = exact_quantiles(lognormal, FRACTIONS)
+
+    # p99 i p99.9 wypadają w dokładnym ogonie (6000 i 600 elementów powyżej)
+    assert estimates[2:] == truth[2:]
+    assert sketch.rank_error(FRACTIONS)[2:] == [0.0, 0.0]
+
+
+def test_rank_error_within_reported_bound(lognormal):
+    sketch = fill(KllSketch(QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL), lognormal)
+    ordered = np.sort(lognormal)
+    for fraction, estimate, bound in zip(FRACTIONS, sketch.quantiles(FRACTIONS), sketch.rank_error(FRACTIONS)):
+        rank = np.searchsorted(ordered, estimate, side='right') / len(ordered)
+        assert abs(rank - fraction) <= bound + 1 / len(ordered)
+
+
+def test_merged_sketch_keeps_exact_tail(lognormal):
+    half = len(lognormal) // 2
+    merged = fill(KllSketch(QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL), lognormal[:half])
+    merged.merge(fill(KllSketch(QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL), lognormal[half:]))
+
+    assert merged.count == len(lognormal)
+    assert merged.quantiles(FRACTIONS)[2:] == exact_quantiles(lognormal, FRACTIONS)[2:]
+    assert int(merged.histogram(10)[0].sum()) == len(lognormal)
+
+
+def test_small_inputs_are_exact():
+    values = np.random.default_rng(3).integers(60, 1514, 2000).astype(np.float64)
+    sketch = fill(KllSketch(QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL), values, chunk=300)
+
+    assert sketch.quantiles(FRACTIONS) == exact_quantiles(values, FRACTIONS)
+    assert sketch.rank_error(FRACTIONS) == [0.0] * len(FRACTIONS)
+
+
+def test_stats_report_quantile_errors():
+    sizes = fill(KllSketch(QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL), np.array([60, 1514, 600, 60], dtype=np.float64))
+    gaps = fill(KllSketch(QUANTILE_SKETCH_K, QUANTILE_SKETCH_TAIL), np.array([0.5, 0.25, 1.25]))
+    stats = StatsGenerator().distribution_stats(sizes, gaps)
+
+    assert stats['packet_size_quantiles'] == {'p50': 60, 'p90': 1514, 'p99': 1514, 'p99.9': 1514}
+    assert stats['quantile_errors'] == {'packet_size': dict.fromkeys(stats['packet_size_quantiles'], 0.0),
+                                        'inter_arrival': dict.fromkeys(stats['inter_arrival_quantiles'], 0.0)}
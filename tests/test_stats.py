@@ -0,0 +1,166 @@
+import json
+import pickle
+import threading
+
+import numpy as np
+import pytest
+
+from benchmark import APPROXIMATE_KEYS, MultipassStatsGenerator, exact_differences, generate_capture
+import pcap_analyzer
+from pcap_analyzer import PcapAnalyzer
+from stats_generator import StatsGenerator
+from timeseries import TimeBuckets, TimeSeriesRollups
+
+
+@pytest.fixture(scope='module')
+def capture(tmp_path_factory):
+    path = tmp_path_factory.mktemp('capture') / 'capture.pcap'
+    generate_capture(str(path), 3000)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def table(capture):
+    return PcapAnalyzer('raw').analyze_table(capture)
+
+
+def partial(generator, table, start, end):
+    return generator.accumulator().add_table(table.take(slice(start, end)))
+
+
+def test_matches_multipass_reference(capture, table):
+    reference = MultipassStatsGenerator().generate_stats(PcapAnalyzer('raw').iter_packets(capture))
+    stats = StatsGenerator().generate_table_stats(table)
+
+    assert list(stats) == list(reference)
+    assert exact_differences(stats, reference) == []
+    # Kubełki czasu i szkice KLL: te same okna i sumy, kwantyle dokładne dla małych plików
+    assert stats['time_distribution']['labels'] == reference['time_distribution']['labels']
+    assert sum(stats['time_distribution']['values']) == sum(reference['time_distribution']['values'])
+    assert stats['throughput_stats']['time_labels'] == reference['throughput_stats']['time_labels']
+    for key in APPROXIMATE_KEYS[2:]:
+        assert stats[key] == reference[key]
+
+
+def test_merge_is_associative(table):
+    generator = StatsGenerator()
+    parts = lambda: [partial(generator, table, 0, 700), partial(generator, table, 700, 1900),
+                     partial(generator, table, 1900, len(table))]
+
+    a, b, c = parts()
+    left = generator.finalize(a.merge(b).merge(c))
+    a, b, c = parts()
+    right = generator.finalize(a.merge(b.merge(c)))
+    single = generator.generate_table_stats(table)
+
+    assert json.dumps(left) == json.dumps(right) == json.dumps(single)
+
+
+def test_merge_with_sketches(table):
+    generator = StatsGenerator(sketch={'capacity': 64, 'width': 1024, 'depth': 4})
+    merged = generator.merge_stats([partial(generator, table, 0, 1500), partial(generator, table, 1500, len(table))])
+    single = generator.generate_table_stats(table)
+
+    assert merged['total_packets'] == len(table)
+    assert merged['protocols'] == single['protocols']
+    for key in ('top_ips', 'top_ports'):
+        error = merged['sketch_errors'][key]['max_error']
+        exact = single[key]
+        for value, count in merged[key].items():
+            assert count >= exact.get(value, 0) - error
+
+
+def test_cannot_merge_different_sections(table):
+    generator = StatsGenerator()
+    with pytest.raises(ValueError):
+        generator.accumulator(['top']).merge(generator.accumulator(['distributions']))
+
+
+def test_accumulator_state_is_bounded(table):
+    generator = StatsGenerator()
+    accumulator = generator.accumulator()
+    sizes = []
+    for shift in range(20):
+        shifted = table.take(slice(None))
+        shifted.data = shifted.data.copy()
+        shifted.data['time'] += shift * 10
+        accumulator.add_table(shifted)
+        sizes.append(len(pickle.dumps(accumulator)))
+
+    # Te same klucze w każdej porcji - po zapełnieniu szkiców stan przestaje rosnąć
+    assert accumulator.total_packets == 20 * len(table)
+    assert len(accumulator.time_buckets.buckets) <= accumulator.time_buckets.max_buckets
+    assert sizes[-1] < 1.1 * sizes[9]
+
+
+def test_time_buckets_merge_matches_single_pass():
+    rng = np.random.default_rng(5)
+    times = 1700000000 + np.sort(rng.random(50000)) * 600
+    lengths = rng.integers(60, 1514, len(times))
+
+    single = TimeBuckets(max_buckets=1024)
+    single.add(times, lengths)
+    merged = TimeBuckets(max_buckets=1024)
+    for start in range(0, len(times), 7000):
+        part = TimeBuckets(max_buckets=1024)
+        part.add(times[start:start + 7000], lengths[start:start + 7000])
+        merged.merge(part)
+
+    assert merged.level == single.level
+    assert np.array_equal(merged.buckets, single.buckets)
+    assert np.array_equal(merged.packets, single.packets)
+    assert np.array_equal(merged.bytes, single.bytes)
+    assert (merged.start, merged.end) == (times.min(), times.max())
+    assert int(merged.bytes.sum()) == int(lengths.sum())
+
+
+def test_rollups_do_not_depend_on_chunking(table):
+    rollups = TimeSeriesRollups()
+    times = np.where(np.arange(len(table)) % 11 == 0, 0, table.data['time'])
+    whole = rollups.build(times, table.data['length'], chunk_size=len(table))
+    chunked = rollups.build(times, table.data['length'], chunk_size=257)
+
+    assert whole[:2] == chunked[:2]
+    for resolution, level in whole[2].items():
+        assert all(np.array_equal(a, b) for a, b in zip(level, chunked[2][resolution]))
+
+
+def test_sharded_parsing_merges_partial_stats(capture, table):
+    generator = StatsGenerator()
+    accumulator = generator.accumulator(generator.core_sections())
+    sharded = PcapAnalyzer('raw', workers=2, parallel_min_size=0).analyze_table(capture, accumulator)
+
+    assert np.array_equal(sharded.data, table.data)
+    assert sharded.payloads == table.payloads
+    assert json.dumps(generator.finalize(accumulator)) == \
+        json.dumps(generator.generate_table_stats(table, generator.core_sections()))
+
+
+def test_shard_workers_are_not_forked(monkeypatch, capture, table):
+    contexts = []
+
+    class RecordingExecutor(pcap_analyzer.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            contexts.append(kwargs.get('mp_context'))
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(pcap_analyzer, 'ProcessPoolExecutor', RecordingExecutor)
+    results = []
+    # Jak w obsłudze żądania: parsowanie w wątku, gdy inny wątek trzyma blokadę
+    held = threading.Lock()
+    with held:
+        worker = threading.Thread(target=lambda: results.append(
+            PcapAnalyzer('raw', workers=2, parallel_min_size=0).analyze_table(capture)))
+        worker.start()
+        worker.join(timeout=120)
+
+    assert [context.get_start_method() for context in contexts] == [pcap_analyzer.SHARD_START_METHOD]
+    assert pcap_analyzer.SHARD_START_METHOD != 'fork'
+    assert np.array_equal(results[0].data, table.data)
+
+
+def test_generate_stats_accepts_packet_stream(capture, table):
+    generator = StatsGenerator()
+    streamed = generator.generate_stats(PcapAnalyzer('raw').iter_packets(capture))
+
+    assert json.dumps(streamed) == json.dumps(generator.generate_table_stats(table))
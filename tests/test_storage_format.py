@@ -0,0 +1,34 @@
+import json
+import zlib
+
+import pytest
+import zstandard
+
+from database import (encode_blob, decode_blob, FORMAT_JSON, FORMAT_JSON_ZLIB, FORMAT_JSON_ZSTD,
+                      STORAGE_FORMATS)
+
+STATS = {'total_packets': 3, 'protocols': {'TCP': 2, 'UDP': 1}, 'top_ports': [[443, 2], [53, 1]],
+         'vendor': 'Zażółć', 'ratio': 0.5, 'missing': None}
+
+
+@pytest.mark.parametrize('storage_format', sorted(STORAGE_FORMATS.values()))
+def test_roundtrip(storage_format):
+    assert decode_blob(encode_blob(STATS, storage_format), storage_format) == STATS
+
+
+def test_compressed_formats_hold_plain_json():
+    # Bloby czytelne bez Pythona: zwykły JSON w UTF-8 po rozpakowaniu
+    assert json.loads(zlib.decompress(encode_blob(STATS, FORMAT_JSON_ZLIB))) == STATS
+    raw = zstandard.ZstdDecompressor().decompress(encode_blob(STATS, FORMAT_JSON_ZSTD))
+    assert json.loads(raw.decode('utf-8')) == STATS
+    assert json.loads(encode_blob(STATS, FORMAT_JSON)) == STATS
+
+
+def test_tuples_and_int_keys_read_back_as_json():
+    assert decode_blob(encode_blob({1: (2, 3)}, FORMAT_JSON_ZSTD), FORMAT_JSON_ZSTD) == {'1': [2, 3]}
+
+
+@pytest.mark.parametrize('storage_format', [1, 2, 99])
+def test_unknown_format_is_rejected(storage_format):
+    with pytest.raises(ValueError):
+        decode_blob(b'\x00', storage_format)
@@ -0,0 +1,222 @@
+import io
+import math
+import numpy as np
+
+# Rozdzielczości piramidy (sekundy) - każda jest całkowitą wielokrotnością poprzedniej
+ROLLUP_RESOLUTIONS = (0.001, 0.01, 0.1, 1, 10, 60, 600, 3600)
+
+# Najdrobniejszy przedział TimeBuckets: 2^-20 s (ok. 1 µs). Mnożenie przez potęgę dwójki jest
+# w float64 dokładne, więc numer przedziału nie zależy od podziału pakietów na porcje.
+TIME_BUCKET_EXPONENT = -20
+
+
+def column_dtype(values, dtypes=(np.uint8, np.uint16, np.uint32, np.uint64)):
+    """Najmniejszy typ całkowity mieszczący wszystkie (nieujemne) wartości kolumny"""
+    maximum = int(values.max()) if len(values) else 0
+    for dtype in dtypes:
+        if maximum <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+def offset_label(offset, resolution):
+    """Etykieta przesunięcia od początku przechwycenia - dokładność zależna od rozdzielczości"""
+    if resolution < 1:
+        decimals = max(1, -int(math.floor(math.log10(resolution))))
+        return f"{offset:.{decimals}f}s"
+    if offset < 3600:
+        minutes, seconds = divmod(int(offset), 60)
+        return f"{minutes:02d}:{seconds:02d}"
+    hours, rest = divmod(int(offset), 3600)
+    return f"{hours}h {rest // 60:02d}m"
+
+
+class TimeBuckets:
+    """
+    Łączalny licznik pakietów i bajtów w przedziałach czasu o szerokości 2^(level - 20) s,
+    liczonych od zera epoki - granice są te same w każdej porcji i każdym procesie. Gdy
+    niepustych przedziałów jest więcej niż max_buckets, szerokość jest podwajana (sąsiednie
+    przedziały się sumują), więc pamięć nie zależy od liczby pakietów, a przedział jest
+    węższy niż ok. 2 * zakres / max_buckets. merge() sprowadza oba liczniki do grubszego
+    poziomu i sumuje - wynik nie zależy od kolejności ani podziału na fragmenty. Dokładny
+    zakres czasu jest trzymany osobno, pakiety bez czasu (0) są tylko zliczane.
+    """
+
+    def __init__(self, max_buckets=16384):
+        self.max_buckets = max_buckets
+        self.level = 0
+        self.buckets = np.empty(0, dtype=np.int64)
+        self.packets = np.empty(0, dtype=np.int64)
+        self.bytes = np.empty(0, dtype=np.int64)
+        self.start = None
+        self.end = None
+        self.untimed_packets = 0
+
+    def width(self):
+        return math.ldexp(1.0, self.level + TIME_BUCKET_EXPONENT)
+
+    def add(self, times, lengths):
+        times = np.asarray(times, dtype=np.float64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        has_time = times != 0
+        self.untimed_packets += len(times) - int(np.count_nonzero(has_time))
+        times = times[has_time]
+        if len(times) == 0:
+            return
+        self.update_range(float(times.min()), float(times.max()))
+        buckets = np.floor(np.ldexp(times, -(self.level + TIME_BUCKET_EXPONENT))).astype(np.int64)
+        self.combine(buckets, np.ones(len(buckets), dtype=np.int64), lengths[has_time])
+
+    def update_range(self, start, end):
+        self.start = start if self.start is None else min(self.start, start)
+        self.end = end if self.end is None else max(self.end, end)
+
+    def combine(self, buckets, packets, byte_counts):
+        buckets = np.concatenate((self.buckets, buckets))
+        uniq, inverse = np.unique(buckets, return_inverse=True)
+        self.buckets = uniq
+        self.packets = np.bincount(inverse, weights=np.concatenate((self.packets, packets)),
+                                   minlength=len(uniq)).astype(np.int64)
+        self.bytes = np.bincount(inverse, weights=np.concatenate((self.bytes, byte_counts)),
+                                 minlength=len(uniq)).astype(np.int64)
+        if len(self.buckets) > self.max_buckets:
+            self.coarsen(self.level + 1)
+
+    def coarsen(self, level):
+        if level > self.level:
+            buckets = self.buckets >> (level - self.level)
+            packets, byte_counts = self.packets, self.bytes
+            self.level = level
+            self.buckets = self.packets = self.bytes = np.empty(0, dtype=np.int64)
+            self.combine(buckets, packets, byte_counts)
+
+    def merge(self, other):
+        if other.max_buckets != self.max_buckets:
+            raise ValueError("Cannot merge time buckets with different max_buckets")
+        self.coarsen(other.level)
+        self.untimed_packets += other.untimed_packets
+        if other.start is not None:
+            self.update_range(other.start, other.end)
+            self.combine(other.buckets >> (self.level - other.level), other.packets, other.bytes)
+        return self
+
+    def timed_packets(self):
+        return int(self.packets.sum())
+
+    def window_totals(self, start, window_size, windows):
+        """
+        (pakiety, bajty) w oknach [start + i * window_size, ...) - przedział trafia do okna
+        swojego środka (ograniczonego do zakresu czasu), błąd przypisania to pół przedziału
+        """
+        middles = np.clip((self.buckets + 0.5) * self.width(), self.start, self.end)
+        index = np.minimum(((middles - start) / window_size).astype(np.int64), windows - 1)
+        return (np.bincount(index, weights=self.packets, minlength=windows).astype(np.int64),
+                np.bincount(index, weights=self.bytes, minlength=windows))
+
+
+class TimeSeriesRollups:
+    """
+    Piramida agregatów ruchu w czasie: dla każdej rozdzielczości (1 ms ... 1 h)
+    liczba pakietów i bajtów w niepustych przedziałach. Poziom grubszy powstaje
+    z drobniejszego (bez ponownego przeglądania pakietów). Poziomy są zapisywane
+    osobno jako skompresowane kolumny (numer przedziału jako różnica od
+    poprzedniego, najmniejszy wystarczający typ), więc zapytanie o zakres
+    wczytuje tylko jeden poziom.
+    """
+
+    def __init__(self, resolutions=ROLLUP_RESOLUTIONS, max_points=1000):
+        self.resolutions = resolutions
+        self.max_points = max_points
+
+    def build(self, times, lengths, chunk_size=65536):
+        """
+        (czas pierwszego pakietu, czas trwania, {rozdzielczość: (przedziały, pakiety, bajty)}).
+        times/lengths mogą być kolumnami mapowanymi w pamięć - są czytane porcjami po chunk_size
+        wierszy, więc poza wynikiem (niepuste przedziały) w pamięci jest tylko bieżąca porcja.
+        """
+        chunks = lambda: ((np.asarray(times[start:start + chunk_size], dtype=np.float64),
+                           np.asarray(lengths[start:start + chunk_size], dtype=np.int64))
+                          for start in range(0, len(times), chunk_size))
+        # Pakiety bez czasu (0) pomijane jak w referencji wieloprzebiegowej (benchmark.py)
+        start_time = end_time = None
+        for chunk_times, _ in chunks():
+            chunk_times = chunk_times[chunk_times != 0]
+            if len(chunk_times):
+                first, last = float(chunk_times.min()), float(chunk_times.max())
+                start_time = first if start_time is None else min(start_time, first)
+                end_time = last if end_time is None else max(end_time, last)
+        if start_time is None:
+            return 0.0, 0.0, {}
+
+        finest = self.resolutions[0]
+        parts = []
+        for chunk_times, chunk_lengths in chunks():
+            has_time = chunk_times != 0
+            buckets = np.floor((chunk_times[has_time] - start_time) / finest).astype(np.int64)
+            parts.append(self.aggregate(buckets, np.ones(len(buckets), dtype=np.int64), chunk_lengths[has_time]))
+        # Porcje sąsiadują w czasie - wspólne bywają tylko przedziały na ich granicach
+        levels = {finest: self.aggregate(*(np.concatenate(column) for column in zip(*parts)))}
+
+        previous = finest
+        for resolution in self.resolutions[1:]:
+            ratio = int(round(resolution / previous))
+            fine_buckets, fine_packets, fine_bytes = levels[previous]
+            levels[resolution] = self.aggregate(fine_buckets // ratio, fine_packets, fine_bytes)
+            previous = resolution
+
+        return start_time, end_time - start_time, levels
+
+    def aggregate(self, buckets, packets, byte_counts):
+        uniq, inverse = np.unique(buckets, return_inverse=True)
+        return (uniq,
+                np.bincount(inverse, weights=packets, minlength=len(uniq)).astype(np.int64),
+                np.bincount(inverse, weights=byte_counts, minlength=len(uniq)).astype(np.int64))
+
+    def encode(self, level):
+        buckets, packets, byte_counts = level
+        deltas = np.diff(buckets, prepend=0)
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer,
+                            bucket_deltas=deltas.astype(column_dtype(deltas)),
+                            packets=packets.astype(column_dtype(packets)),
+                            bytes=byte_counts.astype(column_dtype(byte_counts)))
+        return buffer.getvalue()
+
+    def decode(self, blob):
+        with np.load(io.BytesIO(blob)) as columns:
+            return (np.cumsum(columns['bucket_deltas'].astype(np.int64)),
+                    columns['packets'].astype(np.int64),
+                    columns['bytes'].astype(np.int64))
+
+    def choose_resolution(self, span, max_points=None):
+        """Najdrobniejsza rozdzielczość, przy której zakres mieści się w max_points przedziałach"""
+        max_points = max_points or self.max_points
+        for resolution in self.resolutions:
+            if span / resolution <= max_points:
+                return resolution
+        return self.resolutions[-1]
+
+    def series(self, level, resolution, range_start, range_end):
+        """Gęsta seria (także puste przedziały) dla zakresu przesunięć [range_start, range_end]"""
+        buckets, packets, byte_counts = level
+        first = int(math.floor(range_start / resolution))
+        last = max(first + 1, int(math.floor(range_end / resolution)) + 1)
+
+        selected = (buckets >= first) & (buckets < last)
+        window_packets = np.zeros(last - first, dtype=np.int64)
+        window_bytes = np.zeros(last - first, dtype=np.int64)
+        window_packets[buckets[selected] - first] = packets[selected]
+        window_bytes[buckets[selected] - first] = byte_counts[selected]
+
+        offsets = (np.arange(first, last) * resolution).tolist()
+        return {
+            'resolution': resolution,
+            'start': first * resolution,
+            'end': last * resolution,
+            'offsets': offsets,
+            'time_labels': [offset_label(offset, resolution) for offset in offsets],
+            'packets': window_packets.tolist(),
+            'bytes': window_bytes.tolist(),
+            'bytes_per_second': (window_bytes / resolution).astype(np.int64).tolist(),
+            'packets_per_second': (window_packets / resolution).astype(np.int64).tolist()
+        }